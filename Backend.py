@@ -0,0 +1,1090 @@
+# File:     Backend.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import subprocess
+from subprocess import PIPE
+import numpy as np
+import time
+from Instance import read_data_file
+from DataWriter import DataWriter, open_data_file
+from Tracer import span, TRACER
+from MinCostFlow import MinCostFlow
+
+# SciPy is needed only by the in-process backends, it is imported by their first solve
+milp = None
+
+def import_scipy():
+    """ Import the SciPy functions used by the in-process backends, return False if SciPy is not installed. """
+    global milp, LinearConstraint, Bounds, coo_matrix
+    if milp == None:
+        try:
+            from scipy.optimize import milp, LinearConstraint, Bounds
+            from scipy.sparse import coo_matrix
+        except ImportError:
+            return False
+    return True
+
+class Backend:
+    """
+    Interface of a solver backend. A backend takes a configured Solver
+    and returns the pair (opt_val, result), where `result` is a dict which maps
+    day->dict(shift->student). If the problem has no solution, return (None, "").
+    """
+    name       = ""
+    opt_val    = None
+    solved     = False
+    incumbents = []
+    listener   = None
+    started    = 0
+
+    def solve(self, solver):
+        """
+        Solve the problem configured in `solver`.
+
+        Parameters:
+        -----------
+            - `solver` is the configured Solver object
+        """
+        raise NotImplementedError
+
+    def supports(self, modelPath):
+        """ Return True if the backend can solve the model `modelPath`. """
+        return True
+
+    def supports_offsets(self):
+        """
+        Return True if the backend balances the shifts assigned to each student with
+        the shifts already assigned outside of the instance (`Instance.offsets`).
+        """
+        return False
+
+    def solve_pool(self, solver, size):
+        """
+        Solve the problem configured in `solver` and return up to `size` alternative rosters.
+        By default, only the optimal roster.
+
+        Returns:
+        --------
+        the list of pairs (opt_val, result), sorted by objective value
+        """
+        opt_val, result = self.solve(solver)
+        return [(opt_val, result)] if opt_val != None else []
+
+    def stream(self, solver):
+        """
+        Solve the problem configured in `solver` and yield the roster rows
+        (day, shift, student). When the generator is exhausted, `opt_val` holds the
+        objective value and `solved` tells if a solution has been found.
+
+        Parameters:
+        -----------
+            - `solver` is the configured Solver object
+        """
+        self.opt_val, result = self.solve(solver)
+        self.solved = self.opt_val != None
+        for day in result:
+            for shift in result.get(day):
+                yield (day, shift, result.get(day).get(shift))
+
+    def start(self, solver):
+        """
+        Reset the solution state before solving the problem configured in `solver`.
+        """
+        self.opt_val    = None
+        self.solved     = False
+        self.incumbents = []
+        self.listener   = solver.on_incumbent
+        self.started    = time.time()
+
+    def add_incumbent(self, objective, bound=None, gap=None):
+        """
+        Record an improving solution found while solving and pass it to the
+        incumbent callback of the solver.
+
+        Parameters:
+        -----------
+            - `objective` is the objective value of the solution
+            - `bound` is the best bound on the optimal value, if known
+            - `gap` is the relative gap between `objective` and `bound`, if known
+        """
+        incumbent = {"time": time.time() - self.started, "objective": objective, "bound": bound, "gap": gap}
+        self.incumbents.append(incumbent)
+        if self.listener != None:
+            self.listener(incumbent)
+
+class OPLBackend(Backend):
+    """
+    Solve the problem running the OPLrun executable on the model and data files.
+    The output of OPLrun is parsed line by line, while the solver is running:
+    the incumbents are read from the CPLEX log as soon as they are found.
+    The time and gap limits are passed to CPLEX in a generated settings file.
+    """
+    name = "opl"
+
+    def stream(self, solver):
+        self.start(solver)
+        if solver.opl_exe == "" or solver.model_file == "" or solver.data_file == "":
+            return
+        files = [solver.model_file, solver.data_file]
+        if solver.warm_start != None:
+            files = list(write_warm_start_files(solver))
+        if solver.time_limit != None or solver.gap_limit != None:
+            files.insert(1, write_settings_file(solver))
+        args = [solver.opl_exe] + files
+        spawned = time.time()
+        with span("solver.spawn", backend=self.name):
+            p = subprocess.Popen(args, stdout=PIPE, universal_newlines=True, bufsize=1)
+        try:
+            with span("solver.run", backend=self.name):
+                for row in parse_opl_output(first_output(p.stdout, spawned), self):
+                    yield row
+        finally:
+            p.stdout.close()
+            p.wait()
+
+    def solve(self, solver):
+        result = rows_to_result(self.stream(solver))
+        if not self.solved:
+            return None, ""
+        return self.opt_val, result
+
+    def solve_pool(self, solver, size):
+        """
+        Populate the CPLEX solution pool with up to `size` diverse rosters in a single
+        OPLrun session, then read them one after the other from its output.
+        """
+        self.start(solver)
+        if solver.opl_exe == "" or solver.model_file == "" or solver.data_file == "":
+            return []
+        if model_objective(solver.model_file) == "combined":
+            raise ValueError("Model {} does not support the solution pool".format(solver.model_file))
+        files = [write_pool_model(solver, size), solver.data_file]
+        if solver.time_limit != None or solver.gap_limit != None:
+            files.insert(1, write_settings_file(solver))
+        spawned = time.time()
+        with span("solver.spawn", backend=self.name):
+            p = subprocess.Popen([solver.opl_exe] + files, stdout=PIPE, universal_newlines=True, bufsize=1)
+        pool = []
+        try:
+            with span("solver.run", backend=self.name, pool=size):
+                lines = first_output(p.stdout, spawned)
+                while len(pool) < size:
+                    self.solved = False
+                    result = rows_to_result(parse_opl_output(lines, self))
+                    if not self.solved:
+                        break
+                    pool.append((self.opt_val, result))
+        finally:
+            p.stdout.close()
+            p.wait()
+        return sorted(pool, key=lambda r: r[0])
+
+# Breakpoints of the piecewise-linear square, as in LibraryModel_getCSV_pwl.mod: one for each
+# number of shifts within PWL_EXACT of the mean, then one every PWL_STEP shifts
+PWL_STEP  = 2
+PWL_EXACT = 3
+
+class MILPBackend(Backend):
+    """
+    Build the model in-process and solve it with the HiGHS solver shipped with SciPy.
+
+    The quadratic balancing objective of `LibraryModel` is linearized exactly:
+    the number of assigned shifts is integer, then its square is the maximum of the
+    tangent lines `(2k+1)*a - k*(k+1)` for k=0,1,...
+    The linear variants of the balancing objective (min-max, absolute deviation and
+    piecewise-linear square) need fewer auxiliary rows and solve faster.
+    """
+    name = "milp"
+
+    # Map model file -> objective function implemented by the model
+    MODELS = {
+        "LibraryModel_getCSV.mod":  "balance",
+        "LibraryModel_getText.mod": "balance",
+        "MinTrips_getCSV.mod":      "trips",
+        "MinTrips_getText.mod":     "trips",
+        "LibraryModel_getCSV_sparse.mod": "balance",
+        "MinTrips_getCSV_sparse.mod":     "trips",
+        "BalancedTrips_getCSV.mod":       "combined",
+        "LibraryModel_getCSV_minmax.mod": "minmax",
+        "LibraryModel_getCSV_absdev.mod": "absdev",
+        "LibraryModel_getCSV_pwl.mod":    "pwl",
+    }
+
+    def supports(self, modelPath):
+        return os.path.basename(modelPath) in self.MODELS
+
+    def supports_offsets(self):
+        return True
+
+    def solve(self, solver):
+        pool = self.solve_pool(solver, 1)
+        return pool[0] if len(pool) > 0 else (None, "")
+
+    def solve_pool(self, solver, size):
+        """
+        Solve the problem, then find the next rosters in the same model: after each roster,
+        a no-good cut requires at least `solver.pool_changes` different assignments.
+        The rosters are found in order of objective value, within the time limit of `solver`.
+        """
+        if not import_scipy():
+            raise ImportError("SciPy is required by the {} backend".format(self.name))
+        objective = self.MODELS.get(os.path.basename(solver.model_file))
+        if objective == None:
+            raise ValueError("Model {} not supported by the {} backend".format(solver.model_file, self.name))
+
+        self.start(solver)
+        instance = solver.instance
+        if instance == None:
+            instance = read_data_file(solver.data_file)
+
+        with span("solver.build", backend=self.name, objective=objective):
+            model = MILPModel(instance, objective)
+        lexicographic = objective == "combined" and solver.balance_weight == 0
+        if objective == "combined":
+            # Weighted sum, or the trips alone for the first lexicographic stage
+            model.set_objective(1.0, solver.balance_weight)
+
+        best = None
+        if solver.warm_start != None:
+            # SciPy does not take a MIP start: complete the still feasible assignments
+            # of the previous roster into an incumbent, then use its value as cutoff
+            # (not with a pool, whose next rosters can be worse than the incumbent)
+            start, _ = warm_start_tensor(instance, solver.warm_start)
+            lb = model.lb.copy()
+            lb[:model.nX] = np.maximum(lb[:model.nX], model.x_values(start))
+            incumbent = model.solve(lb=lb, options=self.options(solver))
+            if incumbent.x is not None:
+                best = incumbent.x
+                self.add_incumbent(incumbent.fun + model.constant())
+                if size == 1:
+                    model.add_cutoff(incumbent.fun)
+
+        with span("solver.run", backend=self.name):
+            res = model.solve(options=self.options(solver))
+        if res.x is not None:
+            # At the time or gap limit, HiGHS returns its best incumbent
+            best  = res.x
+            bound = getattr(res, "mip_dual_bound", None)
+            self.add_incumbent(res.fun + model.constant(),
+                               bound + model.constant() if bound != None else None,
+                               getattr(res, "mip_gap", None))
+        if best is None:
+            return []
+        if lexicographic:
+            best = self.balance_stage(model, best, solver)
+        with span("result.parse", backend=self.name):
+            pool = [model.to_result(best)]
+
+        while len(pool) < size:
+            model.add_no_good(best, solver.pool_changes)
+            with span("solver.run", backend=self.name, pool=len(pool)+1):
+                res = model.solve(options=self.options(solver))
+            if res.x is None:
+                break
+            best = res.x
+            with span("result.parse", backend=self.name):
+                pool.append(model.to_result(best))
+        return pool
+
+    def balance_stage(self, model, x, solver):
+        """
+        Second stage of the lexicographic combined objective: keep the min number of trips
+        of the first stage solution `x` and balance the shifts, in the same model and
+        with `x` as starting incumbent.
+
+        Returns:
+        --------
+        the best solution found, `x` if the stage does not improve it within the limits
+        """
+        model.add_stage_bound("trips", np.round(np.dot(model.objectives["trips"], x)))
+        model.set_objective(0.0, 1.0)
+        x = model.complete(x)
+        model.add_cutoff(np.dot(model.c, x))
+        self.add_incumbent(np.dot(model.c, x) + model.constant())
+        with span("solver.run", backend=self.name, stage="balance"):
+            res = model.solve(options=self.options(solver))
+        if res.x is None:
+            return x
+        bound = getattr(res, "mip_dual_bound", None)
+        self.add_incumbent(res.fun + model.constant(),
+                           bound + model.constant() if bound != None else None,
+                           getattr(res, "mip_gap", None))
+        return res.x
+
+    def options(self, solver):
+        """
+        Return the options of scipy.optimize.milp for the time and gap limits of `solver`,
+        where the time limit is what is left since the solve started.
+        """
+        options = dict()
+        if solver.time_limit != None:
+            options["time_limit"] = max(solver.time_limit - (time.time() - self.started), 0.0)
+        if solver.gap_limit != None:
+            options["mip_rel_gap"] = solver.gap_limit
+        return options
+
+class FlowBackend(Backend):
+    """
+    Solve the balancing models (`LibraryModel` and its absdev and pwl variants) exactly as a
+    min-cost flow with convex costs, in polynomial time and without a MIP solver:
+
+        source -> student s -> (s, day d) -> shift (d, t) -> sink
+
+    The edge source->s carries the shifts of s: its k-th unit costs the increase of the
+    square `(k+1+o)^2 - (k+o)^2 = 2(k+o)+1`, where o is the offset of s, then the min cost
+    flow minimizes the sum of the squares, i.e. the variance since the mean is fixed.
+    The absdev and pwl variants only change the cost of each unit, which is still convex.
+    The units beyond the min number of shifts cost a big M more, to satisfy the min bounds
+    first. The edge s->(s,d) has the max number of shifts per day as capacity, an edge
+    (s,d)->(d,t) exists for each availability and each existing shift (d,t)->sink must be
+    covered by the flow.
+    """
+    name = "flow"
+
+    OBJECTIVES = ("balance", "absdev", "pwl")
+
+    def supports(self, modelPath):
+        return model_objective(modelPath) in self.OBJECTIVES
+
+    def supports_offsets(self):
+        return True
+
+    def solve(self, solver):
+        if not self.supports(solver.model_file):
+            raise ValueError("Model {} not supported by the {} backend".format(solver.model_file, self.name))
+        self.start(solver)
+        instance = solver.instance
+        if instance == None:
+            instance = read_data_file(solver.data_file)
+
+        fixed = instance.fixed & instance.existance.astype(bool)[None, :, :]
+        if (fixed.sum(axis=2) > instance.max_shifts_per_day).any() or (fixed.sum(axis=(1, 2)) > instance.max_shifts).any():
+            return None, ""
+        with span("solver.build", backend=self.name):
+            network, edges, shifts = flow_network(instance, model_objective(solver.model_file))
+        with span("solver.run", backend=self.name):
+            flow, _ = network.solve(0, 1, len(shifts))
+        if flow < len(shifts):
+            return None, ""
+
+        with span("result.parse", backend=self.name):
+            assigned = fixed.copy()
+            for (s, d, t), e in edges.items():
+                if network.flow(e) > 0:
+                    assigned[s, d, t] = True
+            counts = assigned.sum(axis=(1, 2))
+            if (counts < instance.min_shifts).any():
+                return None, ""
+            opt_val = load_objective(counts + instance.offsets, model_objective(solver.model_file))
+            self.add_incumbent(opt_val, opt_val, 0.0)
+
+            result = dict()
+            for d, t, s in zip(*np.nonzero(assigned.transpose(1, 2, 0))):
+                day = instance.days[d]
+                if result.get(day)==None:
+                    result[day] = dict()
+                result[day][instance.shifts[t]] = instance.students[s]
+        return opt_val, result
+
+def flow_network(instance, objective="balance"):
+    """
+    Build the min-cost flow network of the balancing problem of `instance` (see FlowBackend),
+    where the fixed assignments are already taken: the node 0 is the source and 1 the sink.
+    The cost of each unit of a student is the increase of `objective` ("balance", "absdev"
+    or "pwl") times the number of students, shifted to be non-negative.
+
+    Returns:
+    --------
+    a tuple (network, edges, shifts), where `edges` maps each free availability (s, d, t)
+    to its edge and `shifts` is the list of the existing shifts (d, t) to cover
+    """
+    S, D, T  = instance.num_students(), instance.num_days(), instance.num_shifts()
+    exist    = instance.existance.astype(bool)
+    fixed    = instance.fixed & exist[None, :, :]
+    covered  = fixed.any(axis=0)
+    avail    = instance.availability & (exist & ~covered)[None, :, :]
+    day_left = np.maximum(instance.max_shifts_per_day - fixed.sum(axis=2), 0)
+    offsets  = fixed.sum(axis=(1, 2)) + instance.offsets
+    num_fixed = fixed.sum(axis=(1, 2))
+
+    shifts = [ (d, t) for d, t in zip(*np.nonzero(exist & ~covered)) ]
+    pairs  = [ (s, d) for s, d in zip(*np.nonzero(avail.any(axis=2))) if day_left[s, d] > 0 ]
+    s_node = { s: 2 + s for s in range(S) }
+    p_node = { p: 2 + S + k for k, p in enumerate(pairs) }
+    t_node = { dt: 2 + S + len(pairs) + k for k, dt in enumerate(shifts) }
+    network = MinCostFlow(2 + S + len(pairs) + len(shifts))
+
+    # Units of the student s: the first ones up to the min number of shifts, then the others at cost M more
+    total = int(exist.sum() + instance.offsets.sum())
+    costs = []
+    for s in range(S):
+        units = min(int(instance.max_shifts[s] - num_fixed[s]), int(avail[s].sum()))
+        costs.append([ unit_cost(int(offsets[s]) + k, objective, S, total) for k in range(max(units, 0)) ])
+    bigM = max([ c[-1] for c in costs if len(c) > 0 ], default=0)*len(shifts) + 1
+    for s in range(S):
+        if len(costs[s]) > 0:
+            network.add_convex_edge(0, s_node[s], [ c + (bigM if num_fixed[s] + k >= instance.min_shifts[s] else 0)
+                                                    for k, c in enumerate(costs[s]) ])
+    for (s, d) in pairs:
+        network.add_edge(s_node[s], p_node[(s, d)], int(day_left[s, d]))
+    edges = dict()
+    for s, d, t in zip(*np.nonzero(avail)):
+        if (s, d) in p_node:
+            edges[(s, d, t)] = network.add_edge(p_node[(s, d)], t_node[(d, t)], 1)
+    for dt in shifts:
+        network.add_edge(t_node[dt], 1, 1)
+    return network, edges, shifts
+
+def unit_cost(load, objective, numStudents, total):
+    """
+    Return the non-negative integer cost of the shift which brings a student from `load`
+    to `load+1` shifts, given the `total` number of shifts of the `numStudents` students.
+    """
+    if objective == "absdev":
+        # numStudents*(|load+1-avg| - |load-avg|), plus numStudents
+        return abs(numStudents*(load+1) - total) - abs(numStudents*load - total) + numStudents
+    if objective == "pwl":
+        # Slope of the chord between the breakpoints around load, load+1
+        b = pwl_breakpoints(total/numStudents, load+1)
+        k = int(np.searchsorted(b, load, side='right')) - 1
+        return int(b[k] + b[k+1])
+    return 2*load + 1
+
+class MILPModel:
+    """
+    Sparse MILP `min c'x s.t. lower <= Ax <= upper, lb <= x <= ub` of a rostering instance.
+    As in the sparse OPL models, the variables X are defined only over the available
+    (student, day, shift) tuples (first `nX` entries, in the order of `index`), followed
+    by AssignedShifts[s] and then Z[s], the max load or Deviation[s] and/or Trips over
+    the (student, day) pairs with at least an available shift, according to the objective.
+    """
+
+    def __init__(self, instance, objective):
+        """
+        Build the MILPModel object.
+
+        Parameters:
+        -----------
+            - `instance` is the Instance object to model
+            - `objective` is the objective function, "balance", "trips", "combined" (both)
+              or a linear balancing objective, "minmax", "absdev" or "pwl"
+        """
+        self.instance  = instance
+        self.objective = objective
+        S, D, T   = instance.num_students(), instance.num_days(), instance.num_shifts()
+        exist     = instance.existance.astype(float)
+        min_s     = instance.min_shifts.astype(float)
+        max_s     = instance.max_shifts.astype(float)
+
+        # Available tuples, sorted by student, day and shift
+        self.index = np.nonzero(instance.availability)
+        s_of, d_of, t_of = self.index
+        nX        = len(s_of)
+        x_id      = np.arange(nX)
+        self.nX   = nX
+
+        # Upper bound on the number of shifts assigned to each student
+        cap = np.minimum(max_s, np.bincount(s_of, minlength=S)).astype(int)
+
+        # Pairs (student, day) with at least an available shift
+        sd_of         = s_of*D + d_of
+        pairs, sd_row = np.unique(sd_of, return_inverse=True)
+        sd_row        = np.ravel(sd_row)
+
+        # Additional variables: AssignedShifts[s], then Z[s] (epigraph of AssignedShifts[s]^2) for the
+        # balancing objectives, the max load or Deviation[s] for the linear balancing objectives
+        # and Trips[s][d] for the trips objective
+        balance = objective in ("balance", "combined", "pwl")
+        trips   = objective in ("trips", "combined")
+        a_id = nX + np.arange(S)
+        nZ   = S if balance else 0
+        nW   = {"minmax": 1, "absdev": S}.get(objective, 0)
+        nY   = nZ + nW + (len(pairs) if trips else 0)
+        n    = nX + S + nY
+
+        self.rows, self.cols, self.vals = [], [], []
+        self.lower, self.upper = [], []
+        self.num_rows = 0
+
+        # Consistency definition of AssignedShifts[s]
+        self.add_rows(np.concatenate([s_of, np.arange(S)]),
+                      np.concatenate([x_id, a_id]),
+                      np.concatenate([np.ones(nX), -np.ones(S)]),
+                      np.zeros(S), np.zeros(S))
+
+        # Assign each existing shift to only an available student
+        self.add_rows(d_of*T + t_of, x_id, np.ones(nX), exist.ravel(), exist.ravel())
+
+        self.objectives = dict()
+        integrality = np.ones(n)
+        y_ub = np.full(nY, np.inf)
+        o    = instance.offsets
+        avg  = (exist.sum() + o.sum()) / S
+        if balance:
+            # Z[s] >= (k+k')*(AssignedShifts[s]+offset[s]) - k*k', for each pair of consecutive
+            # breakpoints k < k' between offset[s] and offset[s]+cap[s], where offset[s] is the number
+            # of shifts already assigned to s outside of the instance: the chords of the square, which
+            # are the tangent lines of the integer square if the breakpoints are all the integers
+            b    = pwl_breakpoints(avg, int((o + np.maximum(cap, 1)).max())) if objective == "pwl" else None
+            z_id = nX + S + np.arange(S)
+            ks   = []
+            for s in range(S):
+                hi = o[s] + max(cap[s], 1)
+                if b is None:
+                    ks.append((np.arange(o[s], hi), np.arange(o[s], hi) + 1))
+                else:
+                    i = np.nonzero((b[1:] > o[s]) & (b[:-1] < hi))[0]
+                    ks.append((b[i], b[i+1]))
+            s_k  = np.concatenate([np.full(len(ks[s][0]), s) for s in range(S)])
+            k    = np.concatenate([ k for k, _ in ks ])
+            k1   = np.concatenate([ k1 for _, k1 in ks ])
+            r    = np.arange(len(k))
+            self.add_rows(np.concatenate([r, r]),
+                          np.concatenate([a_id[s_k], z_id[s_k]]),
+                          np.concatenate([k+k1, -np.ones(len(k))]),
+                          np.full(len(k), -np.inf), k*k1 - (k+k1)*o[s_k])
+            name = "pwl" if objective == "pwl" else "balance"
+            self.objectives[name] = np.zeros(n)
+            self.objectives[name][z_id] = 1.0/S
+            integrality[z_id] = 0
+            self.a_id, self.z_id = a_id, z_id
+        if objective == "minmax":
+            # MaxShifts >= AssignedShifts[s]+offset[s]
+            w_id = nX + S + nZ
+            self.add_rows(np.concatenate([np.arange(S), np.arange(S)]),
+                          np.concatenate([a_id, np.full(S, w_id)]),
+                          np.concatenate([np.ones(S), -np.ones(S)]),
+                          np.full(S, -np.inf), -o)
+            self.objectives["minmax"] = np.zeros(n)
+            self.objectives["minmax"][w_id] = 1.0
+            self.w_id = w_id
+        if objective == "absdev":
+            # Deviation[s] >= |AssignedShifts[s]+offset[s] - avg|
+            w_id = nX + S + nZ + np.arange(S)
+            r    = np.arange(2*S)
+            self.add_rows(np.concatenate([r, r]),
+                          np.concatenate([a_id, a_id, w_id, w_id]),
+                          np.concatenate([np.ones(S), -np.ones(S), -np.ones(2*S)]),
+                          np.full(2*S, -np.inf), np.concatenate([avg - o, o - avg]))
+            self.objectives["absdev"] = np.zeros(n)
+            self.objectives["absdev"][w_id] = 1.0/S
+            integrality[w_id] = 0
+            self.w_id = w_id
+        if trips:
+            # Trips[s][d] = 1 if the student s has at least one shift in the day d:
+            # each assignment is linked to its trip, X[s][d][t] <= Trips[s][d] ...
+            t_id = nX + S + nZ + nW + np.arange(len(pairs))
+            self.add_rows(np.concatenate([x_id, x_id]),
+                          np.concatenate([x_id, t_id[sd_row]]),
+                          np.concatenate([np.ones(nX), -np.ones(nX)]),
+                          np.full(nX, -np.inf), np.zeros(nX))
+            # ... and the max number of shifts per day is available only in the days of a trip
+            self.add_rows(np.concatenate([sd_row, np.arange(len(pairs))]),
+                          np.concatenate([x_id, t_id]),
+                          np.concatenate([np.ones(nX), -instance.max_shifts_per_day*np.ones(len(pairs))]),
+                          np.full(len(pairs), -np.inf), np.zeros(len(pairs)))
+            self.objectives["trips"] = np.zeros(n)
+            self.objectives["trips"][t_id] = 1.0
+            y_ub[nZ+nW:] = 1
+        else:
+            # Max number of shifts per day of each student
+            self.add_rows(sd_row, x_id, np.ones(nX),
+                          np.full(len(pairs), -np.inf), np.full(len(pairs), instance.max_shifts_per_day))
+
+        # Min and max number of shifts of each student are the bounds of AssignedShifts[s]
+        self.balance_weight = 1.0 if objective in ("balance", "pwl") else 0.0
+        self.c           = self.objectives.get(objective, np.zeros(n))
+        self.integrality = integrality
+        self.lb          = np.concatenate([instance.fixed[self.index].astype(float), min_s, np.zeros(nY)])
+        self.ub          = np.concatenate([np.ones(nX), max_s, y_ub])
+
+    def set_objective(self, tripsWeight, balanceWeight):
+        """
+        Minimize `tripsWeight*trips + balanceWeight*balance` (combined model only).
+        """
+        self.balance_weight = balanceWeight
+        self.c = tripsWeight*self.objectives["trips"] + balanceWeight*self.objectives["balance"]
+
+    def add_stage_bound(self, name, value):
+        """
+        Add the constraint `objective <= value` on the objective `name` ("trips" or "balance"),
+        to keep the optimum of a lexicographic stage while optimizing the next one.
+        """
+        c  = self.objectives[name]
+        nz = np.nonzero(c)[0]
+        self.add_rows(np.zeros(len(nz), dtype=int), nz, c[nz], [-np.inf], [value + 1e-6])
+
+    def add_no_good(self, x, changes=1):
+        """
+        Add the constraint which discards the roster `x` and all the rosters with less than
+        `changes` different assignments: since all the existing shifts are assigned,
+        at most `assigned - changes` assignments of `x` are kept.
+        """
+        ones = np.nonzero(np.round(x[:self.nX]))[0]
+        self.add_rows(np.zeros(len(ones), dtype=int), ones, np.ones(len(ones)),
+                      [-np.inf], [len(ones) - changes])
+
+    def complete(self, x):
+        """
+        Return a copy of the solution `x` where the auxiliary variables of the balancing
+        objective take their tight value given the number of shifts of each student (plus
+        its offset): Z[s] is its square (or the piecewise-linear square), the max load or
+        Deviation[s] is its distance from the mean.
+        """
+        x     = x.copy()
+        loads = np.round(x[self.nX:self.nX + self.instance.num_students()]) + self.instance.offsets
+        if "balance" in self.objectives:
+            x[self.z_id] = loads**2
+        if "pwl" in self.objectives:
+            x[self.z_id] = pwl_square(loads, (self.instance.existance.sum() + self.instance.offsets.sum())/len(loads))
+        if "minmax" in self.objectives:
+            x[self.w_id] = loads.max()
+        if "absdev" in self.objectives:
+            x[self.w_id] = np.abs(loads - (self.instance.existance.sum() + self.instance.offsets.sum())/len(loads))
+        return x
+
+    def x_values(self, tensor):
+        """
+        Return the values of the variables X given the array [students][days][shifts] `tensor`.
+        """
+        return np.asarray(tensor)[self.index]
+
+    def add_rows(self, r, c, v, lb, ub):
+        """
+        Add the constraints `lb <= Ax <= ub`, where A is given in coordinate format
+        (`r` row indices, starting from 0, `c` column indices and `v` values).
+        """
+        self.rows.append(np.asarray(r) + self.num_rows)
+        self.cols.append(np.asarray(c))
+        self.vals.append(np.asarray(v, dtype=float))
+        self.lower.append(np.asarray(lb, dtype=float))
+        self.upper.append(np.asarray(ub, dtype=float))
+        self.num_rows += len(self.lower[-1])
+
+    def add_cutoff(self, value):
+        """
+        Add the constraint `c'x <= value`, discarding the solutions worse than `value`.
+        """
+        nz = np.nonzero(self.c)[0]
+        self.add_rows(np.zeros(len(nz), dtype=int), nz, self.c[nz], [-np.inf], [value + 1e-6])
+
+    def solve(self, lb=None, ub=None, options=None):
+        """
+        Solve the MILP with HiGHS and return the scipy.optimize.OptimizeResult.
+
+        Parameters:
+        -----------
+            - `lb`, `ub` override the variable bounds (e.g. to fix some assignments)
+            - `options` is the dict of options of scipy.optimize.milp (e.g. time_limit)
+        """
+        A = coo_matrix((np.concatenate(self.vals), (np.concatenate(self.rows), np.concatenate(self.cols))),
+                       shape=(self.num_rows, len(self.c))).tocsr()
+        return milp(self.c, constraints=LinearConstraint(A, np.concatenate(self.lower), np.concatenate(self.upper)),
+                    integrality=self.integrality,
+                    bounds=Bounds(self.lb if lb is None else lb, self.ub if ub is None else ub),
+                    options=options)
+
+    def constant(self):
+        """
+        Return the constant term of the objective, which is not in `c`: for the balancing
+        objective, the opposite of the squared mean number of shifts, to get the variance.
+        All the existing shifts are assigned, then the mean does not depend on the solution.
+        """
+        if self.balance_weight == 0:
+            return 0.0
+        instance = self.instance
+        avg = (instance.existance.sum() + instance.offsets.sum()) / instance.num_students()
+        return -self.balance_weight*float(avg)**2
+
+    def to_result(self, x):
+        """
+        Return the tuple (opt_val, result) of the solution `x`.
+        """
+        instance = self.instance
+        x        = np.where(self.integrality == 1, np.round(x), x)
+        assigned = x[:self.nX].astype(bool)
+        opt_val  = float(np.dot(self.c, x)) + self.constant()
+
+        s_of, d_of, t_of = (ids[assigned].tolist() for ids in self.index)
+        result = dict()
+        for s, d, t in sorted(zip(s_of, d_of, t_of), key=lambda i: (i[1], i[2], i[0])):
+            day = instance.days[d]
+            if result.get(day)==None:
+                result[day] = dict()
+            result[day][instance.shifts[t]] = instance.students[s]
+
+        return opt_val, result
+
+def model_objective(modelPath):
+    """
+    Return the objective function implemented by the model `modelPath` ("balance",
+    "trips", "combined" or a linear balancing objective "minmax", "absdev" or "pwl"),
+    or None if the model is unknown.
+    """
+    return MILPBackend.MODELS.get(os.path.basename(modelPath))
+
+def objective_value(instance, result, objective, balanceWeight=0):
+    """
+    Return the value of `objective` (see `model_objective`) for the roster `result`
+    of `instance`, as reported by the models.
+
+    Parameters:
+    -----------
+        - `instance` is the Instance object
+        - `result` is a dict which maps day->dict(shift->student)
+        - `objective` is the objective function
+        - `balanceWeight` is the weight of the balance in the combined objective; if 0 (lexicographic),
+          the combined value is the balance, i.e. the objective of the last stage
+    """
+    s_index  = dict()
+    for k, p in enumerate(instance.students):
+        s_index.setdefault(p, k)
+    assigned = np.zeros(instance.num_students())
+    trips    = set()
+    for day in result:
+        for shift, student in result.get(day).items():
+            assigned[s_index[student]] += 1
+            trips.add((student, day))
+    if objective in BALANCE_OBJECTIVES:
+        return load_objective(assigned, objective)
+    balance = load_objective(assigned, "balance")
+    if objective == "combined":
+        return balance if balanceWeight == 0 else len(trips) + balanceWeight*balance
+    return float(len(trips))
+
+# Balancing objectives: the mean variance of the number of shifts of the students and its linear variants
+BALANCE_OBJECTIVES = ("balance", "minmax", "absdev", "pwl")
+
+def load_objective(loads, objective):
+    """
+    Return the balancing objective of the number of shifts `loads` of the students.
+
+    Parameters:
+    -----------
+        - `loads` is the array of the number of shifts of each student
+        - `objective` is "balance" (mean variance), "minmax" (max number of shifts),
+          "absdev" (mean absolute deviation) or "pwl" (mean variance, with the square
+          replaced by its piecewise-linear approximation)
+    """
+    loads = np.asarray(loads, dtype=float)
+    if objective == "minmax":
+        return float(loads.max())
+    if objective == "absdev":
+        return float(np.mean(np.abs(loads - loads.mean())))
+    if objective == "pwl":
+        return float(np.mean(pwl_square(loads, loads.mean())) - loads.mean()**2)
+    return float(np.mean((loads - loads.mean())**2))
+
+def pwl_breakpoints(mean, hi, step=PWL_STEP, exact=PWL_EXACT):
+    """
+    Return the sorted array of the breakpoints of the piecewise-linear square, from 0 to
+    at least `hi` shifts: every integer from floor(mean)-exact to ceil(mean)+exact, then
+    every `step` shifts. The approximation is exact at floor(mean) and ceil(mean), then
+    its optimum is the one of the square whenever the loads can be perfectly balanced,
+    and whenever the balanced loads stay within `exact` shifts of the mean.
+    """
+    low  = max(int(np.floor(mean)) - exact, 0)
+    high = int(np.ceil(mean)) + exact
+    below = np.arange(low, 0, -step)[::-1]
+    above = np.arange(high, max(hi, high) + step, step)
+    return np.unique(np.concatenate([[0], below, np.arange(low, high), above])).astype(int)
+
+def pwl_square(loads, mean, step=PWL_STEP, exact=PWL_EXACT):
+    """
+    Return the piecewise-linear approximation of the square of the integer `loads`, with the
+    breakpoints of `pwl_breakpoints` around `mean`: exact on the breakpoints, the chord in between.
+    """
+    loads = np.asarray(loads)
+    b = pwl_breakpoints(mean, int(np.max(loads, initial=0)) + 1, step, exact)
+    i = np.searchsorted(b, loads, side='right') - 1
+    return (b[i] + b[i+1])*loads - b[i]*b[i+1]
+
+def warm_start_tensor(instance, result):
+    """
+    Map a previous roster on `instance`, keeping only the assignments which are
+    still feasible: the student, the day and the shift still exist, the student is
+    still available, and the max number of shifts (per day and overall) is respected.
+
+    Parameters:
+    -----------
+        - `instance` is the Instance object
+        - `result` is a dict which maps day->dict(shift->student)
+
+    Returns:
+    --------
+    a tuple (start, num_dropped), where `start` is the boolean array [students][days][shifts]
+    of the kept assignments and `num_dropped` is the number of discarded assignments
+    """
+    s_index = { p: k for k, p in enumerate(instance.students) }
+    d_index = { d: k for k, d in enumerate(instance.days) }
+    t_index = { t: k for k, t in enumerate(instance.shifts) }
+
+    start    = np.zeros(instance.availability.shape, dtype=bool)
+    per_day  = np.zeros(instance.availability.shape[:2], dtype=int)
+    total    = np.zeros(instance.num_students(), dtype=int)
+    num_rows = 0
+    for day in result:
+        for shift, student in result.get(day).items():
+            num_rows += 1
+            s, d, t = s_index.get(student), d_index.get(day), t_index.get(shift)
+            if s == None or d == None or t == None:
+                continue
+            if not instance.availability[s, d, t] or not instance.existance[d, t]:
+                continue
+            if per_day[s, d] >= instance.max_shifts_per_day or total[s] >= instance.max_shifts[s]:
+                continue
+            start[s, d, t] = True
+            per_day[s, d] += 1
+            total[s] += 1
+
+    return start, num_rows - int(start.sum())
+
+# Wrapper of a model which passes the matrix `Start` to CPLEX as MIP start
+WARM_START_MODEL = """/*********************************************
+ * Warm start of {model}
+ * This file is generated automatically
+ *********************************************/
+include "{model}";
+
+ /* Declare the 3D array of the starting assignment */
+ int Start[students][days][shifts] = ...;
+
+ main {{
+    thisOplModel.generate();
+    var vectors = new IloOplCplexVectors();
+    vectors.attach(thisOplModel.X, thisOplModel.Start);
+    vectors.setStart(cplex);
+    if (cplex.solve()) {{
+        writeln("OBJECTIVE: " + cplex.getObjValue());
+        thisOplModel.postProcess();
+    }} else {{
+        writeln("no solution");
+    }}
+ }}
+"""
+
+# Wrapper of a sparse model, the starting assignment is the set of tuples `StartTuples`
+WARM_START_SPARSE_MODEL = """/*********************************************
+ * Warm start of {model}
+ * This file is generated automatically
+ *********************************************/
+include "{model}";
+
+ /* Declare the set of the assigned tuples in the starting assignment */
+ {{Available}} StartTuples = ...;
+ int Start[a in AvailableTuples] = (a in StartTuples) ? 1 : 0;
+
+ main {{
+    thisOplModel.generate();
+    var vectors = new IloOplCplexVectors();
+    vectors.attach(thisOplModel.X, thisOplModel.Start);
+    vectors.setStart(cplex);
+    if (cplex.solve()) {{
+        writeln("OBJECTIVE: " + cplex.getObjValue());
+        thisOplModel.postProcess();
+    }} else {{
+        writeln("no solution");
+    }}
+ }}
+"""
+
+# Wrapper of a model, which populates the solution pool and writes each roster of the pool
+POOL_MODEL = """/*********************************************
+ * Solution pool of {model}
+ * This file is generated automatically
+ *********************************************/
+include "{model}";
+
+ main {{
+    thisOplModel.generate();
+    cplex.solnpoolcapacity  = {size};
+    cplex.solnpoolintensity = 4;
+    cplex.solnpoolreplace   = 2;
+    cplex.populatelim       = {limit};
+    if (cplex.populate() && cplex.solnPoolNsolns > 0) {{
+        for (var i = 0; i < cplex.solnPoolNsolns; i++) {{
+            thisOplModel.setPoolSolution(i);
+            writeln("OBJECTIVE: " + cplex.getObjValue(i));
+            thisOplModel.postProcess();
+        }}
+    }} else {{
+        writeln("no solution");
+    }}
+ }}
+"""
+
+def write_pool_model(solver, size):
+    """
+    Write the model which populates the solution pool with up to `size` rosters, keeping
+    the most diverse ones (CPLEX `solnpoolreplace` 2), next to the data file of `solver`.
+
+    Returns:
+    --------
+    the filepath of the model to pass to OPLrun
+    """
+    model_file = os.path.splitext(solver.data_file)[0] + "_pool.mod"
+    with open(model_file, 'w') as mod:
+        mod.write(POOL_MODEL.format(model=os.path.abspath(solver.model_file).replace("\\", "/"),
+                                    size=size, limit=max(20, 4*size)))
+    return model_file
+
+def write_warm_start_files(solver):
+    """
+    Write the model and the data files to warm start OPLrun from `solver.warm_start`,
+    next to the data file of `solver`. The combined model is not supported: it has its
+    own main block, which the warm start model cannot wrap.
+
+    Returns:
+    --------
+    the tuple of filepaths (model, data, start data) to pass to OPLrun
+    """
+    if model_objective(solver.model_file) == "combined":
+        raise ValueError("Model {} does not support the warm start".format(solver.model_file))
+    instance = solver.instance
+    if instance == None:
+        instance = read_data_file(solver.data_file)
+    start, _ = warm_start_tensor(instance, solver.warm_start)
+
+    base       = os.path.splitext(solver.data_file)[0]
+    model_file = base + "_warmstart.mod"
+    start_file = base + "_warmstart.dat"
+    template   = WARM_START_SPARSE_MODEL if solver.sparse else WARM_START_MODEL
+    with open(model_file, 'w') as mod:
+        mod.write(template.format(model=os.path.abspath(solver.model_file).replace("\\", "/")))
+    with open_data_file(start_file) as dat:
+        dat.write("/* Starting assignment, generated automatically */\n")
+        if solver.sparse:
+            DataWriter(dat, sparse=True).write_tuples("StartTuples", start, instance.students)
+        else:
+            dat.write("Start = {};\n".format(str(start.astype(int).tolist())))
+    return model_file, solver.data_file, start_file
+
+def parse_opl_output(lines, backend):
+    """
+    Parse the OPLrun output one line at a time and yield the roster rows
+    (day, shift, student) printed between the `[Info] Begin output` and
+    `[Info] End output` delimiters. The objective value and the solution status
+    are stored in `backend` as soon as they are read, as well as the incumbents
+    reported in the CPLEX log.
+
+    Parameters:
+    -----------
+        - `lines` is an iterable of output lines (e.g. the stdout pipe of OPLrun)
+        - `backend` is the Backend object which collects `opt_val` and `solved`
+    """
+    inside = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if "OBJECTIVE" in line:     # Retrieve optimal result of objective function
+            backend.opt_val = float(line.split(": ")[1])
+            backend.solved  = True
+        elif "no solution" in line: # Retrieve unsolvability and eventually break execution
+            backend.opt_val = None
+            backend.solved  = False
+            return
+        elif not inside and (line.startswith("*") or line.startswith("Found incumbent")):
+            incumbent = parse_incumbent(line)
+            if incumbent != None:
+                backend.add_incumbent(*incumbent)
+        elif "[Info]" in line:      # Retrieve the delimiters lines, discarding the cplex output
+            if "Begin output" in line:  # Starting line
+                inside = True
+            elif "End output" in line:  # Final line
+                return
+        elif inside and line != "":
+            day, shift, student = line.split(",", 2)
+            yield (day, shift, student)
+
+def parse_incumbent(line):
+    """
+    Parse a line of the CPLEX log which reports a new incumbent, i.e. a node log line
+    starting with `*` (e.g. `*    10+    5     38.0000     12.0000    68.42%`) or
+    `Found incumbent of value 38.000000 after 0.01 sec.`.
+
+    Returns:
+    --------
+    the tuple (objective, bound, gap), with None for the unknown values,
+    or None if the line does not report an incumbent
+    """
+    tokens = line.split()
+    try:
+        if line.startswith("Found incumbent of value"):
+            return float(tokens[4]), None, None
+        if tokens[-1].endswith("%"):
+            # The best integer and the best bound are the last values with decimals before the gap
+            values = [ t for t in tokens[1:-1] if "." in t ]
+            return float(values[-2]), float(values[-1]), float(tokens[-1][:-1])/100
+        values = [ t for t in tokens[1:] if "." in t ]
+        return float(values[-1]), None, None
+    except (ValueError, IndexError):
+        return None
+
+def write_settings_file(solver):
+    """
+    Write the OPL settings file with the time and gap limits of `solver`
+    (CPLEX parameters `tilim` and `epgap`), next to its data file.
+
+    Returns:
+    --------
+    the filepath of the settings file to pass to OPLrun
+    """
+    settings = []
+    if solver.time_limit != None:
+        settings.append(("tilim", solver.time_limit))
+    if solver.gap_limit != None:
+        settings.append(("epgap", solver.gap_limit))
+    settings_file = os.path.splitext(solver.data_file)[0] + "_settings.ops"
+    with open(settings_file, 'w') as ops:
+        ops.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        ops.write('<settings version="2">\n')
+        ops.write('  <category name="cplex">\n')
+        for name, value in settings:
+            ops.write('    <setting name="{}" value="{}"/>\n'.format(name, value))
+        ops.write('  </category>\n')
+        ops.write('</settings>\n')
+    return settings_file
+
+def first_output(lines, spawned):
+    """
+    Yield the `lines` unchanged, recording the time from `spawned` to the first line
+    as the span "solver.first_output".
+    """
+    first = True
+    for line in lines:
+        if first:
+            TRACER.event("solver.first_output", spawned)
+            first = False
+        yield line
+
+def rows_to_result(rows):
+    """
+    Collect the roster rows (day, shift, student) in the result dict
+    which maps day->dict(shift->student).
+    """
+    result = dict()
+    for day, shift, student in rows:
+        if result.get(day)==None:
+            result[day] = dict()
+        result[day][shift] = student
+    return result
+
+BACKENDS = {
+    OPLBackend.name:  OPLBackend,
+    MILPBackend.name: MILPBackend,
+    FlowBackend.name: FlowBackend,
+}
+
+def get_backend(name):
+    """
+    Return a new backend given its name.
+
+    Parameters:
+    -----------
+        - `name` is the backend identifier (e.g. "opl", "milp")
+    """
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend \"{}\", choose one of {}".format(name, sorted(BACKENDS)))
+    return BACKENDS[name]()
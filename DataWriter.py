@@ -0,0 +1,146 @@
+# File:     DataWriter.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import numpy as np
+
+# Size of the write buffer of the data file
+BUFFER_SIZE = 1 << 16
+
+class DataWriter:
+    """
+    Write an OPL data file section by section, streaming the text through a
+    buffered file instead of building the whole content in memory.
+    The availability can be written as the dense tensor `Availability[students][days][shifts]`
+    or, with the sparse encoding, as the tuple set `AvailableTuples` of the
+    available <student, day, shift> triples (1-based), whose size scales with
+    the number of preferences.
+    """
+    out    = None
+    sparse = False
+
+    def __init__(self, out, sparse=False):
+        """
+        Build the DataWriter object.
+
+        Parameters:
+        -----------
+            - `out` is the text stream where the data is written (e.g. a file opened with `open_data_file`)
+            - `sparse` if True, write the availability as a tuple set
+        """
+        self.out    = out
+        self.sparse = sparse
+
+    def write_header(self, name, date):
+        """ Write the comment header with the problem `name` and the creation `date`. """
+        self.out.write("/*********************************************\n")
+        self.out.write(" * Name: {}\n".format(name))
+        self.out.write(" * This file is generated automatically\n")
+        self.out.write(" *\n")
+        self.out.write(" * Creation Date: {}\n".format(date))
+        self.out.write(" *********************************************/\n")
+        self.out.write("\n")
+
+    def write_comment(self, comment):
+        """ Write a comment line. """
+        self.out.write("/* {} */\n".format(comment))
+
+    def write_scalar(self, key, value, width=0):
+        """ Write the line `key = value;`, with `key` padded to `width` characters. """
+        self.out.write("{} = {};\n".format(key.ljust(width), value))
+
+    def write_newline(self):
+        self.out.write("\n")
+
+    def write_names(self, key, names):
+        """ Write the indexed array of strings `key`, e.g. the student names. """
+        self.out.write("{} = #[\n".format(key))
+        for k, name in enumerate(names):
+            self.out.write("    {}: \"{}\"{}\n".format(k+1, name, "," if k < len(names)-1 else ""))
+        self.out.write("]#;\n")
+        self.out.write("\n")
+
+    def write_values(self, key, values, comments):
+        """ Write the indexed array of integers `key`, with a comment on each line. """
+        self.out.write("{} = #[\n".format(key))
+        self.out.writelines(format_indexed_rows([str(v) for v in values], comments, "    {}: {}"))
+        self.out.write("]#;\n")
+        self.out.write("\n")
+
+    def write_existance(self, existance, days):
+        """ Write the 0/1 matrix Existance[days][shifts]. """
+        self.out.write("Existance = #[\n")
+        self.out.writelines(format_indexed_rows(format_rows(existance), days, "    {}: {}"))
+        self.out.write("]#;\n")
+
+    def write_availability(self, availability, participants, days):
+        """
+        Write the availability tensor [students][days][shifts], as dense array
+        or as tuple set according to the encoding of the writer.
+        """
+        if self.sparse:
+            self.write_tuples("AvailableTuples", availability, participants)
+        else:
+            self.write_dense_availability(availability, participants, days)
+
+    def write_dense_availability(self, availability, participants, days):
+        self.out.write("Availability = [\n")
+        num_days = len(days)
+        rows     = format_rows(availability.reshape(-1, availability.shape[-1]))
+        for k, p_name in enumerate(participants):
+            self.out.write("    #[    /* {} */\n".format(p_name))
+            self.out.writelines(format_indexed_rows(rows[k*num_days : (k+1)*num_days], days, "        {}:    {}"))
+            self.out.write("     ]#{}\n".format("," if k < len(participants)-1 else ""))
+        self.out.write("];\n")
+        self.out.write("\n")
+
+    def write_tuples(self, key, tensor, participants):
+        """
+        Write the tuple set `key` of the <student, day, shift> (1-based) which are
+        True in the boolean array [students][days][shifts] `tensor`, one line for each student.
+        """
+        s_ids, d_ids, t_ids = np.nonzero(tensor)
+        bounds = np.searchsorted(s_ids, np.arange(len(participants)+1))
+        triples = [ "<{},{},{}>".format(s, d, t) for s, d, t in zip((s_ids+1).tolist(), (d_ids+1).tolist(), (t_ids+1).tolist()) ]
+        self.out.write("{} = {{\n".format(key))
+        for k, p_name in enumerate(participants):
+            if bounds[k] == bounds[k+1]:
+                continue
+            last = bounds[k+1] == len(triples)
+            self.out.write("    {}{}    /* {} */\n".format(", ".join(triples[bounds[k]:bounds[k+1]]),
+                                                          "" if last else ",", p_name))
+        self.out.write("};\n")
+        self.out.write("\n")
+
+def open_data_file(dataPath):
+    """ Open `dataPath` for writing, with a large write buffer. """
+    return open(dataPath, 'w', buffering=BUFFER_SIZE)
+
+def format_rows(matrix):
+    """
+    Return the list of OPL arrays (e.g. "[0, 1, 1]") representing the rows of a 0/1 `matrix`.
+    Each distinct row pattern is formatted only once.
+    """
+    matrix = np.asarray(matrix, dtype=bool)
+    if matrix.shape[-1] == 0:
+        return ["[]"] * len(matrix)
+    codes, inverse = np.unique(matrix, axis=0, return_inverse=True)
+    patterns = [ str(row) for row in codes.astype(int).tolist() ]
+    return [ patterns[i] for i in np.ravel(inverse).tolist() ]
+
+def format_indexed_rows(values, comments, fmt):
+    """
+    Return the lines of an OPL indexed array, i.e. the lines `fmt.format(index, value)`
+    followed by the comment, with a comma on each line but the last.
+
+    Parameters:
+    -----------
+        - `values` is the list of already formatted values
+        - `comments` is the list of names reported as comment of each line
+        - `fmt` is the format of a line, without the trailing comma and comment
+    """
+    lines = [ fmt.format(k+1, v) + ",   /* {} */\n".format(c) for k, (v, c) in enumerate(zip(values, comments)) ]
+    if len(lines) > 0:
+        lines[-1] = fmt.format(len(lines), values[-1]) + "    /* {} */\n".format(comments[-1])
+    return lines
@@ -7,6 +7,9 @@ import sys
 import datetime
 import requests
 import json
+from Tracer import span
+
+DOODLE_API = "https://doodle.com/api/v2.0/polls/"
 
 class DoodleParser:
     """
@@ -17,18 +20,47 @@ class DoodleParser:
     participants = []
     options      = dict()
     calendar     = dict()
+    option_index = []
 
-    def __init__(self, pollID):
+    def __init__(self, pollID, snapshot=None, offline=False, session=None, apiURL=DOODLE_API):
         """
         Build the DoodleParser object defining the pollID.
 
         Parameteres:
         ------------
             - `pollID`: poll identifier contained in the doodle URL address
+            - `snapshot`: PollSnapshot object used to fetch the poll, if None the poll is always downloaded
+            - `offline`: if True, read the poll from `snapshot` without accessing Doodle
+            - `session`: requests.Session used to download the poll, if None use a new connection
+            - `apiURL`: base URL of the Doodle polls API, used when `snapshot` is None (e.g. a local stub)
+        """
+        # Per-poll containers, so that parsers are independent and can be pickled
+        self.pollID       = pollID
+        self.participants = []
+        self.options      = dict()
+        self.calendar     = dict()
+
+        with span("doodle.fetch", poll=pollID):
+            if snapshot != None:
+                JSON = snapshot.fetch_raw(pollID, offline)
+            else:
+                http = session if session != None else requests
+                JSON = http.get(apiURL + pollID).content.decode('utf-8')
+
+        with span("doodle.parse_json", poll=pollID):
+            JSON = json.loads(JSON)
+
+        with span("doodle.calendar", poll=pollID):
+            self.build_calendar(JSON)
+
+    def build_calendar(self, JSON):
         """
-        JSON = requests.get("https://doodle.com/api/v2.0/polls/" + pollID).content.decode('utf-8')
-        JSON = json.loads(JSON)
+        Fill participants, options and calendar from the poll JSON.
 
+        Parameters:
+        -----------
+            - `JSON`: the poll, as decoded from the Doodle API
+        """
         # Fill participants dict
         for participant in JSON['participants']:
             pName = participant['name']
@@ -47,10 +79,13 @@ class DoodleParser:
             self.options[format_date(d)].append(format_time(d))
 
         # Initialize calendar dict creating an empty list for each option (day, shift)
+        # and the flat index which maps the i-th option to its (day, shift)
+        self.option_index = []
         for k, d in enumerate(self.options.keys()):
             self.calendar[d] = dict()
             for k, t in enumerate(self.options.get(d)):
                 self.calendar[d][t] = list()
+                self.option_index.append((d, t))
 
         # Fill list of participant who express preference for option (day, shift)
         for participant in JSON['participants']:
@@ -104,14 +139,9 @@ class DoodleParser:
             - `day`   is the identifier of the day associated to the i-th options
             - `shift` is the identifier of the shift associated to the i-th options
         """
-        kk = 0
-
-        for k, d in enumerate(self.options.keys()):
-            for k, t in enumerate(self.options.get(d)):
-                if kk == i:
-                    return (d, t)
-                kk = kk + 1
-        return (d, t)
+        if i < len(self.option_index):
+            return self.option_index[i]
+        return self.option_index[-1]
 
 def format_date(d):
     """ Format a datetime `date` """
@@ -0,0 +1,175 @@
+# File:     Exporter.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import csv
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:     # Only needed by the Parquet exporter
+    pyarrow = None
+
+# Names of the columns of the roster rows
+COLUMNS = ["day", "shift", "student"]
+
+class Exporter:
+    """
+    Interface of a result exporter. An exporter receives the roster rows
+    (day, shift, student) one at a time, as they are produced by `Solver.stream`,
+    and writes them to `output_file` without holding the whole roster in memory.
+    """
+    name        = ""
+    extension   = ""
+    output_file = ""
+
+    def __init__(self, outputFile):
+        """
+        Build the Exporter object and open the output file.
+
+        Parameters:
+        -----------
+            - `outputFile` is the filepath of the output file (create it or overwrite)
+        """
+        self.output_file = outputFile
+
+    def write_row(self, day, shift, student):
+        """ Write the assignment of `student` to the shift `shift` of the day `day`. """
+        raise NotImplementedError
+
+    def close(self):
+        """ Flush and close the output file. """
+        raise NotImplementedError
+
+class CSVExporter(Exporter):
+    """
+    Write the roster as CSV, with the header `day,shift,student`.
+    """
+    name      = "csv"
+    extension = ".csv"
+
+    def __init__(self, outputFile):
+        super().__init__(outputFile)
+        self.out    = open(outputFile, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.out)
+        self.writer.writerow(COLUMNS)
+
+    def write_row(self, day, shift, student):
+        self.writer.writerow((day, shift, student))
+
+    def close(self):
+        self.out.close()
+
+class JSONLinesExporter(Exporter):
+    """
+    Write the roster as JSON Lines, one object `{"day", "shift", "student"}` for each row.
+    """
+    name      = "jsonl"
+    extension = ".jsonl"
+
+    def __init__(self, outputFile):
+        super().__init__(outputFile)
+        self.out = open(outputFile, 'w', encoding='utf-8')
+
+    def write_row(self, day, shift, student):
+        self.out.write(json.dumps({"day": day, "shift": shift, "student": student}) + "\n")
+
+    def close(self):
+        self.out.close()
+
+class ParquetExporter(Exporter):
+    """
+    Write the roster as a Parquet file (requires pyarrow). The rows are buffered
+    by column and written as a row group every `batch_size` rows.
+    """
+    name       = "parquet"
+    extension  = ".parquet"
+    batch_size = 65536
+
+    def __init__(self, outputFile):
+        if pyarrow == None:
+            raise ImportError("pyarrow is required by the {} exporter".format(self.name))
+        super().__init__(outputFile)
+        self.schema  = pyarrow.schema([ (c, pyarrow.string()) for c in COLUMNS ])
+        self.writer  = pyarrow.parquet.ParquetWriter(outputFile, self.schema)
+        self.columns = [ [] for _ in COLUMNS ]
+
+    def write_row(self, day, shift, student):
+        for column, value in zip(self.columns, (day, shift, student)):
+            column.append(value)
+        if len(self.columns[0]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.columns[0]) > 0:
+            self.writer.write_table(pyarrow.Table.from_arrays(
+                [ pyarrow.array(c, type=pyarrow.string()) for c in self.columns ], schema=self.schema))
+            self.columns = [ [] for _ in COLUMNS ]
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+EXPORTERS = {
+    CSVExporter.name:       CSVExporter,
+    JSONLinesExporter.name: JSONLinesExporter,
+    ParquetExporter.name:   ParquetExporter,
+}
+
+def get_exporter(name, outputFile):
+    """
+    Return a new exporter given its name.
+
+    Parameters:
+    -----------
+        - `name` is the exporter identifier (e.g. "csv", "jsonl", "parquet")
+        - `outputFile` is the filepath of the output file
+    """
+    if name not in EXPORTERS:
+        raise ValueError("Unknown exporter \"{}\", choose one of {}".format(name, sorted(EXPORTERS)))
+    return EXPORTERS[name](outputFile)
+
+def export_filepath(outputPath, name):
+    """ Return the filepath of the `name` export, replacing the extension of `outputPath`. """
+    return os.path.splitext(outputPath)[0] + EXPORTERS[name].extension
+
+def tee_rows(rows, exporters):
+    """
+    Write each roster row (day, shift, student) with all the `exporters`,
+    then yield it. The exporters are closed when `rows` is exhausted.
+
+    Parameters:
+    -----------
+        - `rows` is an iterable of roster rows (e.g. `Solver.stream()`)
+        - `exporters` is the list of Exporter objects
+    """
+    try:
+        for day, shift, student in rows:
+            for exporter in exporters:
+                exporter.write_row(day, shift, student)
+            yield (day, shift, student)
+    finally:
+        for exporter in exporters:
+            exporter.close()
+
+def result_rows(result):
+    """ Yield the roster rows (day, shift, student) of the result dict day->dict(shift->student). """
+    for day in result:
+        for shift, student in result.get(day).items():
+            yield (day, shift, student)
+
+def export_rows(rows, exporters):
+    """
+    Write all the roster rows (day, shift, student) with the `exporters`, then close them.
+
+    Returns:
+    --------
+    the number of rows written
+    """
+    count = 0
+    for _ in tee_rows(rows, exporters):
+        count += 1
+    return count
@@ -0,0 +1,171 @@
+# File:     Instance.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import re
+import json
+import hashlib
+import numpy as np
+
+class Instance:
+    """
+    In-memory representation of a rostering problem, i.e. the same data
+    that is written in the OPL data file.
+    """
+    name               = ""
+    students           = []
+    days               = []
+    shifts             = []
+    availability       = []
+    existance          = []
+    min_shifts         = []
+    max_shifts         = []
+    max_shifts_per_day = 1
+    fixed              = []
+    offsets            = []
+
+    def __init__(self, name, students, days, shifts, availability, existance,
+                 minShifts, maxShifts, maxShiftsPerDay, fixed=None, offsets=None):
+        """
+        Build the Instance object.
+
+        Parameters:
+        -----------
+            - `name` is the problem string identifier
+            - `students` is the list of student names
+            - `days` is the list of day names
+            - `shifts` is the sorted list of shift names
+            - `availability` is a boolean array [students][days][shifts]
+            - `existance` is a boolean array [days][shifts]
+            - `minShifts` is the array of minimum number of shifts for each student
+            - `maxShifts` is the array of maximum number of shifts for each student
+            - `maxShiftsPerDay` is the max number of shifts of a student in the same day
+            - `fixed` is the boolean array [students][days][shifts] of the assignments fixed by presolve
+            - `offsets` is the array of shifts already assigned to each student outside of
+              this instance (e.g. in the previous windows of a rolling horizon), counted by the balancing objective
+        """
+        self.name               = name
+        self.students           = students
+        self.days               = days
+        self.shifts             = shifts
+        self.availability       = np.asarray(availability, dtype=bool).reshape(len(students), len(days), len(shifts))
+        self.existance          = np.asarray(existance, dtype=bool).reshape(len(days), len(shifts))
+        self.min_shifts         = np.asarray(minShifts, dtype=int)
+        self.max_shifts         = np.asarray(maxShifts, dtype=int)
+        self.max_shifts_per_day = maxShiftsPerDay
+        if fixed is None:
+            self.fixed          = np.zeros(self.availability.shape, dtype=bool)
+        else:
+            self.fixed          = np.asarray(fixed, dtype=bool).reshape(self.availability.shape)
+        if offsets is None:
+            self.offsets        = np.zeros(len(students), dtype=int)
+        else:
+            self.offsets        = np.asarray(offsets, dtype=int)
+
+    def digest(self):
+        """
+        Return the SHA-256 hex digest of the content of the instance (the name excluded):
+        two instances with the same digest describe the same problem.
+        """
+        h = hashlib.sha256()
+        for names in (self.students, self.days, self.shifts):
+            h.update(json.dumps(list(names)).encode('utf-8'))
+        for array in (self.availability, self.existance, self.min_shifts, self.max_shifts, self.fixed, self.offsets):
+            array = np.ascontiguousarray(array, dtype=np.int64)
+            h.update(str(array.shape).encode('utf-8'))
+            h.update(array.tobytes())
+        h.update(str(self.max_shifts_per_day).encode('utf-8'))
+        return h.hexdigest()
+
+    def num_students(self):
+        """ Return the number of students. """
+        return len(self.students)
+
+    def num_days(self):
+        """ Return the number of days. """
+        return len(self.days)
+
+    def num_shifts(self):
+        """ Return the number of shifts in a day. """
+        return len(self.shifts)
+
+    def subset(self, students, days, shifts, existance=None):
+        """
+        Return the Instance restricted to the given students, days and shifts.
+
+        Parameters:
+        -----------
+            - `students`, `days`, `shifts` are the arrays of indices to keep
+            - `existance` is the boolean array [days][shifts] of the existing shifts, by default the current one
+        """
+        existance = self.existance if existance is None else existance
+        grid      = np.ix_(students, days, shifts)
+        return Instance(self.name,
+                        [ self.students[s] for s in students ],
+                        [ self.days[d] for d in days ],
+                        [ self.shifts[t] for t in shifts ],
+                        self.availability[grid],
+                        existance[np.ix_(days, shifts)],
+                        self.min_shifts[students],
+                        self.max_shifts[students],
+                        self.max_shifts_per_day,
+                        self.fixed[grid],
+                        self.offsets[students])
+
+def read_data_file(dataPath):
+    """
+    Build an Instance reading a data file generated by `Solver.config_problem`.
+
+    Parameters:
+    -----------
+        - `dataPath` is the data filepath
+
+    Returns:
+    --------
+    the Instance object described in the data file
+    """
+    with open(dataPath, 'r') as dat:
+        content = dat.read()
+
+    # Strip the comments, but keep the problem name in the header
+    name    = re.search(r"\* Name: (.*)\n", content)
+    name    = name.group(1).strip() if name != None else ""
+    content = re.sub(r"/\*.*?\*/", "", content, flags=re.S)
+
+    def scalar(key):
+        return int(re.search(key + r"\s*=\s*(\d+)\s*;", content).group(1))
+
+    def section(key):
+        return re.search(key + r"\s*=\s*(.*?);", content, flags=re.S).group(1)
+
+    def names(key):
+        return re.findall(r"\d+\s*:\s*\"(.*?)\"", section(key))
+
+    def vectors(text):
+        return [ [int(v) for v in vec.split(",")] for vec in re.findall(r"\[([\d,\s]+)\]", text) ]
+
+    def values(key):
+        return [ int(v) for v in re.findall(r"\d+\s*:\s*(\d+)", section(key)) ]
+
+    students = names("StudNames")
+    days     = names("DayNames")
+    shifts   = names("ShiftNames")
+    if re.search(r"AvailableTuples\s*=", content) != None:
+        # Sparse encoding: tuple set of the available <student, day, shift> (1-based)
+        availability = np.zeros((len(students), len(days), len(shifts)), dtype=bool)
+        triples      = np.array(re.findall(r"<\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*>", section("AvailableTuples")), dtype=int)
+        if len(triples) > 0:
+            availability[triples[:, 0]-1, triples[:, 1]-1, triples[:, 2]-1] = True
+    else:
+        availability = vectors(section("Availability"))
+
+    return Instance(name,
+                    students,
+                    days,
+                    shifts,
+                    availability,
+                    vectors(section("Existance")),
+                    values("MinNumShifts"),
+                    values("MaxNumShifts"),
+                    scalar("MaxNumShiftsPerDay"))
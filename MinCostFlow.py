@@ -0,0 +1,193 @@
+# File:     MinCostFlow.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import heapq
+
+class MinCostFlow:
+    """
+    Min-cost flow on a directed graph with integer capacities and costs, solved by
+    successive shortest paths (Dijkstra with node potentials), augmenting all the
+    shortest paths of each phase at once.
+
+    Besides the edges with a constant cost per unit, an edge can have a convex cost:
+    the k-th unit of flow costs `costs[k]`, with `costs` non-decreasing. It is equivalent
+    to parallel unit edges, but the shortest paths only look at the next unit.
+    """
+    num_nodes = 0
+
+    def __init__(self, numNodes):
+        """
+        Build the MinCostFlow object.
+
+        Parameters:
+        -----------
+            - `numNodes` is the number of nodes, identified by 0..numNodes-1
+        """
+        self.num_nodes = numNodes
+        self.adj   = [ [] for _ in range(numNodes) ]
+        # Edge e goes from `tail[e]` to `head[e]`, its residual edge is e^1
+        self.tail  = []
+        self.head  = []
+        self.cap   = []     # Residual capacity
+        self.cost  = []     # Cost per unit, None for convex edges
+        self.costs = []     # Marginal costs of the convex edges (of the forward edge for both)
+
+    def add_edge(self, u, v, capacity, cost=0):
+        """
+        Add the edge u->v with `capacity` units of flow, each one of cost `cost`.
+
+        Returns:
+        --------
+        the edge identifier
+        """
+        return self._add(u, v, capacity, cost, None)
+
+    def add_convex_edge(self, u, v, costs):
+        """
+        Add the edge u->v, where the k-th unit of flow costs `costs[k]` (non-decreasing).
+
+        Returns:
+        --------
+        the edge identifier
+        """
+        return self._add(u, v, len(costs), None, list(costs))
+
+    def _add(self, u, v, capacity, cost, costs):
+        e = len(self.head)
+        for a, b, c, w in ((u, v, capacity, cost), (v, u, 0, None if cost == None else -cost)):
+            self.adj[a].append(len(self.head))
+            self.tail.append(a)
+            self.head.append(b)
+            self.cap.append(c)
+            self.cost.append(w)
+            self.costs.append(costs)
+        return e
+
+    def flow(self, e):
+        """ Return the flow on the edge `e`. """
+        return self.cap[e^1]
+
+    def edge_cost(self, e):
+        """ Return the cost of the next unit of flow on the (residual) edge `e`. """
+        if self.cost[e] != None:
+            return self.cost[e]
+        if e & 1 == 0:
+            return self.costs[e][self.cap[e^1]]
+        return -self.costs[e][self.cap[e]-1]
+
+    def solve(self, source, sink, maxFlow):
+        """
+        Send up to `maxFlow` units of flow from `source` to `sink` at min cost.
+        The initial costs must be non-negative.
+
+        Each phase computes the shortest distances with Dijkstra on the reduced costs and
+        updates the node potentials, then augments a blocking flow on the shortest paths,
+        i.e. on the residual edges with zero reduced cost, as in Dinic's algorithm.
+
+        Returns:
+        --------
+        the tuple (flow, cost) of the max flow up to `maxFlow` of min cost
+        """
+        n      = self.num_nodes
+        adj, head, cap, cost = self.adj, self.head, self.cap, self.cost
+        dual   = [0] * n
+        flow   = 0
+        total  = 0
+        INF    = float("inf")
+        while flow < maxFlow:
+            # Shortest distances with the reduced costs, which are non-negative
+            dist    = [INF] * n
+            visited = [False] * n
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                d, v = heapq.heappop(heap)
+                if visited[v]:
+                    continue
+                visited[v] = True
+                if v == sink:
+                    break
+                dv = dual[v]
+                for e in adj[v]:
+                    if cap[e] == 0:
+                        continue
+                    w = head[e]
+                    if visited[w]:
+                        continue
+                    c  = cost[e] if cost[e] != None else self.edge_cost(e)
+                    nd = d + c - dual[w] + dv
+                    if nd < dist[w]:
+                        dist[w] = nd
+                        heapq.heappush(heap, (nd, w))
+            if not visited[sink]:
+                break
+            for v in range(n):
+                if visited[v]:
+                    dual[v] -= dist[sink] - dist[v]
+
+            # Blocking flows on the edges with zero reduced cost
+            while flow < maxFlow:
+                level = self._levels(source, dual)
+                if level[sink] < 0:
+                    break
+                current = [0] * n
+                while flow < maxFlow:
+                    path = self._path(source, sink, level, current, dual)
+                    if path == None:
+                        break
+                    # Augment one unit (the convex edges change cost at each unit)
+                    for e in path:
+                        total  += self.edge_cost(e)
+                        cap[e]   -= 1
+                        cap[e^1] += 1
+                    flow += 1
+        return flow, total
+
+    def reduced_cost(self, e, dual):
+        """ Return the cost of the next unit on the edge `e`, reduced by the node potentials `dual`. """
+        return self.edge_cost(e) - dual[self.head[e]] + dual[self.tail[e]]
+
+    def _levels(self, source, dual):
+        """ Return the BFS level of each node on the residual edges with zero reduced cost (-1 if unreachable). """
+        level = [-1] * self.num_nodes
+        level[source] = 0
+        queue = [source]
+        for v in queue:
+            for e in self.adj[v]:
+                w = self.head[e]
+                if level[w] < 0 and self.cap[e] > 0 and self.reduced_cost(e, dual) == 0:
+                    level[w] = level[v] + 1
+                    queue.append(w)
+        return level
+
+    def _path(self, source, sink, level, current, dual):
+        """
+        Return the edges of a path from `source` to `sink` on the level graph, or None.
+        `current` is the next edge to try from each node, the dead ends are removed from `level`.
+        """
+        adj, head, cap = self.adj, self.head, self.cap
+        stack = [source]
+        path  = []
+        while stack:
+            v = stack[-1]
+            if v == sink:
+                return path
+            while current[v] < len(adj[v]):
+                e = adj[v][current[v]]
+                w = head[e]
+                if cap[e] > 0 and level[w] == level[v] + 1 and self.reduced_cost(e, dual) == 0:
+                    break
+                current[v] += 1
+            if current[v] < len(adj[v]):
+                stack.append(head[adj[v][current[v]]])
+                path.append(adj[v][current[v]])
+            else:
+                # Dead end: never visit it again in this phase
+                level[v] = -1
+                stack.pop()
+                if len(path) > 0:
+                    path.pop()
+                    current[stack[-1]] += 1
+        return None
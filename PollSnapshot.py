@@ -0,0 +1,142 @@
+# File:     PollSnapshot.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import json
+import time
+import tempfile
+import requests
+from DoodleParser import DOODLE_API
+
+class PollSnapshot:
+    """
+    Local store of raw Doodle polls. Each poll is saved as the raw JSON returned
+    by Doodle (`<pollID>.json`) together with its fetch metadata (`<pollID>.meta.json`).
+    A stored poll is revalidated with a conditional request, then it is downloaded
+    again only if it changed on Doodle.
+    """
+    snapshot_dir = ""
+    api_url      = ""
+    session      = None
+
+    def __init__(self, snapshotDir, apiURL=DOODLE_API, session=None):
+        """
+        Build the PollSnapshot object.
+
+        Parameters:
+        -----------
+            - `snapshotDir` is the directory which contains the snapshots
+            - `apiURL` is the base URL of the Doodle polls API
+            - `session` is the requests.Session used to download the polls, if None use a new connection
+        """
+        self.snapshot_dir = snapshotDir
+        self.api_url      = apiURL
+        self.session      = session
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def exists(self, pollID):
+        """ Return True if a snapshot of the poll `pollID` is stored. """
+        return os.path.exists(self.poll_path(pollID))
+
+    def fetch(self, pollID, offline=False):
+        """
+        Return the poll JSON (decoded as dict), revalidating the stored snapshot.
+
+        Parameters:
+        -----------
+            - `pollID` is the poll identifier
+            - `offline` if True, read the snapshot without accessing Doodle
+        """
+        return json.loads(self.fetch_raw(pollID, offline))
+
+    def fetch_raw(self, pollID, offline=False):
+        """
+        Return the raw poll JSON (as string), revalidating the stored snapshot.
+        If Doodle answers "304 Not Modified", an HTTP error or it is not reachable, serve the snapshot.
+
+        Parameters:
+        -----------
+            - `pollID` is the poll identifier
+            - `offline` if True, read the snapshot without accessing Doodle
+        """
+        meta = self.read_meta(pollID)
+        if offline:
+            if meta == None:
+                raise FileNotFoundError("No snapshot of poll {} in {}".format(pollID, self.snapshot_dir))
+            return self.read_poll(pollID)
+
+        # Conditional request according to the stored metadata
+        headers = dict()
+        if meta != None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta.get("etag")
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta.get("last_modified")
+
+        try:
+            http     = self.session if self.session != None else requests
+            response = http.get(self.api_url + pollID, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException:   # Including the HTTPError of a 4xx/5xx answer
+            if meta == None:
+                raise
+            return self.read_poll(pollID)
+
+        if response.status_code == 304 and meta != None:
+            meta["validated_at"] = time.time()
+            self.write_meta(pollID, meta)
+            return self.read_poll(pollID)
+
+        content = response.content.decode('utf-8')
+        self.write_poll(pollID, content, {
+            "poll_id":       pollID,
+            "url":           self.api_url + pollID,
+            "etag":          response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at":    time.time(),
+            "validated_at":  time.time(),
+        })
+        return content
+
+    def poll_path(self, pollID):
+        """ Return the filepath of the raw poll JSON. """
+        return os.path.join(self.snapshot_dir, pollID + ".json")
+
+    def meta_path(self, pollID):
+        """ Return the filepath of the poll metadata. """
+        return os.path.join(self.snapshot_dir, pollID + ".meta.json")
+
+    def read_poll(self, pollID):
+        with open(self.poll_path(pollID), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def read_meta(self, pollID):
+        if not self.exists(pollID) or not os.path.exists(self.meta_path(pollID)):
+            return None
+        with open(self.meta_path(pollID), 'r') as f:
+            return json.load(f)
+
+    def write_poll(self, pollID, content, meta):
+        self.replace(self.poll_path(pollID), content)
+        self.write_meta(pollID, meta)
+
+    def write_meta(self, pollID, meta):
+        self.replace(self.meta_path(pollID), json.dumps(meta, indent=4))
+
+    def replace(self, path, content):
+        """
+        Write `content` in a temporary file next to `path`, then rename it to `path`:
+        the concurrent readers of the snapshot (e.g. the solver threads of the service)
+        read either the previous or the new file, never a partial one.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
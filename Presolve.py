@@ -0,0 +1,259 @@
+# File:     Presolve.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import time
+import numpy as np
+from Backend import model_objective, objective_value
+from Instance import Instance
+from Tracer import span
+
+class Presolve:
+    """
+    Reduce a rostering Instance before handing it to the solver:
+        - an existing shift with exactly one available student is assigned to that student;
+        - the availabilities which cannot be used anymore (the student already reached
+          the max number of shifts, in that day or overall, with the fixed assignments)
+          are dropped, then the forced assignments are propagated until a fixpoint;
+        - the min and max number of shifts of each student are tightened to the fixed
+          assignments and to the number of shifts the student can still take;
+        - the days and shifts without any available student and the students without any
+          availability are dropped;
+        - the instance is split in its independent components, i.e. groups of students
+          which do not share any available shift.
+    Since all the existing shifts are assigned, the number of assignments of each
+    component is fixed, then both the balancing and the trips objectives are optimized
+    by solving each component separately. The mean absolute deviation (`absdev`) is the
+    exception: it depends on the mean over all the students, the components included.
+    """
+    instance   = None
+    fixed      = None
+    components = []
+    stats      = dict()
+
+    def __init__(self, instance):
+        """
+        Build the Presolve object.
+
+        Parameters:
+        -----------
+            - `instance` is the Instance object to reduce
+        """
+        self.instance   = instance
+        self.fixed      = None
+        self.components = []
+        self.stats      = dict()
+
+    def run(self, split=True):
+        """
+        Reduce the instance.
+
+        Parameters:
+        -----------
+            - `split` if True, split the reduced instance in independent components
+
+        Returns:
+        --------
+        the list of reduced Instance objects, empty if presolve proves the problem infeasible
+        """
+        t0 = time.perf_counter()
+        instance   = self.instance
+        existance  = instance.existance.copy()
+        avail      = instance.availability & existance[None, :, :]
+        fixed      = instance.fixed & avail
+        max_shifts = instance.max_shifts.copy()
+        max_day    = instance.max_shifts_per_day
+        infeasible = False
+
+        # Fix the forced assignments and drop the availabilities they make useless
+        while True:
+            candidates = avail.sum(axis=0)
+            if (existance & (candidates == 0)).any():
+                infeasible = True
+                break
+            forced = avail & (existance & (candidates == 1) & ~fixed.any(axis=0))[None, :, :]
+            if not forced.any():
+                break
+            fixed |= forced
+            full_day = fixed.sum(axis=2) >= max_day
+            full     = fixed.sum(axis=(1, 2)) >= max_shifts
+            avail   &= fixed | ~(full_day[:, :, None] | full[:, None, None])
+            # A shift assigned to a student is not available to the others
+            avail   &= fixed | ~fixed.any(axis=0)[None, :, :]
+
+        # Tighten the min and max number of shifts of each student
+        num_fixed  = fixed.sum(axis=(1, 2))
+        capacity   = np.minimum(avail.sum(axis=2), max_day).sum(axis=1)
+        min_shifts = np.maximum(instance.min_shifts, num_fixed)
+        max_shifts = np.minimum(max_shifts, capacity)
+        infeasible = infeasible or (min_shifts > max_shifts).any() or (num_fixed > instance.max_shifts).any()
+
+        self.fixed = fixed
+        self.stats = {
+            "students":      instance.num_students(),
+            "days":          instance.num_days(),
+            "shifts":        int(existance.sum()),
+            "variables":     int(instance.availability.sum()),
+            "fixed":         int(fixed.sum()),
+            "dropped":       int(instance.availability.sum() - avail.sum()),
+            "tightened_min": int((min_shifts > instance.min_shifts).sum()),
+            "tightened_max": int((max_shifts < instance.max_shifts).sum()),
+            "infeasible":    bool(infeasible),
+        }
+        if infeasible:
+            self.components = []
+            self.stats["time"] = time.perf_counter() - t0
+            return self.components
+
+        reduced = Instance(instance.name, instance.students, instance.days, instance.shifts,
+                           avail, existance, min_shifts, max_shifts, max_day, fixed)
+        labels  = student_components(avail) if split else np.zeros(instance.num_students(), dtype=int)
+        self.components = []
+        for label in np.unique(labels):
+            students = np.nonzero((labels == label) & avail.any(axis=(1, 2)))[0]
+            if len(students) == 0:
+                continue
+            days   = np.nonzero(avail[students].any(axis=(0, 2)))[0]
+            shifts = np.nonzero(avail[students].any(axis=(0, 1)))[0]
+            comp_existance = avail[students].any(axis=0) & existance
+            self.components.append(reduced.subset(students, days, shifts, comp_existance))
+
+        # Students without any availability are dropped, they must have no min number of shifts
+        unused = ~avail.any(axis=(1, 2))
+        if (unused & (min_shifts > 0)).any():
+            self.stats["infeasible"] = True
+            self.components = []
+
+        self.stats["components"]        = len(self.components)
+        self.stats["reduced_students"]  = sum(c.num_students() for c in self.components)
+        self.stats["reduced_days"]      = max([c.num_days() for c in self.components], default=0)
+        self.stats["reduced_variables"] = int(sum(c.availability.sum() - c.fixed.sum() for c in self.components))
+        self.stats["time"]              = time.perf_counter() - t0
+        return self.components
+
+    def postsolve(self, results):
+        """
+        Merge the rosters of the components in a roster of the original instance,
+        with the days and the shifts in their original order.
+
+        Parameters:
+        -----------
+            - `results` is the list of results (dict day->dict(shift->student)) of the components
+
+        Returns:
+        --------
+        a dict which maps day->dict(shift->student)
+        """
+        merged = dict()
+        for result in results:
+            for day in result:
+                merged.setdefault(day, dict()).update(result.get(day))
+        shift_order = { t: k for k, t in enumerate(self.instance.shifts) }
+        return { day: dict(sorted(merged.get(day).items(), key=lambda i: shift_order[i[0]]))
+                 for day in self.instance.days if day in merged }
+
+    def report(self):
+        """ Return a string describing the reduction of the problem. """
+        s = self.stats
+        if s.get("infeasible"):
+            return "Presolve: the problem is infeasible."
+        if s.get("timeout") != None:
+            return "Presolve: time limit reached after solving {} of {} components.".format(s["timeout"], s["components"])
+        return ("Presolve: {fixed} forced assignments, {dropped} of {variables} availabilities dropped, "
+                "{tightened_min} min and {tightened_max} max bounds tightened, {components} components "
+                "({reduced_students} of {students} students, {reduced_variables} free variables) "
+                "in {time:.3f} seconds.").format(**s)
+
+def student_components(availability):
+    """
+    Return the label of the connected component of each student, where two students
+    are connected if they are available for the same shift.
+
+    Parameters:
+    -----------
+        - `availability` is the boolean array [students][days][shifts]
+    """
+    S = availability.shape[0]
+    parent = list(range(S))
+
+    def find(s):
+        while parent[s] != s:
+            parent[s] = parent[parent[s]]
+            s = parent[s]
+        return s
+
+    cells = availability.reshape(S, -1)
+    for shift in np.nonzero(cells.any(axis=0))[0]:
+        students = np.nonzero(cells[:, shift])[0]
+        root = find(students[0])
+        for s in students[1:]:
+            parent[find(s)] = root
+    return np.array([ find(s) for s in range(S) ])
+
+def remaining_time(timeLimit, started):
+    """
+    Return the time left of the limit `timeLimit` since `started` (0 if it is spent),
+    or None if there is no limit.
+    """
+    if timeLimit == None:
+        return None
+    return max(timeLimit - (time.time() - started), 0.0)
+
+def solve_presolved(solver, split=True):
+    """
+    Presolve the instance configured in `solver`, solve each component with the
+    same backend and model, then merge the results.
+    Each component is written in the data file `<data>_presolve_<k>.dat`.
+    With a time limit, each component gets the time left of the limit, then the whole
+    solve stays within the limit: once it is spent, the remaining components are not
+    solved and the problem has no solution.
+
+    Parameters:
+    -----------
+        - `solver` is the configured Solver object
+        - `split` if True, solve the independent components separately
+
+    Returns:
+    --------
+    a tuple (opt_val, result, presolve), where `opt_val` is evaluated on the original instance
+    """
+    started   = time.time()
+    objective = model_objective(solver.model_file)
+    with span("presolve", problem=solver.problem):
+        presolve   = Presolve(solver.instance)
+        components = presolve.run(split and objective != None)
+    if presolve.stats.get("infeasible"):
+        return None, "", presolve
+    if objective == "absdev":
+        # Not separable: the deviations are measured from the mean of the whole instance
+        opt_val, result = solver.solve()
+        return opt_val, result, presolve
+
+    opt_val = 0.0
+    results = []
+    base    = os.path.splitext(solver.data_file)[0]
+    for k, component in enumerate(components):
+        time_limit = remaining_time(solver.time_limit, started)
+        if time_limit == 0.0:
+            presolve.stats["timeout"] = k
+            return None, "", presolve
+        sub = type(solver)("{} ({}/{})".format(solver.problem, k+1, len(components)), solver.backend)
+        sub.set_opl_exe(solver.opl_exe)
+        sub.set_model(solver.model_file)
+        sub.set_data("{}_presolve_{}.dat".format(base, k+1))
+        sub.set_sparse(solver.sparse)
+        sub.set_warm_start(solver.warm_start)
+        sub.set_limits(time_limit, solver.gap_limit)
+        sub.set_incumbent_callback(solver.on_incumbent)
+        sub.set_balance_weight(solver.balance_weight)
+        sub.config_instance(component)
+        opt_val, result = sub.solve()
+        if opt_val == None or result == "":
+            return None, "", presolve
+        results.append(result)
+
+    result  = presolve.postsolve(results)
+    opt_val = objective_value(solver.instance, result, objective, solver.balance_weight) if objective != None else opt_val
+    return opt_val, result, presolve
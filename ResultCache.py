@@ -0,0 +1,96 @@
+# File:     ResultCache.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import json
+import hashlib
+
+class ResultCache:
+    """
+    On-disk cache of solve results, addressed by the hash of the model file,
+    the content of the instance and the solver settings. Each entry is a JSON file which stores
+    the objective value and the result dict. When the cache grows over its max size,
+    the least recently used entries are evicted.
+    """
+    cache_dir = ""
+    max_size  = 0
+
+    def __init__(self, cacheDir, maxSize=64*1024*1024):
+        """
+        Build the ResultCache object.
+
+        Parameters:
+        -----------
+            - `cacheDir` is the directory which contains the cache entries
+            - `maxSize` is the max size of the cache in bytes
+        """
+        self.cache_dir = cacheDir
+        self.max_size  = maxSize
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, modelPath, instance, settings=None):
+        """
+        Return the cache key of a problem. The instance is hashed instead of its data
+        file, whose header changes every time it is written (e.g. its creation date).
+
+        Parameters:
+        -----------
+            - `modelPath` is the model filepath
+            - `instance` is the Instance object of the problem
+            - `settings` is a dict of solver settings which affect the result (e.g. the backend)
+        """
+        h = hashlib.sha256()
+        with open(modelPath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        h.update(b"\0")
+        h.update(instance.digest().encode('utf-8'))
+        h.update(json.dumps(settings or dict(), sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        Return the tuple (opt_val, result) stored with `key`, or None if missing.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)      # Mark as recently used
+        return entry["opt_val"], entry["result"]
+
+    def put(self, key, opt_val, result):
+        """
+        Store the tuple (opt_val, result) with `key`, then evict old entries if needed.
+        """
+        path = self._path(key)
+        tmp  = path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"opt_val": opt_val, "result": result}, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits its max size.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        size = sum(e[1] for e in entries)
+        for mtime, entry_size, name in sorted(entries):
+            if size <= self.max_size:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            size = size - entry_size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
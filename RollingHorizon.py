@@ -0,0 +1,217 @@
+# File:     RollingHorizon.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Backend import model_objective, objective_value
+from Tracer import span
+
+class RollingHorizon:
+    """
+    Solve a long rostering problem as a sequence of windows of consecutive days
+    (by default, one for each week), instead of a single monolithic model.
+
+    The windows are coupled only by the min/max number of shifts of each student
+    and by the balancing objective. They are solved in order, carrying the running
+    totals of assigned shifts: the bounds of each window are what is left to each
+    student, and the running totals are passed to the balancing objective as offsets.
+    The `opl` models ignore the offsets and balance each window on its own, then
+    with them the balancing objectives require the polish pass.
+    If nothing couples the windows, i.e. the trips objective with non-binding
+    min/max bounds, they are solved in parallel.
+    An optional polish pass solves the whole problem warm-started from the
+    concatenated windows.
+    """
+    solver      = None
+    window_days = 0
+    polish      = False
+    max_workers = None
+    windows     = []
+    stats       = dict()
+
+    def __init__(self, solver, windowDays=0, polish=False, maxWorkers=None):
+        """
+        Build the RollingHorizon object.
+
+        Parameters:
+        -----------
+            - `solver` is the configured Solver object of the whole problem
+            - `windowDays` is the number of days of each window, 0 to split the days by week
+            - `polish` if True, solve the whole problem warm-started from the windows solution
+            - `maxWorkers` is the max number of processes which solve independent windows
+        """
+        if not polish and not balances_windows(solver):
+            raise ValueError("The {} backend does not balance the windows with the running totals".format(solver.backend.name))
+        self.solver      = solver
+        self.window_days = windowDays
+        self.polish      = polish
+        self.max_workers = maxWorkers
+        self.windows     = split_days(solver.instance.days, windowDays)
+        self.stats       = dict()
+
+    def is_parallel(self):
+        """
+        Return True if the windows are independent: the objective does not balance the
+        running totals and the min/max number of shifts cannot be violated.
+        """
+        instance = self.solver.instance
+        capacity = np.minimum(instance.availability.sum(axis=2), instance.max_shifts_per_day).sum(axis=1)
+        return (model_objective(self.solver.model_file) == "trips"
+                and not (instance.min_shifts > 0).any()
+                and not (instance.max_shifts < capacity).any())
+
+    def run(self):
+        """
+        Solve the problem window by window.
+
+        Returns:
+        --------
+        a tuple (opt_val, result), where `opt_val` is evaluated on the whole problem
+        """
+        t0        = time.perf_counter()
+        instance  = self.solver.instance
+        objective = model_objective(self.solver.model_file)
+        parallel  = self.is_parallel() and len(self.windows) > 1
+        self.stats = {"windows": len(self.windows), "parallel": parallel}
+
+        with span("rolling_horizon", problem=self.solver.problem, windows=len(self.windows)):
+            if parallel:
+                jobs = [ (self.window_solver(k), instance.subset(np.arange(instance.num_students()), days,
+                                                                 np.arange(instance.num_shifts())))
+                         for k, days in enumerate(self.windows) ]
+                with ProcessPoolExecutor(max_workers=self.max_workers or len(jobs)) as pool:
+                    results = list(pool.map(solve_window, *zip(*jobs)))
+                if any(result == "" for result in results):
+                    return self.fail(t0)
+            else:
+                results = []
+                totals  = np.zeros(instance.num_students(), dtype=int)
+                for k, days in enumerate(self.windows):
+                    window = self.window_instance(days, totals)
+                    result = solve_window(self.window_solver(k), window)
+                    if result == "":
+                        return self.fail(t0)
+                    results.append(result)
+                    totals += count_assignments(instance, result)
+
+        result  = merge_results(instance, results)
+        opt_val = objective_value(instance, result, objective, self.solver.balance_weight) if objective != None else None
+        self.stats["windows_time"] = time.perf_counter() - t0
+        self.stats["windows_objective"] = opt_val
+
+        if self.polish:
+            with span("rolling_horizon.polish", problem=self.solver.problem):
+                self.solver.set_warm_start(result)
+                polished_val, polished = self.solver.solve()
+                self.solver.set_warm_start(None)
+            if polished_val != None and polished != "":
+                opt_val, result = polished_val, polished
+
+        self.stats["time"] = time.perf_counter() - t0
+        return opt_val, result
+
+    def fail(self, t0):
+        self.stats["time"] = time.perf_counter() - t0
+        return None, ""
+
+    def window_instance(self, days, totals):
+        """
+        Return the instance of the window `days`, given the running totals of the
+        shifts assigned to each student in the previous windows.
+        The min number of shifts is what cannot be assigned in the next windows,
+        the max number of shifts is what is left, reserving the next shifts which
+        only the student can take.
+        """
+        instance = self.solver.instance
+        after    = np.arange(days[-1]+1, instance.num_days())
+        avail    = instance.availability & instance.existance[None, :, :]
+        future   = np.minimum(avail[:, after].sum(axis=2), instance.max_shifts_per_day).sum(axis=1)
+        forced   = (avail[:, after] & (avail[:, after].sum(axis=0) == 1)[None, :, :]).sum(axis=(1, 2))
+
+        window = instance.subset(np.arange(instance.num_students()), days, np.arange(instance.num_shifts()))
+        window.min_shifts = np.maximum(instance.min_shifts - totals - future, 0)
+        window.max_shifts = np.maximum(instance.max_shifts - totals - forced, window.min_shifts)
+        window.offsets    = totals.copy()
+        return window
+
+    def window_solver(self, k):
+        """ Return a Solver for the window `k`, with the same backend and model of the whole problem. """
+        solver = type(self.solver)("{} (window {}/{})".format(self.solver.problem, k+1, len(self.windows)),
+                                   self.solver.backend)
+        solver.set_opl_exe(self.solver.opl_exe)
+        solver.set_model(self.solver.model_file)
+        solver.set_data("{}_window_{}.dat".format(os.path.splitext(self.solver.data_file)[0], k+1))
+        solver.set_sparse(self.solver.sparse)
+        solver.set_limits(self.solver.time_limit, self.solver.gap_limit)
+        solver.set_balance_weight(self.solver.balance_weight)
+        return solver
+
+    def report(self):
+        """ Return a string describing the decomposition. """
+        s = self.stats
+        return "Rolling horizon: {} windows solved {} in {:.3f} seconds (objective {}{}).".format(
+               s.get("windows"), "in parallel" if s.get("parallel") else "in sequence",
+               s.get("windows_time", s.get("time", 0)), s.get("windows_objective"),
+               ", then polished" if self.polish else "")
+
+def balances_windows(solver):
+    """
+    Return True if the windows of the problem configured in `solver` are solved
+    with the running totals of the previous windows, without the polish pass:
+    the objective does not balance the students or the backend supports the offsets.
+    """
+    return model_objective(solver.model_file) == "trips" or solver.backend.supports_offsets()
+
+def split_days(days, windowDays=0):
+    """
+    Split the indices of `days` in windows of consecutive days.
+
+    Parameters:
+    -----------
+        - `days` is the list of day names (e.g. "Mon 03 Dec")
+        - `windowDays` is the number of days of each window, 0 to start a new window on each Monday
+    """
+    windows = []
+    for k, day in enumerate(days):
+        if windowDays > 0:
+            new_window = k % windowDays == 0
+        else:
+            new_window = k == 0 or day.startswith("Mon")
+        if new_window:
+            windows.append([])
+        windows[-1].append(k)
+    return [ np.array(w) for w in windows ]
+
+def solve_window(solver, window):
+    """
+    Configure `solver` with the instance `window` and solve it.
+
+    Returns:
+    --------
+    the result of the window, "" if it has no solution
+    """
+    solver.config_instance(window)
+    opt_val, result = solver.solve()
+    return result if opt_val != None else ""
+
+def count_assignments(instance, result):
+    """ Return the array of the number of shifts assigned to each student of `instance` in `result`. """
+    s_index = dict()
+    for k, p in enumerate(instance.students):
+        s_index.setdefault(p, k)
+    counts = np.zeros(instance.num_students(), dtype=int)
+    for day in result:
+        for student in result.get(day).values():
+            counts[s_index[student]] += 1
+    return counts
+
+def merge_results(instance, results):
+    """ Merge the results of the windows, with the days in the order of `instance`. """
+    merged = dict()
+    for result in results:
+        merged.update(result)
+    return { day: merged.get(day) for day in instance.days if day in merged }
@@ -3,32 +3,172 @@
 # Author:   Luigi Berducci
 # Date:     2018-11-30
 
+import io
+import os
 import sys
-import subprocess
-from subprocess import Popen, PIPE
 import datetime
+import numpy as np
+from Backend import OPLBackend, model_objective, BALANCE_OBJECTIVES
+from Instance import Instance
+from DataWriter import DataWriter, open_data_file
+from Tracer import span
+
+# Balancing objectives, "variance" is the quadratic model and the others its linear variants
+BALANCE_VARIANTS = ("variance", "minmax", "absdev", "pwl")
 
 class Solver:
     """
-    Configure problem in OPL and solve it using OPLrun executable.
+    Configure problem in OPL and solve it using a solver backend
+    (by default, the OPLrun executable).
     """
-    opl_exe      = ""
-    problem      = ""
-    data_content = ""
-    model_file   = ""
-    data_file    = ""
-    output_file  = ""
-    result       = ""
-
-    def __init__(self, probName):
+    opl_exe        = ""
+    problem        = ""
+    data_content   = ""
+    model_file     = ""
+    data_file      = ""
+    output_file    = ""
+    result         = ""
+    instance       = None
+    backend        = None
+    warm_start     = None
+    sparse         = False
+    sparse_density = None
+    time_limit     = None
+    gap_limit      = None
+    on_incumbent   = None
+    balance_weight = 0.0
+    balance_objective = "variance"
+    pool_size      = 1
+    pool_changes   = 1
+
+    def __init__(self, probName, backend=None):
         """
         Build the Solver object.
 
         Parameters:
         -----------
             - `probName` is the problem string identifier
+            - `backend` is the Backend object used to solve the problem (by default, OPLBackend)
         """
         self.problem = probName
+        self.backend = backend if backend != None else OPLBackend()
+
+    def set_backend(self, backend):
+        """
+        Set the backend used to solve the problem.
+
+        Parameters:
+        -----------
+            - `backend` is the new Backend object
+        """
+        self.backend = backend
+
+    def set_warm_start(self, result):
+        """
+        Set a previous roster to warm start the solver. The assignments which are
+        still feasible are passed to the backend as a starting solution.
+
+        Parameters:
+        -----------
+            - `result` is a dict which maps day->dict(shift->student), or None to solve from scratch
+        """
+        self.warm_start = result
+
+    def set_sparse(self, sparse):
+        """
+        Set the encoding of the availability in the data file.
+
+        Parameters:
+        -----------
+            - `sparse` if True, write the tuple set of the available (student, day, shift)
+              instead of the dense Availability tensor
+        """
+        self.sparse = sparse
+
+    def set_sparse_density(self, density):
+        """
+        Select the model variant according to the density of the poll: if the fraction
+        of available (student, day, shift) is at most `density`, use the sparse variant
+        of the model (`<model>_sparse.mod`, if it exists) and the sparse data encoding,
+        otherwise the dense ones.
+
+        Parameters:
+        -----------
+            - `density` is the density threshold, or None to always use the current model
+        """
+        self.sparse_density = density
+
+    def set_limits(self, timeLimit=None, gapLimit=None):
+        """
+        Stop the solver at the time or gap limit, returning the best roster found so far.
+
+        Parameters:
+        -----------
+            - `timeLimit` is the max solve time in seconds, or None for no limit
+            - `gapLimit` is the relative MIP gap (e.g. 0.01 for 1%) at which the solver stops, or None to prove optimality
+        """
+        self.time_limit = timeLimit
+        self.gap_limit  = gapLimit
+
+    def set_incumbent_callback(self, callback):
+        """
+        Set the function called by the backend at each improving solution found while solving.
+
+        Parameters:
+        -----------
+            - `callback` takes the incumbent dict {"time", "objective", "bound", "gap"},
+              where `bound` and `gap` are None if unknown, or None to disable it
+        """
+        self.on_incumbent = callback
+
+    def set_balance_weight(self, weight):
+        """
+        Set how the combined model (`BalancedTrips_getCSV.mod`) trades the number of trips
+        for the balancing of the shifts.
+
+        Parameters:
+        -----------
+            - `weight` is the weight of the mean variance in `trips + weight*variance`, or 0 to
+              minimize the trips first and then balance the rosters with the min number of trips
+        """
+        self.balance_weight = weight
+
+    def set_balance_objective(self, objective):
+        """
+        Select how the balancing model measures the balance of the shifts, switching to its
+        linear variant (`<model>_<objective>.mod`, if it exists). Call it after `set_model`.
+
+        Parameters:
+        -----------
+            - `objective` is "variance" (the quadratic model), "minmax" (min the max number of
+              shifts), "absdev" (min the mean absolute deviation) or "pwl" (min the variance with
+              a piecewise-linear square)
+        """
+        if objective not in BALANCE_VARIANTS:
+            raise ValueError("Unknown balance objective \"{}\", choose one of {}".format(objective, list(BALANCE_VARIANTS)))
+        self.balance_objective = objective
+        if model_objective(self.model_file) not in BALANCE_OBJECTIVES:
+            return
+        # The linear variants have no sparse model, fall back to the dense one
+        model = balance_model_file(self.model_file, objective)
+        if not os.path.exists(model):
+            model = balance_model_file(dense_model_file(self.model_file), objective)
+        if os.path.exists(model):
+            self.model_file = model
+            self.sparse     = self.sparse and sparse_model_file(model) == model
+
+    def set_pool(self, size, minChanges=1):
+        """
+        Set the number of alternative rosters returned by `solve_pool`.
+
+        Parameters:
+        -----------
+            - `size` is the max number of rosters
+            - `minChanges` is the min number of different assignments between two rosters
+              (the `opl` backend keeps the most diverse rosters of the CPLEX solution pool instead)
+        """
+        self.pool_size    = size
+        self.pool_changes = minChanges
 
     def set_opl_exe(self, oplExecutable):
         """
@@ -88,186 +228,137 @@ class Solver:
                     - `part` is a list of participants which express `shift` as preference
         """
         all_shifts = get_all_shifts(calendar)
+        days       = list(options.keys())
+
+        # Availability tensor [students][days][shifts], built in one pass over the preferences
+        with span("data.availability", problem=self.problem):
+            availability = build_availability(participants, days, all_shifts, calendar)
+
+        if self.sparse_density != None and availability.size > 0:
+            self.select_model_variant(bool(availability.mean() <= self.sparse_density))
+
+        # Existance of shifts: a shift exists if at least one participant is available
+        existance           = availability.any(axis=0)
+        num_existing_shifts = int(existance.sum())
+
+        # Min and max number of shifts for each student, defaults are 0 and the number of existing shifts
+        for p in minMaxShifts:
+            minShifts, maxShifts = minMaxShifts.get(p)
+            minMaxShifts[p] = (minShifts if minShifts != None else 0,
+                               maxShifts if maxShifts != None else num_existing_shifts)
+        min_shifts = np.array([minMaxShifts.get(p)[0] for p in minMaxShifts], dtype=int)
+        max_shifts = np.array([minMaxShifts.get(p)[1] for p in minMaxShifts], dtype=int)
+
+        # Keep the in-memory instance for in-process backends
+        self.config_instance(Instance(self.problem, list(participants), days, all_shifts,
+                                      availability, existance, min_shifts, max_shifts,
+                                      maxShiftsPerDay),
+                             list(minMaxShifts))
+
+    def config_instance(self, instance, names=None):
+        """
+        Set the problem to solve from an Instance object and write its data file.
 
-        # Header
-        self.data_content += "/*********************************************\n"
-        self.data_content += " * Name: {}\n".format(self.problem)
-        self.data_content += " * This file is generated automatically\n"
-        self.data_content += " *\n"
-        self.data_content += " * Creation Date: {}\n".format(datetime.date.today())
-        self.data_content += " *********************************************/\n"
-        self.data_content += "\n"
-
-        # Parameters
-        self.data_content += "/* Define the parameters */\n"
-        self.data_content += "numStudents = {};\n".format(len(participants))
-        self.data_content += "numDays     = {};\n".format(len(options.keys()))
-        self.data_content += "numShifts   = {};\n".format(len(all_shifts))
-        self.data_content += "\n"
-        self.data_content += "MaxNumShiftsPerDay = {};\n".format(maxShiftsPerDay)
-        self.data_content += "\n"
-
-        # Student names
-        self.data_content += "/* Define the student names */\n"
-        self.data_content += "StudNames = #[\n"
-        for k, p_name in enumerate(participants):
-            if k == len(participants)-1:
-                self.data_content += "    {}: \"{}\"\n".format(k+1, p_name)
-            else:
-                self.data_content += "    {}: \"{}\",\n".format(k+1, p_name)
-        self.data_content += "]#;\n"
-        self.data_content += "\n"
-
-        # Day names
-        self.data_content += "/* Define the day names */\n"
-        self.data_content += "DayNames = #[\n"
-        for k, d_name in enumerate(options.keys()):
-            if k == len(options.keys())-1:
-                self.data_content += "    {}: \"{}\"\n".format(k+1, d_name)
-            else:
-                self.data_content += "    {}: \"{}\",\n".format(k+1, d_name)
-        self.data_content += "]#;\n"
-        self.data_content += "\n"
-
-        # Shift names
-        self.data_content += "/* Define the shift names */\n"
-        self.data_content += "ShiftNames = #[\n"
-        for k, t_name in enumerate(all_shifts):
-            if k == len(all_shifts)-1:
-                self.data_content += "    {}: \"{}\"\n".format(k+1, t_name)
-            else:
-                self.data_content += "    {}: \"{}\",\n".format(k+1, t_name)
-        self.data_content += "]#;\n"
-        self.data_content += "\n"
-
-
-        # Existance of shifts
-        num_existing_shifts = 0
-        self.data_content += "/* Define the existing shifts */\n"
-        self.data_content += "Existance = #[\n"
-        for k, d_name in enumerate(options.keys()):
-            string_array = []
-            for kk, s_name in enumerate(all_shifts):
-                if s_name in options.get(d_name) and len(calendar.get(d_name).get(s_name))>0:
-                    string_array.append(1)
-                    num_existing_shifts = num_existing_shifts + 1
-                else:
-                    string_array.append(0)
-            if k == len(options.keys())-1:
-                self.data_content += "    {}: {}    /* {} */\n".format(k+1, str(string_array), d_name)
-            else:
-                self.data_content += "    {}: {},   /* {} */\n".format(k+1, str(string_array), d_name)
-        self.data_content += "]#;"
-        self.data_content += "\n"
-
-        # Availability of students
-        self.data_content += "/* Define students availability */\n"
-        self.data_content += "Availability = [\n"
-        for k, p_name in enumerate(participants):
-            self.data_content += "    #[    /* {} */\n".format(p_name)
-            for kk, d_name in enumerate(options.keys()):
-                string_array = []
-                for kkk, s_name in enumerate(all_shifts):
-                    if calendar.get(d_name).get(s_name)!=None and p_name in calendar.get(d_name).get(s_name):
-                        string_array.append(1)
-                    else:
-                        string_array.append(0)
-                if kk == len(options.keys())-1:
-                    self.data_content += "        {}:    {}    /* {} */\n".format(kk+1, str(string_array), d_name)
-                else:
-                    self.data_content += "        {}:    {},   /* {} */\n".format(kk+1, str(string_array), d_name)
-            if k == len(participants)-1:
-                self.data_content += "     ]#\n"
-            else:
-                self.data_content += "     ]#,\n"
-        self.data_content += "];\n"
-        self.data_content += "\n"
-
-        # Compute the number of free shifts (i.e. the number of shifts that are not required by participants)
-        num_remaining_shifts = num_existing_shifts
-        for p_id in minMaxShifts.keys():
-            if minMaxShifts.get(p_id)[0] == None:
-                continue
-            num_remaining_shifts = num_remaining_shifts - minMaxShifts.get(p_id)[0]
-
-        # Minimum number of shifts for each students
-        self.data_content += "/* Define the minimum number of shifts to assign to students */\n"
-        self.data_content += "MinNumShifts = #[\n"
-        for k, p in enumerate(minMaxShifts):
-            if minMaxShifts.get(p)[0] == None:
-                minMaxShifts[p] = (0, minMaxShifts.get(p)[1])
-            if k == len(minMaxShifts)-1:
-                self.data_content += "    {}: {}    /* {} */\n".format(k+1, minMaxShifts.get(p)[0], p)
-            else:
-                self.data_content += "    {}: {},   /* {} */\n".format(k+1, minMaxShifts.get(p)[0], p)
-        self.data_content += "]#;\n"
-        self.data_content += "\n"
-
-        # Maximum number of shifts for each students
-        self.data_content += "/* Define the max number of shifts to assign to students */\n"
-        self.data_content += "MaxNumShifts = #[\n"
-        for k, p in enumerate(minMaxShifts):
-            if minMaxShifts.get(p)[1] == None:
-                minMaxShifts[p] = (minMaxShifts.get(p)[0], num_existing_shifts)
-            if k == len(minMaxShifts)-1:
-                self.data_content += "    {}: {}    /* {} */\n".format(k+1, minMaxShifts.get(p)[1], p)
+        Parameters:
+        -----------
+            - `instance` is the Instance object
+            - `names` is the list of names commented in the min and max number of shifts, by default the students
+        """
+        self.instance = instance
+        names = names if names != None else instance.students
+
+        # Stream the data to the data file if defined, otherwise keep it in `data_content`
+        with span("data.write", problem=self.problem):
+            if self.data_file != "":
+                with open_data_file(self.data_file) as dat:
+                    self.write_data(DataWriter(dat, self.sparse), names)
             else:
-                self.data_content += "    {}: {},   /* {} */\n".format(k+1, minMaxShifts.get(p)[1], p)
-        self.data_content += "]#;\n"
-        self.data_content += "\n"
+                content = io.StringIO()
+                self.write_data(DataWriter(content, self.sparse), names)
+                self.data_content = content.getvalue()
 
-        # If data file defined, write data content
-        if self.data_file != "":
-            with open(self.data_file, 'w') as dat:
-                dat.write(self.data_content)
-
-    def solve(self):
+    def select_model_variant(self, sparse):
         """
-        Run OPLrun executable to solve the problem.
+        Switch to the sparse (or dense) variant of the current model and data encoding,
+        if the model variant exists.
         """
-        if self.opl_exe == "" or self.model_file == "" or self.data_file == "":
-            return
-        # subprocess.call([self.opl_exe, self.model_file, self.data_file])
-        p = subprocess.Popen([self.opl_exe, self.model_file, self.data_file], stdout=PIPE)
-        out = p.communicate()
+        model = sparse_model_file(self.model_file) if sparse else dense_model_file(self.model_file)
+        if os.path.exists(model):
+            self.model_file = model
+            self.sparse     = sparse
 
-        opt_val = None                      # Optimal value initialization
-        out_lines = str(out).split("\\n")
-        begin = 0                           # Begin line CSV output
-        end   = len(out_lines)              # End line CSV output
+    def write_data(self, writer, names):
+        """
+        Write the data of the current instance section by section.
 
-        for l, line in enumerate(out_lines):
-            if "OBJECTIVE" in line:     # Retrieve optimal result of objective function
-                opt_val = line.split(": ")[1]
-            if "no solution" in line:   # Retrieve unsolvability and eventually break execution
-                return None,""
-            if "[Info]" in line:    # Retrieve the delimiters lines, discarding the cplex output
-                if "Begin output" in line:  # Starting line
-                    begin = l
-                elif "End output" in line:  # Final line
-                    end   = l
-                else:
-                    continue
+        Parameters:
+        -----------
+            - `writer` is the DataWriter object
+            - `names` is the list of names commented in the min and max number of shifts
+        """
+        instance = self.instance
+        writer.write_header(self.problem, datetime.date.today())
 
-        # Initialize result structure
-        result = dict()
+        # Parameters
+        writer.write_comment("Define the parameters")
+        writer.write_scalar("numStudents", instance.num_students(), 11)
+        writer.write_scalar("numDays", instance.num_days(), 11)
+        writer.write_scalar("numShifts", instance.num_shifts(), 11)
+        writer.write_newline()
+        writer.write_scalar("MaxNumShiftsPerDay", instance.max_shifts_per_day)
+        writer.write_newline()
+        if model_objective(self.model_file) == "combined":
+            writer.write_scalar("BalanceWeight", float(self.balance_weight))
+            writer.write_newline()
+
+        # Student, day and shift names
+        writer.write_comment("Define the student names")
+        writer.write_names("StudNames", instance.students)
+        writer.write_comment("Define the day names")
+        writer.write_names("DayNames", instance.days)
+        writer.write_comment("Define the shift names")
+        writer.write_names("ShiftNames", instance.shifts)
+
+        # Existing shifts and availability of students
+        writer.write_comment("Define the existing shifts")
+        writer.write_existance(instance.existance, instance.days)
+        writer.write_comment("Define students availability")
+        writer.write_availability(instance.availability, instance.students, instance.days)
+
+        # Minimum and maximum number of shifts for each student
+        writer.write_comment("Define the minimum number of shifts to assign to students")
+        writer.write_values("MinNumShifts", instance.min_shifts.tolist(), names)
+        writer.write_comment("Define the max number of shifts to assign to students")
+        writer.write_values("MaxNumShifts", instance.max_shifts.tolist(), names)
 
-        # Return the result
-        for l, line in enumerate(out_lines[begin+1 : end]):
-            if line=="":
-                continue
-            split_line = line.split(",")
+    def solve(self):
+        """
+        Solve the problem using the current backend.
 
-            day     = split_line[0]
-            shift   = split_line[1]
-            student = split_line[2]
+        Returns:
+        --------
+        a tuple (opt_val, result), where `result` is a dict which maps day->dict(shift->student)
+        """
+        return self.backend.solve(self)
 
-            if result.get(day)==None:
-                result[day] = dict()
+    def solve_pool(self):
+        """
+        Solve the problem and return up to `pool_size` alternative rosters from a single
+        solver session.
 
-            result[day][shift] = student
+        Returns:
+        --------
+        the list of pairs (opt_val, result), the best roster first
+        """
+        return self.backend.solve_pool(self, self.pool_size)
 
-        return opt_val, result
+    def stream(self):
+        """
+        Solve the problem using the current backend and yield the roster rows
+        (day, shift, student) as soon as they are available.
+        The objective value is then available in `self.backend.opt_val`.
+        """
+        return self.backend.stream(self)
 
 
     def get_result():
@@ -287,6 +378,24 @@ class Solver:
         with open(outFile, 'w') as out:
             out.write(result)
 
+def sparse_model_file(modelPath):
+    """ Return the filepath of the sparse variant of the model `modelPath`. """
+    base, ext = os.path.splitext(dense_model_file(modelPath))
+    return base + "_sparse" + ext
+
+def dense_model_file(modelPath):
+    """ Return the filepath of the dense variant of the model `modelPath`. """
+    base, ext = os.path.splitext(modelPath)
+    return (base[:-len("_sparse")] if base.endswith("_sparse") else base) + ext
+
+def balance_model_file(modelPath, objective):
+    """ Return the filepath of the `objective` variant (see `BALANCE_VARIANTS`) of the balancing model `modelPath`. """
+    base, ext = os.path.splitext(modelPath)
+    for variant in BALANCE_VARIANTS:
+        if base.endswith("_" + variant):
+            base = base[:-len(variant)-1]
+    return base + ("" if objective == "variance" else "_" + objective) + ext
+
 def get_all_shifts(calendar):
     """
     Return a sorted set containing all the shifts which may occur in a single day.
@@ -296,3 +405,38 @@ def get_all_shifts(calendar):
          for k, t in enumerate(calendar.get(d).keys()):
              shift_names.add(t)
     return sorted(shift_names)
+
+
+def build_availability(participants, days, shifts, calendar):
+    """
+    Return the boolean availability tensor [participants][days][shifts],
+    visiting each preference in `calendar` only once.
+
+    Parameters:
+    -----------
+        - `participants` is the list of participant names
+        - `days` is the list of day names
+        - `shifts` is the sorted list of shift names
+        - `calendar` is a dict which map day->dict(shift->list of participants)
+    """
+    # Participants with the same name share the same preferences
+    p_index = dict()
+    for k, p_name in enumerate(participants):
+        p_index.setdefault(p_name, []).append(k)
+    d_index = { d: k for k, d in enumerate(days) }
+    t_index = { t: k for k, t in enumerate(shifts) }
+
+    s_ids, d_ids, t_ids = [], [], []
+    for d, prefs in calendar.items():
+        if d not in d_index:
+            continue
+        for t, names in prefs.items():
+            for p_name in names:
+                for s in p_index.get(p_name, ()):
+                    s_ids.append(s)
+                    d_ids.append(d_index[d])
+                    t_ids.append(t_index[t])
+
+    availability = np.zeros((len(participants), len(days), len(shifts)), dtype=bool)
+    availability[s_ids, d_ids, t_ids] = True
+    return availability
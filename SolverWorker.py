@@ -0,0 +1,569 @@
+# File:     SolverWorker.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import sys
+import copy
+import json
+import time
+import signal
+import atexit
+import getpass
+import argparse
+import tempfile
+import threading
+import subprocess
+from subprocess import PIPE, DEVNULL
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from Backend import Backend, get_backend
+from Instance import read_data_file
+from Tracer import span
+
+# Environment variable which passes the authentication key to the worker process
+AUTHKEY_ENV = "BIBLIOSHIFTS_WORKER_KEY"
+# Environment variable which overrides the state file of the worker
+STATE_ENV   = "BIBLIOSHIFTS_WORKER_STATE"
+# Seconds without requests after which the worker exits
+IDLE_TIMEOUT = 900.0
+
+def state_file():
+    """
+    Return the filepath where the worker of the current user publishes its address, pid and key,
+    for the clients of the next runs.
+    """
+    if os.environ.get(STATE_ENV):
+        return os.environ[STATE_ENV]
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), "biblioshifts-worker-{}.json".format(user))
+
+def read_state(path):
+    """
+    Return the dict published by the worker in `path`, or None if it is missing or it may
+    have been written by another user (then its key could be known to them).
+    """
+    try:
+        stat = os.stat(path)
+        if hasattr(os, "getuid") and (stat.st_uid != os.getuid() or stat.st_mode & 0o077):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        return state if all(k in state for k in ("host", "port", "pid", "authkey")) else None
+    except (OSError, ValueError):
+        return None
+
+def write_state(path, state):
+    """ Write the dict `state` in `path`, readable only by the current user and replaced atomically. """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".biblioshifts-worker-")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+class SolverWorker:
+    """
+    Long-lived solver process, which accepts the problems of the clients over a local
+    socket and solves them with its backends, so that the interpreter, the backends
+    (e.g. SciPy) and the instances already read are loaded once and reused by all the
+    solves of all the runs. Its address and key are published in a state file, where
+    the clients of the next runs find it; it exits after `idle` seconds without requests.
+    Each client is served in its own thread, then parallel runs are solved concurrently.
+
+    The requests are dicts with the key "op":
+        - "ping" returns the pid and the number of solves, as a health check;
+        - "solve" solves the pickled Solver "solver" with the backend "backend" and returns
+          the list "pool" of pairs (opt_val, result), up to "size" rosters; the incumbents
+          are sent back as soon as they are found;
+        - "shutdown" stops the worker and the solvers it is running.
+    """
+    listener  = None
+    instances = dict()
+    solves    = 0
+    running   = 0
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=None, idle=IDLE_TIMEOUT, stateFile=None):
+        """
+        Build the SolverWorker object and open its socket.
+
+        Parameters:
+        -----------
+            - `address` is the (host, port) of the socket, port 0 to pick a free one
+            - `authkey` is the key shared with the clients (bytes)
+            - `idle` is the number of seconds without requests after which the worker exits
+            - `stateFile` is the filepath where the address, the pid and the key are published
+        """
+        self.listener  = Listener(address, authkey=authkey)
+        self.authkey   = authkey
+        self.idle      = idle
+        self.stateFile = stateFile
+        self.instances = dict()
+        self.solves    = 0
+        self.running   = 0
+        self.last      = time.time()
+        self.lock      = threading.Lock()
+
+    def address(self):
+        """ Return the (host, port) where the worker accepts the clients. """
+        return self.listener.address
+
+    def publish(self):
+        """ Publish the address, the pid and the key of the worker in its state file. """
+        if self.stateFile != None:
+            host, port = self.address()
+            write_state(self.stateFile, {"host": host, "port": port, "pid": os.getpid(),
+                                         "authkey": self.authkey.hex()})
+
+    def serve(self):
+        """
+        Serve each client in its own thread, until a "shutdown" request or `idle` seconds
+        without requests.
+        """
+        threading.Thread(target=self.watch, daemon=True).start()
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, EOFError):
+                continue    # A client without the key
+            except OSError:
+                self.exit()
+            threading.Thread(target=self.serve_client, args=(conn,), daemon=True).start()
+
+    def serve_client(self, conn):
+        """ Answer the requests of the client of `conn`, until it disconnects. """
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return  # The client disconnected
+                if request.get("op") == "shutdown":
+                    conn.send({"op": "done"})
+                    self.exit()
+                with self.lock:
+                    self.running += 1
+                try:
+                    conn.send(self.handle(request, conn))
+                except (EOFError, OSError):
+                    return
+                finally:
+                    with self.lock:
+                        self.running -= 1
+                        self.last = time.time()
+
+    def watch(self):
+        """ Exit once no request is running and the last one ended more than `idle` seconds ago. """
+        while True:
+            time.sleep(min(self.idle, 1.0))
+            with self.lock:
+                if self.running == 0 and time.time() - self.last >= self.idle:
+                    self.exit()
+
+    def exit(self):
+        """
+        Remove the state file, if it is still the one of this worker, then exit killing the
+        solvers still running (e.g. oplrun), which are in the process group of the worker.
+        """
+        state = read_state(self.stateFile) if self.stateFile != None else None
+        if state != None and state["pid"] == os.getpid():
+            try:
+                os.remove(self.stateFile)
+            except OSError:
+                pass
+        sys.stdout.flush()
+        if hasattr(os, "killpg") and os.getpgrp() == os.getpid():
+            os.killpg(os.getpid(), signal.SIGKILL)
+        os._exit(0)
+
+    def handle(self, request, conn):
+        """ Return the response to `request`, sending the incumbents on `conn` while solving. """
+        op = request.get("op")
+        if op == "ping":
+            return {"op": "pong", "pid": os.getpid(), "solves": self.solves}
+        if op != "solve":
+            return {"op": "error", "error": ValueError("Unknown request \"{}\"".format(op))}
+        try:
+            solver = request["solver"]
+            solver.set_backend(get_backend(request["backend"]))
+            if request.get("incumbents"):
+                solver.set_incumbent_callback(lambda incumbent: conn.send({"op": "incumbent", "incumbent": incumbent}))
+            if solver.instance == None and solver.data_file != "":
+                solver.instance = self.instance(solver.data_file)
+            with span("worker.solve", backend=request["backend"]):
+                if request.get("size", 1) > 1:
+                    pool = solver.backend.solve_pool(solver, request["size"])
+                else:
+                    opt_val, result = solver.backend.solve(solver)
+                    pool = [(opt_val, result)] if opt_val != None else []
+            with self.lock:
+                self.solves += 1
+            return {"op": "result", "pool": pool}
+        except Exception as e:
+            return {"op": "error", "error": e}
+
+    def instance(self, dataFile):
+        """
+        Return the Instance of the data file `dataFile`, read again only if the file changed.
+        """
+        stat = os.stat(dataFile)
+        key  = (os.path.abspath(dataFile), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.instances:
+                return self.instances[key]
+        instance = read_data_file(dataFile)
+        with self.lock:
+            self.instances = { k: v for k, v in self.instances.items() if k[0] != key[0] }
+            self.instances[key] = instance
+        return instance
+
+class WorkerClient:
+    """
+    Connect to the worker published in the state file, or start a new one if there is
+    none or it does not answer: the worker outlives the client, then the next runs reuse
+    it. Before each request the worker must answer a ping within `timeout` seconds,
+    otherwise it is killed and started again. A request interrupted by a crash of the
+    worker is sent once more to a new worker. A solve with a time limit must be answered
+    within the limit plus `grace` seconds, otherwise the worker is killed and started again.
+    """
+    timeout  = 5.0
+    grace    = 30.0
+    idle     = IDLE_TIMEOUT
+    owner    = None
+    process  = None
+    pid      = None
+    conn     = None
+    restarts = 0
+
+    def __init__(self, timeout=5.0, grace=30.0, idle=IDLE_TIMEOUT, stateFile=None):
+        """
+        Build the WorkerClient object, the worker is found or started by the first request.
+
+        Parameters:
+        -----------
+            - `timeout` is the max number of seconds to wait for the worker to answer a ping
+            - `grace` is the max number of seconds a solve may last beyond its time limit
+            - `idle` is the number of seconds without requests after which a worker started by this client exits
+            - `stateFile` is the filepath where the worker is published, by default `state_file()`
+        """
+        self.timeout   = timeout
+        self.grace     = grace
+        self.idle      = idle
+        self.stateFile = stateFile if stateFile != None else state_file()
+        self.owner     = os.getpid()
+        self.process   = None
+        self.pid       = None
+        self.conn      = None
+        self.restarts  = 0
+
+    def connect(self):
+        """
+        Connect to the worker published in the state file. Return False if there is none,
+        or if it does not accept the connection within the timeout: then `pid` is the one
+        of the worker only if it is still listening (i.e. it is hung), None otherwise.
+        """
+        self.pid = None
+        state = read_state(self.stateFile)
+        if state == None:
+            return False
+        connected, failed = [], []
+        def attempt():
+            try:
+                connected.append(Client((state["host"], state["port"]), authkey=bytes.fromhex(state["authkey"])))
+            except (OSError, EOFError, AuthenticationError) as e:
+                failed.append(e)    # Not listening anymore, or another process on the port
+        # A hung worker would never answer the authentication
+        thread = threading.Thread(target=attempt, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if len(failed) > 0:
+            return False
+        self.pid = state["pid"]
+        if len(connected) == 0:
+            return False
+        self.conn = connected[0]
+        return True
+
+    def start(self):
+        """
+        Start a new worker process, detached from the client, and connect to it.
+        """
+        authkey = os.urandom(16)
+        env = dict(os.environ)
+        env[AUTHKEY_ENV] = authkey.hex()
+        env[STATE_ENV]   = self.stateFile
+        with span("worker.start"), open(os.path.splitext(self.stateFile)[0] + ".log", 'a') as log:
+            # In its own session, to outlive the client and to kill also the solvers it runs (e.g. oplrun)
+            self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--idle", str(self.idle)],
+                                            stdin=DEVNULL, stdout=PIPE, stderr=log, env=env,
+                                            universal_newlines=True, start_new_session=True)
+            # The worker prints its address on the first line, once published
+            line = self.process.stdout.readline()
+            self.process.stdout.close()
+            if line == "":
+                self.process.wait()
+                raise RuntimeError("The solver worker exited with code {}".format(self.process.returncode))
+            host, port = line.split()
+            self.pid  = self.process.pid
+            self.conn = Client((host, int(port)), authkey=authkey)
+
+    def running(self):
+        """ Return True if the worker process is running. """
+        if self.pid == None:
+            return False
+        if self.process != None and self.process.pid == self.pid:
+            return self.process.poll() == None
+        if not hasattr(os, "getuid"):
+            return True     # Not a child, only the connection tells
+        try:
+            os.kill(self.pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def alive(self):
+        """ Return True if the worker is running and answers a ping within the timeout. """
+        if self.conn == None or not self.running():
+            return False
+        try:
+            self.conn.send({"op": "ping"})
+            if not self.conn.poll(self.timeout):
+                return False
+            return self.conn.recv().get("op") == "pong"
+        except (EOFError, OSError):
+            return False
+
+    def ensure(self):
+        """
+        Make sure that the client is connected to a healthy worker: the current one, the one
+        published in the state file, or a new one, killing the worker which does not answer.
+        """
+        if self.alive():
+            return
+        restart = self.conn != None
+        self.close()
+        if self.connect() and self.alive():
+            return
+        if self.pid != None and self.running():
+            self.kill()     # Published, but it does not answer
+            restart = True
+        self.close()
+        if restart:
+            self.restarts += 1
+        self.start()
+
+    def request(self, message, onMessage=None):
+        """
+        Send `message` to the worker and return its response, (re)starting the worker if
+        it is not healthy or if it crashes while serving the request.
+
+        Parameters:
+        -----------
+            - `message` is the request dict
+            - `onMessage` is called with each intermediate message (e.g. the incumbents)
+        """
+        for attempt in range(2):
+            self.ensure()
+            try:
+                self.conn.send(message)
+                deadline = self.deadline(message)
+                while True:
+                    response = self.receive(deadline)
+                    if response.get("op") != "incumbent":
+                        return response
+                    if onMessage != None:
+                        onMessage(response)
+            except TimeoutError:
+                raise   # A hung solve would hang again, do not send it once more
+            except (EOFError, OSError):
+                if attempt == 1:
+                    raise RuntimeError("The solver worker crashed twice on the same request")
+
+    def deadline(self, message):
+        """ Return the time by which the worker must answer `message`, or None if unbounded. """
+        solver = message.get("solver")
+        if solver == None or solver.time_limit == None:
+            return None
+        return time.time() + solver.time_limit + self.grace
+
+    def receive(self, deadline=None):
+        """
+        Return the next message of the worker. While waiting, check every `timeout` seconds
+        that the worker is still running; past `deadline` kill it, start a new one and raise
+        a TimeoutError.
+        """
+        while True:
+            wait = self.timeout if deadline == None else min(self.timeout, deadline - time.time())
+            if self.conn.poll(max(wait, 0)):
+                return self.conn.recv()
+            if not self.running():
+                raise EOFError("The solver worker {} exited".format(self.pid))
+            if deadline != None and time.time() >= deadline:
+                self.kill()
+                self.restarts += 1
+                self.start()
+                raise TimeoutError("The solver worker did not answer within the time limit")
+
+    def kill(self):
+        """
+        Kill the worker process and its solvers, without waiting for it to answer,
+        and remove its state file.
+        """
+        self.close()
+        if self.pid != None:
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(self.pid, signal.SIGKILL)
+                else:
+                    os.kill(self.pid, signal.SIGTERM)
+            except OSError:
+                pass    # Already exited
+            state = read_state(self.stateFile)
+            if state != None and state["pid"] == self.pid:
+                try:
+                    os.remove(self.stateFile)
+                except OSError:
+                    pass
+        if self.process != None:
+            self.process.wait()
+            self.process = None
+        self.pid = None
+
+    def close(self):
+        """
+        Close the connection to the worker, which keeps running for the next clients.
+        """
+        if self.conn != None:
+            self.conn.close()
+            self.conn = None
+
+    def shutdown(self):
+        """
+        Shut down the worker published in the state file, killing it if it does not answer.
+        Return False if there is no worker.
+        """
+        if self.conn == None and not self.connect() and not self.running():
+            return False
+        if self.conn != None:
+            try:
+                self.conn.send({"op": "shutdown"})
+                self.conn.poll(self.timeout)
+            except (EOFError, OSError):
+                pass
+            self.close()
+        deadline = time.time() + self.timeout
+        while self.running() and time.time() < deadline:
+            time.sleep(0.05)
+        if self.running():
+            self.kill()
+        if self.process != None:
+            self.process.wait()
+            self.process = None
+        self.pid = None
+        return True
+
+class WorkerBackend(Backend):
+    """
+    Solve the problem in a persistent solver worker (see SolverWorker), with the backend
+    `backend`. The worker is shared by all the WorkerBackend objects and by all the runs
+    of the user, then only the first solve after the worker exited pays its startup.
+    A copy of the backend sent to another process (e.g. the parallel windows of
+    RollingHorizon) connects to the same worker.
+    """
+    name    = "worker"
+    backend = "opl"
+    client  = None
+
+    def __init__(self, backend="opl", client=None):
+        """
+        Build the WorkerBackend object.
+
+        Parameters:
+        -----------
+            - `backend` is the name of the backend which solves the problems in the worker
+            - `client` is the WorkerClient object, by default the one shared by the process
+        """
+        get_backend(backend)    # Check the name
+        self.backend = backend
+        self.client  = client
+
+    def __getstate__(self):
+        # The client holds the connection of this process only
+        state = dict(self.__dict__)
+        state["client"] = None
+        return state
+
+    def supports(self, modelPath):
+        return get_backend(self.backend).supports(modelPath)
+
+    def supports_offsets(self):
+        return get_backend(self.backend).supports_offsets()
+
+    def solve(self, solver):
+        pool = self.solve_pool(solver, 1)
+        self.opt_val, result = pool[0] if len(pool) > 0 else (None, "")
+        self.solved = self.opt_val != None
+        return self.opt_val, result
+
+    def solve_pool(self, solver, size):
+        self.start(solver)
+        # The backend and the callback stay in this process, the incumbents are replayed
+        job = copy.copy(solver)
+        job.backend      = None
+        job.on_incumbent = None
+        # The worker is shared with the runs started in other directories
+        for attr in ("model_file", "data_file"):
+            if getattr(job, attr) != "":
+                setattr(job, attr, os.path.abspath(getattr(job, attr)))
+        if os.path.dirname(job.opl_exe) != "":
+            job.opl_exe = os.path.abspath(job.opl_exe)
+        message  = {"op": "solve", "backend": self.backend, "solver": job, "size": size,
+                    "incumbents": solver.on_incumbent != None}
+        client   = self.client if self.client != None else default_client()
+        response = client.request(message, lambda m: self.add_incumbent(**replay(m["incumbent"])))
+        if response.get("op") == "error":
+            raise response["error"]
+        return response["pool"]
+
+def replay(incumbent):
+    """ Return the arguments of `Backend.add_incumbent` for an incumbent dict sent by the worker. """
+    return {"objective": incumbent["objective"], "bound": incumbent["bound"], "gap": incumbent["gap"]}
+
+DEFAULT_CLIENT = None
+
+def default_client():
+    """ Return the WorkerClient shared by the process, disconnected at exit (the worker keeps running). """
+    global DEFAULT_CLIENT
+    # A forked process (e.g. of a ProcessPoolExecutor) must not share the connection of its parent
+    if DEFAULT_CLIENT == None or DEFAULT_CLIENT.owner != os.getpid():
+        DEFAULT_CLIENT = WorkerClient()
+        atexit.register(DEFAULT_CLIENT.close)
+    return DEFAULT_CLIENT
+
+if __name__=="__main__":
+    argParser = argparse.ArgumentParser(description="Persistent solver worker, started by WorkerClient")
+    argParser.add_argument("--port", help="port of the local socket (by default, a free one)", type=int, default=0)
+    argParser.add_argument("--idle", help="exit after this number of seconds without requests (default: {})".format(IDLE_TIMEOUT), type=float, default=IDLE_TIMEOUT)
+    argParser.add_argument("--shutdown", help="shut down the running worker and exit", action="store_true")
+    args = argParser.parse_args()
+
+    if args.shutdown:
+        if not WorkerClient().shutdown():
+            print("No solver worker is running")
+        sys.exit(0)
+    key = os.environ.get(AUTHKEY_ENV)
+    if not key:
+        # Without a key any local process could send pickled requests to the worker
+        print("[Error] {} is not set, the worker is started by WorkerClient".format(AUTHKEY_ENV), file=sys.stderr)
+        sys.exit(1)
+    worker = SolverWorker(("127.0.0.1", args.port), bytes.fromhex(key), args.idle, state_file())
+    worker.publish()
+    host, port = worker.address()
+    print(host, port, flush=True)
+    # Nothing else goes to the client, the output of the backends goes to the log
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    worker.serve()
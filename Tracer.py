@@ -0,0 +1,161 @@
+# File:     Tracer.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:     # Not available on Windows
+    resource = None
+
+class Tracer:
+    """
+    Collect timing spans of the pipeline stages (Doodle fetch, data serialization,
+    solve, Excel write, ...). Each span records its start, duration and the peak
+    memory allocated by Python while it was open. Spans can be exported as JSON
+    or in the Chrome trace format (chrome://tracing, Perfetto).
+    When the tracer is disabled, opening a span costs almost nothing.
+    """
+    enabled = False
+    spans   = []
+
+    def __init__(self):
+        """
+        Build a disabled Tracer object.
+        """
+        self.enabled = False
+        self.spans   = []
+        self.stack   = []
+        self.origin  = time.time()
+
+    def enable(self, traceMemory=True):
+        """
+        Start collecting spans.
+
+        Parameters:
+        -----------
+            - `traceMemory` if True, trace the Python allocations to get the peak memory of each span
+        """
+        self.enabled = True
+        self.spans   = []
+        self.stack   = []
+        if traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        """
+        Stop collecting spans.
+        """
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Context manager which records a span named `name`, with the optional attributes `args`.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        record = {"name": name, "args": args, "pid": os.getpid(), "tid": threading.get_ident(),
+                  "start": time.time(), "peak_memory": 0}
+        if tracemalloc.is_tracing():
+            # Propagate the peak reached so far to the enclosing span, then measure this one
+            self.update_parent_peak(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.stack.append(record)
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - t0
+            self.stack.pop()
+            if tracemalloc.is_tracing():
+                record["peak_memory"] = max(record["peak_memory"], tracemalloc.get_traced_memory()[1])
+                self.update_parent_peak(record["peak_memory"])
+                tracemalloc.reset_peak()
+            if resource != None:
+                record["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            self.spans.append(record)
+
+    def event(self, name, start, **args):
+        """
+        Record a span named `name` which began at `start` (as returned by time.time()) and ends now.
+        """
+        if not self.enabled:
+            return
+        self.spans.append({"name": name, "args": args, "pid": os.getpid(), "tid": threading.get_ident(),
+                           "start": start, "duration": time.time() - start, "peak_memory": 0})
+
+    def update_parent_peak(self, peak):
+        if len(self.stack) > 0:
+            self.stack[-1]["peak_memory"] = max(self.stack[-1]["peak_memory"], peak)
+
+    def extend(self, spans):
+        """
+        Add the spans collected by another tracer (e.g. in a worker process).
+        """
+        self.spans.extend(spans)
+
+    def export_json(self, outputFile):
+        """
+        Write the spans in a JSON file, as a list of dicts with name, start, duration (seconds),
+        peak memory (bytes) and attributes.
+        """
+        with open(outputFile, 'w') as out:
+            json.dump(sorted(self.spans, key=lambda s: s["start"]), out, indent=4)
+
+    def export_chrome(self, outputFile):
+        """
+        Write the spans in the Chrome trace event format (complete events, in microseconds).
+        """
+        events = []
+        for s in self.spans:
+            args = dict(s["args"])
+            args["peak_memory"] = s["peak_memory"]
+            if "max_rss" in s:
+                args["max_rss"] = s["max_rss"]
+            events.append({"name": s["name"], "ph": "X", "pid": s["pid"], "tid": s["tid"],
+                           "ts": (s["start"] - self.origin) * 1e6, "dur": s["duration"] * 1e6,
+                           "args": args})
+        with open(outputFile, 'w') as out:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, out)
+
+    def export(self, outputFile):
+        """
+        Write the spans in `outputFile`: Chrome trace format if the file name ends
+        with `.trace.json` or `.trace`, plain JSON otherwise.
+        """
+        if outputFile.endswith(".trace.json") or outputFile.endswith(".trace"):
+            self.export_chrome(outputFile)
+        else:
+            self.export_json(outputFile)
+
+# Tracer of the current process
+TRACER = Tracer()
+
+def span(name, **args):
+    """ Open a span in the tracer of the current process. """
+    return TRACER.span(name, **args)
+
+def traced_call(function, *args, **kwargs):
+    """
+    Call `function(*args, **kwargs)` in a worker process with tracing enabled.
+
+    Returns:
+    --------
+    the tuple (return value of `function`, list of spans collected in the worker)
+    """
+    TRACER.enable()
+    value = function(*args, **kwargs)
+    TRACER.disable()
+    return value, TRACER.spans
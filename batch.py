@@ -0,0 +1,168 @@
+# File:     batch.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import argparse
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import main
+from main import CONF, CONFIG_FILE, info, error
+from DoodleParser import DoodleParser, DOODLE_API
+from PollSnapshot import PollSnapshot
+from ResultCache import ResultCache
+
+def read_batch_file(batchFile):
+    """
+    Read the list of polls to roster. Each line of the batch file has format
+    `pollID,constraintsFile[,name]` (lines starting with '#' are comments), where
+    `constraintsFile` is read by `main.read_constraints_file` and `name` is used for
+    printing purposes (by default, the pollID).
+
+    Returns:
+    --------
+    a list of tuples (pollID, constraintsFile, name)
+    """
+    polls = []
+    with open(batchFile, 'r') as batch:
+        for line in batch.readlines():
+            line = line.strip()
+            if line=="" or line[0]=='#':
+                continue
+            split = [ s.strip() for s in line.split(",") ]
+            if len(split) < 2:
+                error("batch line \"{}\" not valid.".format(line))
+                exit(1)
+            name = split[2] if len(split) > 2 else split[0]
+            polls.append((split[0], split[1], name))
+    return polls
+
+def fetch_poll(pollID, snapshot, session):
+    """
+    Parse the poll `pollID` and return the tuple (parser, elapsed seconds).
+    """
+    t0 = time.time()
+    parser = DoodleParser(pollID, snapshot, session=session, apiURL=CONF.get("doodle_api", DOODLE_API))
+    return parser, time.time()-t0
+
+def solve_job(job):
+    """
+    Run `main.run_all_process` on the dict of keyword arguments `job` in a worker
+    process and return the elapsed seconds.
+    """
+    t0 = time.time()
+    main.run_all_process(**job)
+    return time.time()-t0
+
+def run_batch(polls, problems, backend, fetchWorkers, solveWorkers, cache=None):
+    """
+    Fetch all the polls concurrently, with a pooled HTTP session, and feed each
+    parsed poll into a bounded pool of solver processes as soon as it is ready.
+
+    Parameters:
+    -----------
+        -`polls` is the list of tuples (pollID, constraintsFile, name)
+        -`problems` is the list of problem numbers to solve for each poll
+        -`backend` is the name of the solver backend
+        -`fetchWorkers` is the max number of concurrent downloads
+        -`solveWorkers` is the max number of concurrent solver processes
+        -`cache` is the ResultCache object, if any
+
+    Returns:
+    --------
+    a dict which maps pollID->dict of timings (fetch, solve of each problem, total)
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=fetchWorkers, pool_maxsize=fetchWorkers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    snapshot = PollSnapshot(CONF["snapshot_dir"], CONF.get("doodle_api", DOODLE_API), session) if CONF.get("snapshot_dir") else None
+
+    timings = { pollID: {"solve": dict()} for pollID, _, _ in polls }
+    started = { pollID: time.time() for pollID, _, _ in polls }
+    with ThreadPoolExecutor(max_workers=fetchWorkers) as fetchers, \
+         ProcessPoolExecutor(max_workers=solveWorkers) as solvers:
+        fetches = { fetchers.submit(fetch_poll, pollID, snapshot, session): (pollID, constraintsFile, name)
+                    for pollID, constraintsFile, name in polls }
+        solves = dict()
+        for future in as_completed(fetches):
+            pollID, constraintsFile, name = fetches[future]
+            try:
+                parser, elapsed = future.result()
+            except Exception as e:
+                error("Poll {} not fetched: {}".format(pollID, e))
+                timings[pollID]["error"] = str(e)
+                continue
+            timings[pollID]["fetch"] = elapsed
+            info("Parsing Doodle {}...\tDONE".format(pollID))
+
+            for n in problems:
+                model_filepath, data_filepath, output_filepath = main.get_problem_filepaths(n)
+                data_filepath   = os.path.join(os.path.dirname(data_filepath), pollID + "_" + os.path.basename(data_filepath))
+                output_filepath = os.path.join(os.path.dirname(output_filepath), pollID + "_" + os.path.basename(output_filepath))
+                try:
+                    constraints = main.read_constraints_file(constraintsFile, parser.get_participants(), n)
+                except (OSError, ValueError) as e:
+                    error("Poll {} problem {} not solved: {}".format(pollID, n, e))
+                    timings[pollID]["error"] = str(e)
+                    continue
+                job = dict(problem_name=name, model_filepath=model_filepath, data_filepath=data_filepath,
+                           output_filepath=output_filepath, offline=False, opl_exe_path=CONF["oplrun"], parser=parser,
+                           backend=backend, constraints=constraints, cache=cache, sparse_density=CONF.get("sparse_density"))
+                solves[solvers.submit(solve_job, job)] = (pollID, n)
+
+        for future in as_completed(solves):
+            pollID, n = solves[future]
+            try:
+                timings[pollID]["solve"][n] = future.result()
+            except Exception as e:
+                error("Poll {} problem {} failed: {}".format(pollID, n, e))
+                timings[pollID]["error"] = str(e)
+            timings[pollID]["total"] = time.time()-started[pollID]
+    return timings
+
+def print_report(timings, elapsed):
+    """
+    Print the per-poll timings and the aggregate throughput.
+    """
+    info("Poll\tFetch\tSolve\tTotal")
+    num_solved = 0
+    for pollID, t in timings.items():
+        num_solved += len(t["solve"])
+        solve = " ".join("{}:{:.3f}".format(n, s) for n, s in sorted(t["solve"].items()))
+        info("{}\t{:.3f}\t{}\t{:.3f}".format(pollID, t.get("fetch", 0), solve, t.get("total", 0)))
+    info("Rostered {} polls ({} problems) in {:.3f} seconds: {:.3f} polls/s, {:.3f} problems/s.".format(
+         len(timings), num_solved, elapsed, len(timings)/elapsed, num_solved/elapsed))
+
+if __name__=="__main__":
+    argParser = argparse.ArgumentParser()
+
+    argParser.add_argument("batchFile", help="file with a line `pollID,constraintsFile[,name]` for each poll")
+    argParser.add_argument("--problem", help="select the problem you want to solve", type=int)
+    argParser.add_argument("--backend", help="select the solver backend (override the config file)", choices=sorted(main.BACKENDS))
+    argParser.add_argument("--fetch-jobs", help="max number of concurrent downloads", type=int, default=8)
+    argParser.add_argument("--jobs",    help="max number of concurrent solver processes", type=int, default=os.cpu_count())
+    argParser.add_argument("--no-cache", help="always run the solver, ignoring the result cache", action="store_true")
+
+    args = argParser.parse_args()
+
+    t0 = time.time()
+    main.parse_config_file(CONFIG_FILE)
+    backend = args.backend if args.backend!=None else CONF.get("backend", "opl")
+    cache   = None
+    if CONF.get("cache_dir") and not(args.no_cache):
+        cache = ResultCache(CONF["cache_dir"], CONF.get("cache_size", 64*1024*1024))
+
+    problems = sorted(CONF["problems"].keys())
+    if args.problem!=None:
+        if args.problem not in CONF["problems"]:
+            error("problem {} not defined in {}.".format(args.problem, CONFIG_FILE))
+            exit(1)
+        problems = [args.problem]
+
+    polls   = read_batch_file(args.batchFile)
+    timings = run_batch(polls, problems, backend, args.fetch_jobs, args.jobs, cache)
+    print_report(timings, time.time()-t0)
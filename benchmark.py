@@ -0,0 +1,200 @@
+# File:     benchmark.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import main
+from DoodleParser import DoodleParser
+from Solver import Solver
+from SolverWorker import WorkerBackend
+from Backend import get_backend, model_objective, objective_value, BACKENDS
+from Presolve import solve_presolved
+from RollingHorizon import RollingHorizon, balances_windows
+import synthetic
+
+# Max number of shifts per day for each model (by default 1, None for all the shifts of a day)
+MAX_SHIFTS_PER_DAY = {"MinTrips_getCSV.mod": None}
+
+def parse_size(size):
+    """ Parse a size string `students`x`days`x`shifts` (e.g. 20x20x3). """
+    return tuple(int(v) for v in size.lower().split("x"))
+
+def git_revision():
+    """ Return the current git commit, or None outside of a git repository. """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(function, *args):
+    """ Return the tuple (result of `function(*args)`, elapsed seconds). """
+    t0 = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter()-t0
+
+def relative_gap(value, best):
+    """
+    Return the gap of `value` from the optimum `best`, relative to `best` when it is
+    larger than 1 (the balancing objective is often close to 0), or None if any is missing.
+    """
+    if value == None or best == None:
+        return None
+    return (value - best) / max(abs(best), 1.0)
+
+def run_case(workDir, size, density, seed, models, backends, oplExe, sparseDensity=None, presolve=False, rolling=None, balanceObjectives=("variance",), worker=False):
+    """
+    Benchmark one synthetic instance: Doodle ingestion, problem configuration,
+    solve with each model/backend and Excel export are timed separately.
+    The backends which do not support a model are skipped; the objective of each
+    backend is compared with the first one.
+
+    The balancing models are solved with each of `balanceObjectives` (see
+    `Solver.set_balance_objective`): the speed of each variant is its solve time and
+    its quality is the mean variance of its roster, compared with the first variant.
+    If `worker` is True, the problems are solved in the persistent solver worker.
+
+    If `sparseDensity` is given, the sparse model variants are used for the instances
+    with at most that density. If `presolve` is True, the presolved solve is timed too.
+    If `rolling` is given, the rolling horizon with windows of `rolling` days (0 for
+    one window per week) is timed too, with its optimality gap against the whole problem,
+    unless the backend does not balance the windows with the running totals (`opl`).
+
+    Returns:
+    --------
+    a list of dict, one for each (model, backend), with the timings of each stage
+    """
+    numStudents, numDays, shiftsPerDay = size
+    pollID   = synthetic.poll_id(numStudents, numDays, shiftsPerDay, density, seed)
+    poll     = synthetic.generate_poll(numStudents, numDays, shiftsPerDay, density, seed)
+    snapshot = synthetic.write_poll_snapshot(os.path.join(workDir, "snapshots"), pollID, poll)
+
+    parser, t_parse = timed(DoodleParser, pollID, snapshot, True)
+    participants = parser.get_participants()
+
+    records = []
+    cases   = [ (model, objective) for model in models for objective in balanceObjectives
+                if objective == balanceObjectives[0] or model_objective(model) == "balance" ]
+    quality = dict()    # Mean variance of the first balance objective of each model and backend
+    for model, objective in cases:
+        maxShiftsPerDay = MAX_SHIFTS_PER_DAY.get(os.path.basename(model), 1) or shiftsPerDay
+        reference = None    # Objective of the first backend, to compare the others
+        for backend in backends:
+            solver = Solver(pollID, WorkerBackend(backend) if worker else get_backend(backend))
+            solver.set_model(model)
+            solver.set_balance_objective(objective)
+            if not solver.backend.supports(solver.model_file):
+                continue
+            record = {
+                "instance": pollID, "students": numStudents, "days": numDays, "shifts": shiftsPerDay,
+                "density": density, "seed": seed, "model": os.path.basename(model), "backend": backend,
+                "worker": worker, "parse": t_parse,
+            }
+            solver.set_opl_exe(oplExe)
+            solver.set_data(os.path.join(workDir, pollID + ".dat"))
+            solver.set_sparse_density(sparseDensity)
+
+            minMaxShifts = { p: (None, None) for p in participants }
+            _, record["config"] = timed(solver.config_problem, participants, parser.get_options(),
+                                        parser.get_calendar(), minMaxShifts, maxShiftsPerDay)
+            record["preferences"] = int(solver.instance.availability.sum())
+            record["data_bytes"]  = os.path.getsize(solver.data_file)
+            record["sparse"]      = solver.sparse
+            record["model"]       = os.path.basename(solver.model_file)
+
+            (opt_val, result), record["solve"] = timed(solver.solve)
+            record["objective"] = opt_val
+            if reference == None:
+                reference = (backend, opt_val)
+            record["backend_gap"] = relative_gap(opt_val, reference[1])
+            if model_objective(model) == "balance":
+                record["balance_objective"] = objective
+                record["variance"] = objective_value(solver.instance, result, "balance") if opt_val != None else None
+                quality.setdefault((model, backend), record["variance"])
+                record["variance_gap"] = relative_gap(record["variance"], quality[(model, backend)])
+            if presolve:
+                (presolved_val, _, reduction), record["presolve_solve"] = timed(solve_presolved, solver)
+                record["presolve_objective"] = presolved_val
+                record["presolve"] = reduction.stats
+            if rolling != None and balances_windows(solver):
+                horizon = RollingHorizon(solver, rolling)
+                (rolling_val, _), record["rolling_solve"] = timed(horizon.run)
+                record["rolling_objective"] = rolling_val
+                record["rolling_windows"]   = horizon.stats.get("windows")
+                record["rolling_gap"]       = relative_gap(rolling_val, opt_val)
+            if opt_val != None and result != "":
+                output = os.path.join(workDir, pollID + ".xlsx")
+                _, record["excel"] = timed(main.write_result_to_excel, result, output, pollID[:31])
+            records.append(record)
+            print("[Info] {} {} {}: parse {:.3f}s, config {:.3f}s, solve {:.3f}s, excel {:.3f}s".format(
+                  pollID, record["model"], backend, record["parse"], record["config"],
+                  record["solve"], record.get("excel", 0)))
+            if record.get("balance_objective", balanceObjectives[0]) != balanceObjectives[0]:
+                print("[Info]     {} objective {}, mean variance {} ({} {}), gap {}".format(
+                      objective, opt_val, record["variance"], balanceObjectives[0],
+                      quality[(model, backend)], record["variance_gap"]))
+            if reference[0] != backend:
+                print("[Info]     objective {} ({} {}), gap {}".format(opt_val, reference[0], reference[1],
+                                                                        record["backend_gap"]))
+            if presolve:
+                print("[Info]     presolved solve {:.3f}s, saved {:.3f}s, objective {} (full {})".format(
+                      record["presolve_solve"], record["solve"]-record["presolve_solve"],
+                      record["presolve_objective"], opt_val))
+            if "rolling_solve" in record:
+                print("[Info]     rolling horizon ({} windows) {:.3f}s, objective {} (full {}), gap {}".format(
+                      record["rolling_windows"], record["rolling_solve"], record["rolling_objective"],
+                      opt_val, record["rolling_gap"]))
+    return records
+
+if __name__=="__main__":
+    argParser = argparse.ArgumentParser()
+
+    argParser.add_argument("--sizes",    help="comma-separated instance sizes `students`x`days`x`shifts`", default="10x10x3,20x20x3,40x40x3")
+    argParser.add_argument("--density",  help="probability that a participant is available for a shift", type=float, default=0.3)
+    argParser.add_argument("--seeds",    help="number of seeds for each size", type=int, default=1)
+    argParser.add_argument("--models",   help="comma-separated model files", default="models/LibraryModel_getCSV.mod,models/MinTrips_getCSV.mod")
+    argParser.add_argument("--backends", help="comma-separated solver backends", default="milp")
+    argParser.add_argument("--output",   help="JSON file where the results are written", default="bench/results.json")
+    argParser.add_argument("--presolve", help="time also the solve of the presolved problem", action="store_true")
+    argParser.add_argument("--rolling-horizon", help="time also the rolling horizon with windows of DAYS days (by default, one week)", type=int, nargs="?", const=0, metavar="DAYS")
+    argParser.add_argument("--balance-objectives", help="comma-separated balance objectives of the balancing models (variance, minmax, absdev, pwl)", default="variance")
+    argParser.add_argument("--worker",   help="solve in a persistent solver worker process", action="store_true")
+    argParser.add_argument("--sparse-density", help="use the sparse models for the instances with at most this density", type=float)
+
+    args = argParser.parse_args()
+
+    main.parse_config_file(main.CONFIG_FILE)
+    backends = args.backends.split(",")
+    for backend in backends:
+        if backend not in BACKENDS:
+            main.error("unknown backend {}".format(backend))
+            exit(1)
+
+    records = []
+    with tempfile.TemporaryDirectory() as workDir:
+        for size in args.sizes.split(","):
+            for seed in range(args.seeds):
+                records += run_case(workDir, parse_size(size), args.density, seed,
+                                    args.models.split(","), backends, main.CONF.get("oplrun", ""),
+                                    args.sparse_density, args.presolve, args.rolling_horizon,
+                                    tuple(args.balance_objectives.split(",")), args.worker)
+
+    if os.path.dirname(args.output) != "":
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as out:
+        json.dump({
+            "revision": git_revision(),
+            "date":     datetime.datetime.now().isoformat(),
+            "python":   platform.python_version(),
+            "machine":  platform.machine(),
+            "results":  records,
+        }, out, indent=4)
+    main.info("Results written in {}".format(args.output))
@@ -6,14 +6,31 @@
 import argparse
 import sys
 import os
+import re
+import json
+import hashlib
+import fnmatch
 import xlsxwriter
 import time
-from DoodleParser import DoodleParser
+from concurrent.futures import ProcessPoolExecutor
+from DoodleParser import DoodleParser, DOODLE_API
 from Solver import Solver
+from Backend import get_backend, warm_start_tensor, rows_to_result, model_objective, objective_value, BACKENDS
+from Instance import read_data_file
+from ResultCache import ResultCache
+from PollSnapshot import PollSnapshot
+from Tracer import TRACER, span, traced_call
+from Presolve import solve_presolved
+from RollingHorizon import RollingHorizon
+from SolverWorker import WorkerBackend
+from Exporter import get_exporter, export_filepath, export_rows, result_rows, tee_rows, EXPORTERS
 
 CONFIG_FILE = "config.in"
 CONF = dict()
 
+# Map the prefix of the problem keys in the config file (e.g. MOD_PROB_1) -> CONF key
+PROB_KEYS = {"MOD": "model_file", "DATA": "data_file", "OUT": "out_file"}
+
 def error(string):
     """ Print error message.
 
@@ -53,14 +70,41 @@ def get_all_shifts(calendar):
     return sorted(shift_names)
 
 
+def run_parallel(jobs, maxWorkers=None):
+    """
+    Run `run_all_process` for each job in a pool of processes.
+    The wall-clock time is the one of the slowest job.
+    If tracing is enabled, the spans collected by the workers are merged in TRACER.
+
+    Parameters:
+    -----------
+        -`jobs` is a list of dicts of keyword arguments for `run_all_process`
+        -`maxWorkers` is the max number of processes, by default one for each job
+    """
+    if len(jobs) == 0:
+        return
+    with ProcessPoolExecutor(max_workers=maxWorkers or len(jobs)) as pool:
+        if TRACER.enabled:
+            futures = [ pool.submit(traced_call, run_all_process, **job) for job in jobs ]
+            for future in futures:
+                _, spans = future.result()
+                TRACER.extend(spans)
+        else:
+            futures = [ pool.submit(run_all_process, **job) for job in jobs ]
+            for future in futures:
+                future.result()
+
 def parse_config_file(configFile):
     """
     Extract variables from the config file given as input.
+    The problems are defined by the keys MOD_PROB_<n>, DATA_PROB_<n>, OUT_PROB_<n>
+    and collected in CONF["problems"], which maps n->dict(model_file, data_file, out_file).
 
     Parameters:
     -----------
         - `configFile` is the config file
     """
+    CONF["problems"] = dict()
     with open(configFile, 'r') as config:
         for line in config.readlines():
             if line[0]=='#':        # Skip commented lines
@@ -74,24 +118,33 @@ def parse_config_file(configFile):
                 CONF["name"] = split[1]
             elif split[0]=="OPLRUN":
                 CONF["oplrun"] = split[1]
+            elif split[0]=="BACKEND":
+                CONF["backend"] = split[1]
+            elif split[0]=="DOODLE_API":
+                CONF["doodle_api"] = split[1]
+            elif split[0]=="CONSTRAINTS_FILE":
+                CONF["constraints_file"] = split[1]
+            elif split[0]=="SNAPSHOT_DIR":
+                CONF["snapshot_dir"] = split[1]
+            elif split[0]=="CACHE_DIR":
+                CONF["cache_dir"] = split[1]
+            elif split[0]=="CACHE_SIZE_MB":
+                CONF["cache_size"] = int(split[1])*1024*1024
+            elif split[0]=="SPARSE_DENSITY":
+                CONF["sparse_density"] = float(split[1])
+            elif split[0]=="BALANCE_WEIGHT":
+                CONF["balance_weight"] = float(split[1])
+            elif split[0]=="BALANCE_OBJECTIVE":
+                CONF["balance_objective"] = split[1]
             elif split[0]=="OUT_DIR":
                 CONF["out_dir"] = split[1]
             elif split[0]=="MOD_DIR":
                 CONF["model_dir"] = split[1]
             elif split[0]=="DATA_DIR":
                 CONF["data_dir"] = split[1]
-            elif split[0]=="MOD_PROB_1":
-                CONF["model_file"] = split[1]
-            elif split[0]=="DATA_PROB_1":
-                CONF["data_file"] = split[1]
-            elif split[0]=="OUT_PROB_1":
-                CONF["out_file"] = split[1]
-            elif split[0]=="MOD_PROB_2":
-                CONF["model_file_min_trips"] = split[1]
-            elif split[0]=="DATA_PROB_2":
-                CONF["data_file_min_trips"] = split[1]
-            elif split[0]=="OUT_PROB_2":
-                CONF["out_file_min_trips"] = split[1]
+            elif re.match(r"(MOD|DATA|OUT)_PROB_\d+$", split[0]):
+                key, _, n = split[0].split("_")
+                CONF["problems"].setdefault(int(n), dict())[PROB_KEYS[key]] = split[1]
             else:
                 pass
 
@@ -125,9 +178,146 @@ def ask_for_min_max_shifts(participants):
             minMaxShifts[p] = (validate_value(n[0]), validate_value(n[1]))
     return minMaxShifts
 
-def write_result_to_excel(result, output_file, problem_name):
+def read_constraints_file(constraintsFile, participants, problem=None):
     """
-    Write the result in an Excel file.
+    Read the min, max number of shifts of each participant and the max number of
+    shifts per day from a constraints file, instead of asking them to the user.
+    The file contains lines `KEY=value` (lines starting with '#' are comments):
+        - `MAX_SHIFTS_PER_DAY=val` is the max number of shifts per day (by default, 1)
+        - `MAX_SHIFTS_PER_DAY_<n>=val` overrides it for the problem number n
+        - `<participant name>=min,max`, `min` or `,max` are the shifts of that participant,
+          an empty value leaves the participant without constraints
+        - `<pattern>=min,max` applies to the participants whose name matches the wildcard
+          pattern (`*`, `?`, `[seq]`, e.g. `Student *`), the first matching pattern wins
+        - `DEFAULT=min,max` applies to the participants without a rule
+    The exact names win over the patterns. Participants without any rule have no constraints.
+    The whole file is validated before returning, all the invalid lines are reported together.
+
+    Parameters:
+    -----------
+        -`constraintsFile` is the constraints filepath
+        -`participants` is the list of participants
+        -`problem` is the problem number
+
+    Returns:
+    --------
+    a tuple (minMaxShifts, maxShiftsPerDay), as `ask_for_min_max_shifts` and `ask_for_max_shifts_per_day`,
+    raise ValueError if the file is not valid
+    """
+    with open(constraintsFile, 'r') as constraints:
+        rules, maxShiftsXDay = parse_constraints(constraints.readlines(), problem, constraintsFile)
+    for name in rules:
+        if name != "DEFAULT" and not is_pattern(name) and name not in participants:
+            info("{}: no participant named \"{}\", rule ignored.".format(constraintsFile, name))
+    return resolve_min_max_shifts(rules, participants), maxShiftsXDay
+
+def parse_constraints(lines, problem=None, source="constraints"):
+    """
+    Parse and validate the lines of a constraints file (see `read_constraints_file`) in one pass.
+
+    Returns:
+    --------
+    a tuple (rules, maxShiftsPerDay), where `rules` maps each participant name, pattern
+    or DEFAULT to the pair (min, max), in the order of the file (None if not given)
+    """
+    rules    = dict()
+    per_day  = dict()
+    seen     = set()
+    problems = []
+    for k, line in enumerate(lines):
+        line = line.strip().replace("\"", "")
+        if line == "" or line[0] == '#':     # Skip empty and commented lines
+            continue
+        key, sep, value = line.partition("=")
+        key, value = key.strip(), value.strip()
+        if sep == "" or key == "":
+            problems.append("line {}: expected `KEY=value`, found \"{}\"".format(k+1, line))
+            continue
+        if key in seen:
+            problems.append("line {}: \"{}\" is defined twice".format(k+1, key))
+            continue
+        seen.add(key)
+        if re.match(r"MAX_SHIFTS_PER_DAY(_\d+)?$", key):
+            if not re.match(r"\d+$", value) or int(value) < 1:
+                problems.append("line {}: {} must be a positive integer, found \"{}\"".format(k+1, key, value))
+            else:
+                per_day[key] = int(value)
+        else:
+            minMax = parse_min_max(value)
+            if minMax == None:
+                problems.append("line {}: the shifts of \"{}\" must be `min,max`, `min` or `,max`, found \"{}\"".format(k+1, key, value))
+            else:
+                rules[key] = minMax
+    if len(problems) > 0:
+        raise ValueError("Invalid constraints in {}:\n  {}".format(source, "\n  ".join(problems)))
+
+    maxShiftsXDay = per_day.get("MAX_SHIFTS_PER_DAY_{}".format(problem), per_day.get("MAX_SHIFTS_PER_DAY", 1))
+    return rules, maxShiftsXDay
+
+def parse_min_max(value):
+    """
+    Parse the shifts `min,max`, `min`, `,max` or `` (no constraints) of a participant.
+
+    Returns:
+    --------
+    the pair (min, max), with None for the missing values, or None if `value` is not valid
+    """
+    split = [ v.strip() for v in value.split(",") ]
+    if len(split) > 2 or not all(v == "" or re.match(r"\d+$", v) for v in split):
+        return None
+    minMax = tuple(int(v) if v != "" else None for v in split + [""]*(2-len(split)))
+    if minMax[0] != None and minMax[1] != None and minMax[0] > minMax[1]:
+        return None
+    return minMax
+
+def is_pattern(name):
+    """ Return True if the rule `name` is a wildcard pattern. """
+    return any(c in name for c in "*?[")
+
+def resolve_min_max_shifts(rules, participants):
+    """
+    Return the dict participant->(min, max) of the `rules` (see `read_constraints_file`):
+    the rule of the exact name, else the first matching pattern, else DEFAULT.
+
+    Parameters:
+    -----------
+        -`rules` maps each participant name, pattern or DEFAULT to the pair (min, max), in order
+        -`participants` is the list of participants
+    """
+    default  = tuple(rules.get("DEFAULT", (None, None)))
+    patterns = [ (name, minMax) for name, minMax in rules.items()
+                 if name != "DEFAULT" and name not in participants and is_pattern(name) ]
+    minMaxShifts = dict()
+    for p in participants:
+        if p in rules:
+            minMaxShifts[p] = tuple(rules[p])
+        else:
+            minMaxShifts[p] = next((tuple(minMax) for name, minMax in patterns if fnmatch.fnmatchcase(p, name)), default)
+    return minMaxShifts
+
+def load_constraints(constraintsFile, parser, problem):
+    """
+    Return the constraints of the problem number `problem` read from `constraintsFile`
+    for the participants of `parser`, or None if there is no file or no poll.
+    Exit if the file is not valid.
+    """
+    if constraintsFile==None or parser==None:
+        return None
+    try:
+        return read_constraints_file(constraintsFile, parser.get_participants(), problem)
+    except (OSError, ValueError) as e:
+        error(str(e))
+        exit(1)
+
+# Weekdays, as the prefix of the day names (e.g. "Mon 03 Dec")
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def write_result_to_excel(result, output_file, problem_name, shifts=None):
+    """
+    Write the result in an Excel file: a table for each week, with a column for each
+    weekday (Saturday and Sunday only if some shift is on the weekend) and a row for each
+    shift, followed by the number of shifts assigned to each student.
+    The workbook is written row by row in constant memory mode.
 
     Parameters:
     -----------
@@ -138,94 +328,225 @@ def write_result_to_excel(result, output_file, problem_name):
                         -`student` is the name of the student assigned to `shift` in `day`
         -`output_file` is the filename of output file
         -`problem_name` is a string which names the problem, for printing purposes
+        -`shifts` is the sorted list of shift names, by default the shifts in `result`
     """
     # Drawing parameters
-    interline  = 1
-    offset_inc = 3
     inter_table_summary = 3
 
-    columns   = ["B", "C", "D", "E", "F"]
-    i_columns = [ 1,   2,   3,   4,   5 ]
-    days      = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-
-    shifts  = get_all_shifts(result)
-
-    offset = 1
-    first_occurrence = True
+    shifts   = shifts if shifts != None else get_all_shifts(result)
+    weekend  = any(d[0:3] in ("Sat", "Sun") for d in result.keys())
+    days     = WEEKDAYS if weekend else WEEKDAYS[:5]
+    # Maps weekday->column and shift->row offset in the table of a week
+    day_col   = { dd: k+1 for k, dd in enumerate(days) }
+    shift_row = { t: k+1 for k, t in enumerate(shifts) }
 
     # XlsxWriter creation and formats
-    my_workbook  = xlsxwriter.Workbook(output_file)
-    my_worksheet = my_workbook.add_worksheet(problem_name)
+    my_workbook  = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    my_worksheet = my_workbook.add_worksheet(problem_name[:31])
     default_fmt  = my_workbook.add_format()
     centered_fmt = my_workbook.add_format({'align':'center', 'valign':'vcenter'})
     bold_cnt_fmt = my_workbook.add_format({'bold':1, 'align':'center', 'valign':'vcenter'})
 
-    # Preliminary setup
-    max_lenght = 0              # Max lenght of student name
-    for d in result.keys():
-        for t in result.get(d):
-            lenght = len(result.get(d).get(t))
-            max_lenght = max(max_lenght, lenght)
-    # Set column width and merge first cells for title
-    my_worksheet.set_column(0, 0, max_lenght, default_fmt)
-    my_worksheet.set_column(i_columns[0], i_columns[-1], max_lenght, centered_fmt)
-    my_worksheet.merge_range("A1:{}1".format(columns[-1]), "", centered_fmt)
-
-    # Header
-    my_worksheet.write("A1", "Automatic assignment for {}".format(problem_name), bold_cnt_fmt)
-    offset = offset + 1
-    for dd, cc in zip(days, columns):
-        my_worksheet.write( "{}{}".format(cc, str(offset)), dd, bold_cnt_fmt)
-    offset = offset + 1
+    # Header: title and weekdays
+    my_worksheet.merge_range(0, 0, 0, len(days), "", centered_fmt)
+    my_worksheet.write(0, 0, "Automatic assignment for {}".format(problem_name), bold_cnt_fmt)
+    for dd, cc in day_col.items():
+        my_worksheet.write(1, cc, dd, bold_cnt_fmt)
 
-    # Loop on lines
+    # Write the weeks one after the other: the cells of a week are buffered, then written row by row
+    max_lenght    = 0       # Max lenght of student name
     students_stat = dict()  # Shifts-assigned counter for statistics
-    for k, d in enumerate(result.keys()):
-        if d.startswith("Mon") and first_occurrence:
-            first_occurrence = False
-            if k != 0:  # No increment on first week
-                offset = offset + offset_inc + interline
-
-            date = int(d.split(" ")[1])
-            for cc in columns:
-                if date > 31:
-                    break
-                my_worksheet.write( "{}{}".format(cc, str(offset)), date, bold_cnt_fmt)
-                date = date + 1
-            for rr, t in enumerate(shifts):
-                my_worksheet.write( "A{}".format(str(offset+rr+1)), t, bold_cnt_fmt)
-
-        if d.startswith("Fri"):
-            first_occurrence = True
-
-        for k, t in enumerate(result.get(d)):
-            student = result.get(d).get(t)
-            if students_stat.get(student)==None: # Eventually initialize counter
-                students_stat[student] = 0
-            students_stat[student] = students_stat.get(student) + 1 # Increment counter
-
-            current_col = columns[ days.index(d[0:3]) ]
-            current_row = str(offset + shifts.index(t) + 1)
-
-            my_worksheet.write( "{}{}".format(current_col, current_row), student )
+    offset        = 2
+    week          = []
+    last_col      = len(days)+1
+
+    def write_week(offset, week):
+        # Dates of the week, starting from its first day
+        first_day, _ = week[0]
+        date = int(first_day.split(" ")[1]) - day_col[first_day[0:3]] + 1
+        for cc in range(1, len(days)+1):
+            if date + cc - 1 > 31:
+                break
+            if date + cc - 1 > 0:
+                my_worksheet.write(offset, cc, date + cc - 1, bold_cnt_fmt)
+        rows = [ [None] * (len(days)+1) for _ in shifts ]
+        for d, shifts_of_day in week:
+            for t, student in shifts_of_day.items():
+                rows[shift_row[t]-1][day_col[d[0:3]]] = student
+        for rr, t in enumerate(shifts):
+            my_worksheet.write(offset+rr+1, 0, t, bold_cnt_fmt)
+            for cc, student in enumerate(rows[rr]):
+                if student != None:
+                    my_worksheet.write(offset+rr+1, cc, student, centered_fmt)
+        return offset + len(shifts) + 1
+
+    for d, shifts_of_day in result.items():
+        col = day_col[d[0:3]]
+        if len(week) > 0 and col <= last_col:
+            offset = write_week(offset, week)
+            week   = []
+        week.append((d, shifts_of_day))
+        last_col = col
+        for student in shifts_of_day.values():
+            students_stat[student] = students_stat.get(student, 0) + 1
+            max_lenght = max(max_lenght, len(student))
+    if len(week) > 0:
+        offset = write_week(offset, week)
 
     # Write summary
-    offset = int(current_row) + inter_table_summary
-    my_worksheet.write( "A{}".format(str(offset)), "Student", bold_cnt_fmt)
-    my_worksheet.write( "B{}".format(str(offset)), "Nr. Shifts", bold_cnt_fmt)
-    offset = offset + 1
-    for i,s in enumerate(students_stat.keys()):
-        current_row = str(offset + i)
-        current_col = "A"
-        my_worksheet.write( "{}{}".format(current_col, current_row), s)
+    offset = offset - 1 + inter_table_summary
+    my_worksheet.write(offset, 0, "Student", bold_cnt_fmt)
+    my_worksheet.write(offset, 1, "Nr. Shifts", bold_cnt_fmt)
+    for i, s in enumerate(students_stat.keys()):
+        my_worksheet.write(offset+i+1, 0, s, default_fmt)
+        my_worksheet.write(offset+i+1, 1, students_stat.get(s), centered_fmt)
+
+    # Set column width (in constant memory mode the column formats are not applied to the written cells)
+    my_worksheet.set_column(0, 0, max_lenght, default_fmt)
+    my_worksheet.set_column(1, len(days), max_lenght, centered_fmt)
 
-        current_col = "B"
-        my_worksheet.write( "{}{}".format(current_col, current_row), students_stat.get(s))
+    my_workbook.close()
 
+def write_pool_to_excel(pool, output_file, problem_name):
+    """
+    Write the alternative rosters of a solution pool side by side in an Excel file:
+    a row for each shift and a column for each roster, where the assignments which
+    differ from the first roster are highlighted.
+    The workbook is written row by row in constant memory mode.
 
+    Parameters:
+    -----------
+        -`pool` is the list of pairs (opt_val, result), the best roster first
+        -`output_file` is the filename of output file
+        -`problem_name` is a string which names the problem, for printing purposes
+    """
+    my_workbook  = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    my_worksheet = my_workbook.add_worksheet(problem_name[:31])
+    centered_fmt = my_workbook.add_format({'align':'center', 'valign':'vcenter'})
+    changed_fmt  = my_workbook.add_format({'align':'center', 'valign':'vcenter', 'bg_color':'#FFEB9C'})
+    bold_cnt_fmt = my_workbook.add_format({'bold':1, 'align':'center', 'valign':'vcenter'})
+
+    # Header: a column for each roster, with its objective value
+    my_worksheet.write(0, 0, "Day", bold_cnt_fmt)
+    my_worksheet.write(0, 1, "Shift", bold_cnt_fmt)
+    for k, (opt_val, _) in enumerate(pool):
+        my_worksheet.write(0, k+2, "Roster {} ({})".format(k+1, opt_val), bold_cnt_fmt)
+
+    # A row for each shift of the best roster
+    _, best  = pool[0]
+    changes  = [0] * len(pool)
+    rr       = 1
+    max_lenght = 0
+    for day, shifts_of_day in best.items():
+        for shift, student in shifts_of_day.items():
+            my_worksheet.write(rr, 0, day, bold_cnt_fmt)
+            my_worksheet.write(rr, 1, shift, bold_cnt_fmt)
+            for k, (_, result) in enumerate(pool):
+                other = result.get(day, dict()).get(shift, "")
+                if other != student:
+                    changes[k] += 1
+                my_worksheet.write(rr, k+2, other, changed_fmt if other != student else centered_fmt)
+                max_lenght = max(max_lenght, len(other))
+            rr += 1
+
+    # Number of assignments which differ from the best roster
+    my_worksheet.write(rr+1, 1, "Changes", bold_cnt_fmt)
+    for k, n in enumerate(changes):
+        my_worksheet.write(rr+1, k+2, n, centered_fmt)
+
+    my_worksheet.set_column(0, 1, 12)
+    my_worksheet.set_column(2, len(pool)+1, max(max_lenght, 16))
     my_workbook.close()
 
-def run_all_process(problem_name, model_filepath, data_filepath, output_filepath, offline, opl_exe_path, parser):
+def get_problem_filepaths(n):
+    """
+    Return the tuple (model_filepath, data_filepath, output_filepath) of the n-th problem in the config file.
+
+    Parameters:
+    -----------
+        -`n` is the problem number
+    """
+    problem = CONF["problems"].get(n)
+    return (os.path.join(CONF["model_dir"], problem["model_file"]),
+            os.path.join(CONF["data_dir"],  problem["data_file"]),
+            os.path.join(CONF["out_dir"],   problem["out_file"]))
+
+def read_result_from_excel(input_file, days):
+    """
+    Read back a result written by `write_result_to_excel`.
+
+    Parameters:
+    -----------
+        -`input_file` is the filename of the Excel file
+        -`days` is the list of day names of the current problem (e.g. "Mon 03 Dec"),
+         used to recover the month which is not written in the Excel file
+
+    Returns:
+    --------
+    a dict which maps day->dict(shift->student), as `Solver.solve`
+    """
+    import openpyxl     # Only needed to read Excel files
+
+    # Map (weekday, date) -> day name
+    day_names = { (d[0:3], int(d.split(" ")[1])): d for d in days }
+
+    sheet = openpyxl.load_workbook(input_file, read_only=True).worksheets[0]
+    rows  = [ list(r) for r in sheet.iter_rows(values_only=True) ]
+
+    result   = dict()
+    weekdays = rows[1][1:] if len(rows) > 1 else []    # Header with the weekday names
+    dates    = None
+    for row in rows[2:]:
+        if len(row) == 0 or row[0] == "Student":        # Summary table, end of the roster
+            break
+        if row[0] == None:
+            cells = row[1:]
+            if any(isinstance(c, (int, float)) for c in cells):  # Dates of a new week
+                dates = cells
+            continue
+        if dates == None:
+            continue
+        for weekday, date, student in zip(weekdays, dates, row[1:]):
+            if student == None or date == None:
+                continue
+            day = day_names.get((weekday, int(date)))
+            if day == None:
+                continue
+            if result.get(day) == None:
+                result[day] = dict()
+            result[day][str(row[0])] = student
+    return result
+
+def read_result_file(input_file, days):
+    """
+    Read a previous result from an Excel file written by `write_result_to_excel`,
+    or from a JSON file (a result dict, or a cache entry with a "result" key).
+
+    Parameters:
+    -----------
+        -`input_file` is the filename of the result
+        -`days` is the list of day names of the current problem
+    """
+    if input_file.endswith(".json"):
+        with open(input_file, 'r') as f:
+            result = json.load(f)
+        return result.get("result", result)
+    return read_result_from_excel(input_file, days)
+
+def warm_start_key(input_file):
+    """
+    Return the digest of the content of the previous result `input_file`, used in the
+    cache key of a warm-started solve, or None if there is no warm start.
+    """
+    if input_file==None:
+        return None
+    h = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def run_all_process(problem_name, model_filepath, data_filepath, output_filepath, offline, opl_exe_path, parser, backend="opl", constraints=None, cache=None, warm_start=None, compare_cold=False, sparse_density=None, presolve=False, rolling=None, polish=False, exports=None, time_limit=None, gap_limit=None, balance_weight=0.0, pool=None, pool_changes=1, balance_objective="variance", worker=False):
     """
     Run the entire process: Doodle parsing, run the solver and output writing.
 
@@ -238,86 +559,243 @@ def run_all_process(problem_name, model_filepath, data_filepath, output_filepath
         -`offline` is a boolean flag to enable the new data creation or use the existing one
         -`opl_exe_path` is the path to the OPL executable
         -`parser` is the DoodleParser object which collects info on participants, calendar, ...
+        -`backend` is the name of the solver backend (e.g. "opl", "milp")
+        -`constraints` is the tuple (minMaxShifts, maxShiftsPerDay), if None ask them to the user
+        -`cache` is the ResultCache object used to skip the solve of an already solved problem
+        -`warm_start` is the filepath of a previous result (xlsx or json) used as starting solution
+        -`compare_cold` is a boolean flag to solve again from scratch and report the warm start speedup
+        -`sparse_density` is the poll density under which the sparse variant of the model is used, if None use `model_filepath`
+        -`presolve` is a boolean flag to reduce the problem and split it in independent components before solving
+        -`rolling` is the number of days of each window of the rolling horizon (0 for one window per week), if None solve the whole problem
+        -`polish` is a boolean flag to solve the whole problem warm-started from the rolling horizon solution
+        -`exports` is the list of the formats (e.g. "csv", "jsonl") in which the roster is exported next to `output_filepath`
+        -`time_limit` is the max solve time in seconds, then the best roster found is kept, if None solve to optimality
+        -`gap_limit` is the relative gap at which the solver stops (e.g. 0.01 for 1%), if None solve to optimality
+        -`balance_weight` is the weight of the balance in the combined model, if 0 minimize the trips and then balance
+        -`pool` is the number of alternative rosters, written side by side in `<output>_pool.xlsx`, if None only the best one
+        -`pool_changes` is the min number of different assignments between two alternative rosters
+        -`worker` is a boolean flag to solve in the persistent solver worker, shared by the runs of the user
+        -`balance_objective` is the measure of the balance of the balancing model, "variance" or a linear variant ("minmax", "absdev", "pwl")
     """
     assert(problem_name),    "Problem name is not defined"
     assert(model_filepath),  "Model file not defined"
     assert(data_filepath),   "Data file not defined"
     assert(output_filepath), "Output file not defined"
-    assert(opl_exe_path),    "OPL exe not defined"
+    assert(opl_exe_path or backend!="opl"), "OPL exe not defined"
     assert(not(offline) or parser==None), "Offline/Parser inconsistency"    # if offline then parser==None
     assert(offline or parser!=None),      "Offline/Parser inconsistency"    # if not(offline) then parser!=None
 
     info("Initial configuration...\tDONE")
 
     if not(offline) and parser!=None:
-        # Ask to the user to specify the min, max number of shifts for each participant
-        numMinMaxShifts = ask_for_min_max_shifts(parser.get_participants())
-        numMaxShiftsPerDay = ask_for_max_shifts_per_day()
+        if constraints==None:
+            # Ask to the user to specify the min, max number of shifts for each participant
+            constraints = (ask_for_min_max_shifts(parser.get_participants()), ask_for_max_shifts_per_day())
+        numMinMaxShifts, numMaxShiftsPerDay = constraints
 
     # Create the solver
-    solver = Solver(problem_name)
+    solver = Solver(problem_name, WorkerBackend(backend) if worker else get_backend(backend))
 
     # Configure the solver
     solver.set_opl_exe(opl_exe_path)
     solver.set_model(model_filepath)
+    solver.set_balance_objective(balance_objective)
     solver.set_data(data_filepath)
     solver.set_output_file(output_filepath)
+    solver.set_sparse_density(sparse_density)
+    solver.set_balance_weight(balance_weight)
+    if pool!=None:
+        solver.set_pool(pool, pool_changes)
+    if time_limit!=None or gap_limit!=None:
+        solver.set_limits(time_limit, gap_limit)
+        solver.set_incumbent_callback(report_incumbent)
 
     if not(offline) and parser!=None:
         # Configure the problem and set data for participants, options, preferences and shifts
-        solver.config_problem(parser.get_participants(),
-                              parser.get_options(),
-                              parser.get_calendar(),
-                              numMinMaxShifts, numMaxShiftsPerDay)
+        with span("data.serialize", problem=model_filepath):
+            solver.config_problem(parser.get_participants(),
+                                  parser.get_options(),
+                                  parser.get_calendar(),
+                                  numMinMaxShifts, numMaxShiftsPerDay)
+
+    if warm_start!=None:
+        instance = solver.instance if solver.instance!=None else read_data_file(data_filepath)
+        previous = read_result_file(warm_start, instance.days)
+        start, num_dropped = warm_start_tensor(instance, previous)
+        solver.set_warm_start(previous)
+        info("Warm start from {}: {} assignments kept, {} dropped.".format(warm_start, int(start.sum()), num_dropped))
 
     info("Configure Solver...\tDONE\n")
     info("Run the solver!\n")
 
     # Take init solve time
     ts0 = time.time()
-    # Run the solver
-    opt_val, result = solver.solve()
+    exporters = [ get_exporter(name, export_filepath(output_filepath, name)) for name in (exports or []) ]
+    exported  = False
+    cached = None
+    rosters = None
+    if pool!=None:
+        cache = None    # The cache holds only the best roster
+    if cache!=None:
+        instance = solver.instance if solver.instance!=None else read_data_file(data_filepath)
+        key      = cache.key(solver.model_file, instance, {"backend": backend, "presolve": presolve,
+                                                           "rolling": rolling, "polish": polish,
+                                                           "time_limit": time_limit, "gap_limit": gap_limit,
+                                                           "balance_weight": balance_weight,
+                                                           "warm_start": warm_start_key(warm_start)})
+        cached   = cache.get(key)
+    if cached!=None:
+        info("Result found in cache, skip the solver.")
+        opt_val, result = cached
+    else:
+        # Run the solver
+        with span("solve", problem=model_filepath, backend=backend):
+            if pool!=None:
+                rosters = solver.solve_pool()
+                opt_val, result = rosters[0] if len(rosters) > 0 else (None, "")
+            elif rolling!=None:
+                if solver.instance==None:
+                    # Offline, the instance is read from the existing data file
+                    solver.instance = read_data_file(data_filepath)
+                try:
+                    horizon = RollingHorizon(solver, rolling, polish)
+                except ValueError as e:
+                    error("{}, add --polish or select another --backend.".format(e))
+                    return
+                opt_val, result = horizon.run()
+                info(horizon.report())
+            elif presolve:
+                if solver.instance==None:
+                    # Offline, the instance is read from the existing data file
+                    solver.instance = read_data_file(data_filepath)
+                opt_val, result, reduction = solve_presolved(solver)
+                info(reduction.report())
+            elif len(exporters) > 0:
+                # Export the roster rows while the solver produces them
+                result   = rows_to_result(tee_rows(solver.stream(), exporters))
+                opt_val  = solver.backend.opt_val if solver.backend.solved else None
+                result   = result if opt_val!=None else ""
+                exported = True
+            else:
+                opt_val, result = solver.solve()
+        if cache!=None and opt_val!=None and result!="":
+            cache.put(key, opt_val, result)
     # Take final solve time
     tsf = time.time()
 
     if opt_val==None or result == "":   # Something goes wrong in solving
         error("The problem has no solution.\n")
+        for exporter in exporters:
+            exporter.close()
+            if os.path.exists(exporter.output_file):
+                os.remove(exporter.output_file)
     else:
         info("Objective function: {}".format(opt_val))
+        if model_objective(solver.model_file) in ("minmax", "absdev", "pwl"):
+            instance = solver.instance if solver.instance!=None else read_data_file(data_filepath)
+            info("Balance (mean variance): {}".format(objective_value(instance, result, "balance")))
+        if model_objective(solver.model_file)=="combined":
+            instance = solver.instance if solver.instance!=None else read_data_file(data_filepath)
+            info("Trips: {}, balance (mean variance): {}".format(int(objective_value(instance, result, "trips")),
+                                                                 objective_value(instance, result, "balance")))
         info("Write Excel result in {}...\n".format(output_filepath))
 
         # Save result
-        write_result_to_excel(result, output_filepath, CONF["name"])
+        with span("excel.write", problem=model_filepath):
+            write_result_to_excel(result, output_filepath, problem_name)
+        if rosters!=None:
+            pool_filepath = os.path.splitext(output_filepath)[0] + "_pool.xlsx"
+            for k, (value, _) in enumerate(rosters):
+                info("Roster {}: objective {}".format(k+1, value))
+            with span("excel.write", problem=model_filepath, pool=len(rosters)):
+                write_pool_to_excel(rosters, pool_filepath, problem_name)
+            info("{} alternative rosters written side by side in {}".format(len(rosters), pool_filepath))
+        if len(exporters) > 0:
+            with span("export", problem=model_filepath, formats=",".join(exports)):
+                if not(exported):
+                    export_rows(result_rows(result), exporters)
+            info("Roster exported in {}".format(", ".join(e.output_file for e in exporters)))
 
     # Print statistic info about elapsed time
     info("Solver spent \t{0:.{digits}f} seconds.".format((tsf-ts0), digits=3))
 
+    if warm_start!=None and compare_cold:
+        # Solve again from scratch to measure the warm start speedup
+        solver.set_warm_start(None)
+        tc0 = time.time()
+        cold_val, _ = solver.solve()
+        tcf = time.time()
+        info("Cold solve spent \t{0:.{digits}f} seconds (objective {1}), warm start is {2:.2f}x faster.".format(
+             (tcf-tc0), cold_val, (tcf-tc0)/max(tsf-ts0, 1e-9), digits=3))
+
+def run_options(args, backend, cache):
+    """
+    Return the keyword arguments of `run_all_process` shared by all the problems,
+    from the command-line arguments `args` and the config file.
+
+    Parameters:
+    -----------
+        - `args` is the namespace of the parsed command-line arguments
+        - `backend` is the name of the solver backend
+        - `cache` is the ResultCache object, if any
+    """
+    return dict(backend=backend, cache=cache, warm_start=args.warm_start, compare_cold=args.compare_cold,
+                sparse_density=CONF.get("sparse_density"), presolve=args.presolve, rolling=args.rolling_horizon,
+                polish=args.polish, exports=args.export, time_limit=args.time_limit, gap_limit=args.gap_limit,
+                balance_weight=CONF.get("balance_weight", 0.0), pool=args.pool, pool_changes=args.pool_changes,
+                balance_objective=CONF.get("balance_objective", "variance"), worker=args.worker)
+
+def report_incumbent(incumbent):
+    """
+    Print an improving solution found by the solver.
+
+    Parameters:
+    -----------
+        - `incumbent` is the dict {"time", "objective", "bound", "gap"} reported by the backend
+    """
+    gap = " (gap {:.2%})".format(incumbent["gap"]) if incumbent["gap"]!=None else ""
+    info("Incumbent {}{} after {:.3f} seconds".format(incumbent["objective"], gap, incumbent["time"]))
+
 if __name__=="__main__":
     # Default parameters' assignment
-    execProblem1 = True
-    execProblem2 = True
     offline      = False
 
     # Retrieve input arguments
     argParser = argparse.ArgumentParser()
 
     argParser.add_argument("pollID",    help="poll identifier, take it from the Doodle link")
-    argParser.add_argument("--offline", help="no access to Doodle, use the existing dat file", action="store_true")
+    argParser.add_argument("--offline", help="no access to Doodle, use the poll snapshot or the existing dat file", action="store_true")
     argParser.add_argument("--problem", help="select the problem you want to solve", type=int)
+    argParser.add_argument("--constraints", help="read the min/max shifts of the participants from this file instead of asking them (see read_constraints_file)", metavar="FILE")
+    argParser.add_argument("--backend", help="select the solver backend (override the config file)", choices=sorted(BACKENDS))
+    argParser.add_argument("--worker",  help="solve in a persistent solver worker process, started by the first run and reused by the next ones", action="store_true")
+    argParser.add_argument("--parallel", help="solve the problems concurrently in a pool of processes", action="store_true")
+    argParser.add_argument("--jobs",    help="max number of concurrent problems in parallel mode", type=int)
+    argParser.add_argument("--no-cache", help="always run the solver, ignoring the result cache", action="store_true")
+    argParser.add_argument("--warm-start", help="previous result (xlsx or json) used as starting solution")
+    argParser.add_argument("--compare-cold", help="with --warm-start, solve also from scratch and report the speedup", action="store_true")
+    argParser.add_argument("--presolve", help="fix forced assignments, tighten bounds and solve the independent components separately", action="store_true")
+    argParser.add_argument("--rolling-horizon", help="solve windows of DAYS consecutive days (by default, one week) carrying the running totals", type=int, nargs="?", const=0, metavar="DAYS")
+    argParser.add_argument("--polish",  help="with --rolling-horizon, solve the whole problem warm-started from the windows", action="store_true")
+    argParser.add_argument("--time-limit", help="stop each solve after SECONDS, keeping the best roster found", type=float, metavar="SECONDS")
+    argParser.add_argument("--gap-limit", help="stop each solve when the relative gap is below GAP (e.g. 0.01)", type=float, metavar="GAP")
+    argParser.add_argument("--pool",    help="find K alternative rosters in the same solver session", type=int, metavar="K")
+    argParser.add_argument("--pool-changes", help="with --pool, min number of different assignments between two rosters", type=int, default=1, metavar="N")
+    argParser.add_argument("--export",  help="export the roster also in these comma-separated formats ({})".format(",".join(sorted(EXPORTERS))), type=lambda s: [ f for f in s.split(",") if f ], default=[])
+    argParser.add_argument("--trace",   help="write the timing and memory of each stage in this file (Chrome trace if it ends with .trace.json)")
 
     args =  argParser.parse_args()
+    if args.pool!=None and (args.presolve or args.rolling_horizon!=None):
+        # The solution pool solves the whole problem in one session
+        argParser.error("--pool cannot be combined with --presolve or --rolling-horizon")
 
     if args.offline==True:
         offline = True
-    if args.problem==1:
-        execProblem1 = True
-        execProblem2 = False
-    elif args.problem==2:
-        execProblem1 = False
-        execProblem2 = True
 
     # Take init time, for statistics purposes
     t0 = time.time()
+    if args.trace!=None:
+        TRACER.enable()
 
     # Take the input arguments and the data from config file
     pollID = sys.argv[1]
@@ -326,30 +804,66 @@ if __name__=="__main__":
     # Retrieve global information from config file
     problem_name = CONF["name"]
     opl_exe_path = CONF["oplrun"]
-
-    # Doodle Parsing
+    backend      = args.backend if args.backend!=None else CONF.get("backend", "opl")
+    cache        = None
+    if CONF.get("cache_dir") and not(args.no_cache):
+        cache = ResultCache(CONF["cache_dir"], CONF.get("cache_size", 64*1024*1024))
+
+    # Select the problems to solve
+    problems = sorted(CONF["problems"].keys())
+    if args.problem!=None:
+        if args.problem not in CONF["problems"]:
+            error("problem {} not defined in {}.".format(args.problem, CONFIG_FILE))
+            exit(1)
+        problems = [args.problem]
+
+    # Doodle Parsing, done once for all the problems
+    api_url  = CONF.get("doodle_api", DOODLE_API)
+    snapshot = PollSnapshot(CONF["snapshot_dir"], api_url) if CONF.get("snapshot_dir") else None
     if not(offline):
         # Parse the doodle survey
-        parser = DoodleParser(pollID)
+        parser = DoodleParser(pollID, snapshot, apiURL=api_url)
         info("Parsing Doodle...\tDONE")
+    elif snapshot!=None and snapshot.exists(pollID):
+        # Rebuild the data of each problem from the poll snapshot
+        parser = DoodleParser(pollID, snapshot, offline=True)
+        info("Parsing Doodle snapshot...\tDONE")
     else:
         parser = None
 
-    # PROBLEM 1 : Balanced distribution
-    if(execProblem1):
-        output_filepath = os.path.join(CONF["out_dir"],   CONF["out_file"])
-        model_filepath  = os.path.join(CONF["model_dir"], CONF["model_file"])
-        data_filepath   = os.path.join(CONF["data_dir"],  CONF["data_file"])
-        # Start the solving of PROBLEM 1
-        run_all_process(problem_name, model_filepath, data_filepath, output_filepath, offline, opl_exe_path, parser)
-
-    # PROBLEM 2 : Minimize trips
-    if(execProblem2):
-        output_filepath = os.path.join(CONF["out_dir"],   CONF["out_file_min_trips"])
-        model_filepath  = os.path.join(CONF["model_dir"], CONF["model_file_min_trips"])
-        data_filepath   = os.path.join(CONF["data_dir"],  CONF["data_file_min_trips"])
-        # Start the solving of PROBLEM 2
-        run_all_process(problem_name, model_filepath, data_filepath, output_filepath, offline, opl_exe_path, parser)
+    # Use the existing data files only if the poll is not available
+    offline = parser==None
+
+    # Read the constraints from a file instead of asking them for each participant
+    constraints_file = args.constraints if args.constraints!=None else CONF.get("constraints_file")
+
+    # Options of `run_all_process` shared by all the problems
+    options = run_options(args, backend, cache)
+
+    if args.parallel:
+        # Ask all the constraints before dispatching the problems to the workers
+        jobs = []
+        for n in problems:
+            constraints = load_constraints(constraints_file, parser, n)
+            if parser!=None and constraints==None:
+                info("Constraints for problem {}".format(n))
+                constraints = (ask_for_min_max_shifts(parser.get_participants()), ask_for_max_shifts_per_day())
+            model_filepath, data_filepath, output_filepath = get_problem_filepaths(n)
+            jobs.append(dict(problem_name=problem_name, model_filepath=model_filepath, data_filepath=data_filepath,
+                             output_filepath=output_filepath, offline=offline, opl_exe_path=opl_exe_path, parser=parser,
+                             constraints=constraints, **options))
+        run_parallel(jobs, args.jobs)
+    else:
+        for n in problems:
+            model_filepath, data_filepath, output_filepath = get_problem_filepaths(n)
+            constraints = load_constraints(constraints_file, parser, n)
+            run_all_process(problem_name, model_filepath, data_filepath, output_filepath, offline, opl_exe_path, parser,
+                            constraints=constraints, **options)
 
     tf = time.time()
     info("Program ends in \t{0:.{digits}f} seconds.".format((tf-t0), digits=3))
+
+    if args.trace!=None:
+        TRACER.disable()
+        TRACER.export(args.trace)
+        info("Trace written in {}".format(args.trace))
@@ -0,0 +1,188 @@
+/*********************************************
+ * OPL 12.8.0.0 Model
+ * Author: Luigi Berducci
+ * Creation Date: 17/oct/2026
+ *
+ * Combined model: minimize the number of trips and balance the number of shifts
+ * of the students in a single solver session.
+ * If BalanceWeight == 0, the objectives are optimized lexicographically: first the
+ * trips, then the mean variance among the rosters with the min number of trips,
+ * starting from the roster of the first stage. Otherwise, a single solve minimizes
+ * the weighted sum `trips + BalanceWeight*variance`.
+ *********************************************/
+
+ /***************************************************************************************/
+ /*                   CONSTANTS, PARAMETERS AND ADDITIONAL VARIABLES				   	*/
+ /***************************************************************************************/
+ /* Declare parameters */
+ int numStudents = ...;	/* Total number of students */
+ int numDays	 = ...; /* Total number of days, even if there are not all the shifts*/
+ int numShifts	 = ...; /* Number of shifts in a day */
+ int MaxNumShiftsPerDay = ...;  /* Max number of assignment to a student in the same day */
+ float BalanceWeight    = ...;  /* Weight of the mean variance, 0 for the lexicographic order */
+
+ /* Coefficients of the objectives and bound on the trips of the current stage (set by the main block) */
+ float TripsCoef   = ...;
+ float BalanceCoef = ...;
+ int MaxTrips      = ...;
+
+ /* Define ranges according to the parameters */
+ range students = 1..numStudents;
+ range days 	= 1..numDays;
+ range shifts 	= 1..numShifts;
+
+ /* Declare strings for student, day and shift names (e.g. "Luigi Berducci", "Mon 01 Dec", "09:30-10:30" ...) */
+ string StudNames[students] = ...;
+ string DayNames[days] 		= ...;
+ string ShiftNames[shifts] 	= ...;
+
+ /* Declare 3D array of availability */
+ int Availability[students][days][shifts] = ...;
+
+ /* Declare the 2D array of existance of shifts
+ 	This is useful for missing shifts (e.g. the 3rd shift on Friday). */
+ int Existance[days][shifts] = ...;
+
+ /* Declare the array of minimum number of shifts for each student */
+ int MinNumShifts[students]  = ...;
+ int MaxNumShifts[students]  = ...;
+
+ /* Take init time to compute statistics */
+ float temp;
+ execute{
+	var before = new Date();
+	temp = before.getTime();
+ }
+
+ /***************************************************************************************/
+ /*                              MODELING MILP PROBLEM				   	                */
+ /***************************************************************************************/
+ /* DECISION VARIABLES */
+ /* X[s][d][t] == 1, the shift t on day d is assigned to the student s */
+ /* X[s][d][t] == 0, otherwise */
+ dvar int X[students][days][shifts] in 0..1;
+ /* AssignedShifts[s] is the number of shifts assigned to the student s (controlled redundancy) */
+ dvar int AssignedShifts[s in students] in MinNumShifts[s]..MaxNumShifts[s];
+ /* Trips[s][d] is a flag which indicates that the student s must go to the library in the day d (controlled redundancy) */
+ dvar int Trips[students][days] in 0..1;
+ /* AvgShifts is the average number of shifts assigned (controlled redundancy) */
+ dvar float AvgShifts;
+
+ /* Number of trips and mean variance of the number of shifts */
+ dexpr int TotalTrips = sum(s in students) sum(d in days) Trips[s][d];
+ dexpr float Variance = (1/numStudents)*sum(s in students) (AssignedShifts[s]-AvgShifts)^2;
+
+ /* OBJECTIVE FUNCTION */
+ minimize TripsCoef*TotalTrips + BalanceCoef*Variance;
+
+ /* CONSTRAINTS */
+ subject to {
+      /* Keep the min number of trips of the first stage */
+      TotalTrips <= MaxTrips;
+
+      /* Consistency definition of Trips[students][days] (redundancy) */
+      /* X[s][d][t] == 1 -> Trips[s][d] == 1 */
+      forall(s in students)
+          forall(d in days)
+              forall(t in shifts)
+                  X[s][d][t] <= Trips[s][d];
+
+      /* Consistency definition of AssignedShifts[students] (redundancy),
+         the bounds of AssignedShifts are the min and max number of shifts of each student */
+      forall(s in students)
+        AssignedShifts[s] == sum(d in days) sum(t in shifts) X[s][d][t];
+
+      /* Consistency definition of AvgShifts (redundancy) */
+      AvgShifts == (1/numStudents)*sum(s in students) AssignedShifts[s];
+
+ 	  /* Assign each existing shift to only an available student. */
+ 	  forall(d in days)
+ 	    forall(t in shifts)
+ 	      ( sum(s in students) X[s][d][t] ) == Existance[d][t];
+
+      /* Assign a shift to an available student */
+ 	  forall(s in students)
+ 	    forall(d in days)
+ 	      forall(t in shifts)
+                X[s][d][t] <= Availability[s][d][t];
+
+ 	  /* Each student can do at most a certain number of shifts per day, only in the days of its trips */
+ 	  forall(s in students)
+ 	    forall(d in days)
+ 	      ( sum(t in shifts) X[s][d][t] ) <= MaxNumShiftsPerDay*Trips[s][d];
+ }
+
+ /***************************************************************************************/
+ /*                              OUTPUT	SOLUTION TO STDOUT                              */
+ /***************************************************************************************/
+ execute {
+ 	/* Take final time to compute statistics */
+	var after = new Date();
+	var elapsed = after.getTime()-temp;
+
+ 	/* Write header */
+ 	writeln("Elapsed time: " + (elapsed/1000) + " seconds\n");
+ 	writeln("[Info] Begin output");
+
+ 	for(var d in thisOplModel.days){
+		for(var t in thisOplModel.shifts){
+			for(var s in thisOplModel.students){
+				if(thisOplModel.X[s][d][t] == 1){
+  					writeln(DayNames[d] + "," + ShiftNames[t] + "," + StudNames[s]);
+  				}
+ 			}
+		}
+ 	}
+    writeln("");
+
+    writeln("[Info] End output");
+}
+
+ /***************************************************************************************/
+ /*                              FLOW CONTROL                                           */
+ /***************************************************************************************/
+ main {
+ 	var def  = thisOplModel.modelDefinition;
+ 	var data = thisOplModel.dataElements;
+
+ 	/* First stage: minimize the trips (or the weighted sum of the objectives) */
+ 	var stage = new IloOplModel(def, cplex);
+ 	var coef  = new IloOplDataElements();
+ 	coef.TripsCoef   = 1;
+ 	coef.BalanceCoef = data.BalanceWeight;
+ 	coef.MaxTrips    = data.numStudents*data.numDays;
+ 	stage.addDataSource(data);
+ 	stage.addDataSource(coef);
+ 	stage.generate();
+ 	if(!cplex.solve()){
+ 		writeln("<<< no solution");
+ 		stop();
+ 	}
+
+ 	if(data.BalanceWeight == 0){
+ 		/* Second stage: balance the rosters with the min number of trips, in the same
+ 		   CPLEX session and starting from the roster of the first stage */
+ 		var balanced = new IloOplModel(def, cplex);
+ 		var coef2    = new IloOplDataElements();
+ 		coef2.TripsCoef   = 0;
+ 		coef2.BalanceCoef = 1;
+ 		coef2.MaxTrips    = Math.round(cplex.getObjValue());
+ 		balanced.addDataSource(data);
+ 		balanced.addDataSource(coef2);
+ 		balanced.generate();
+
+ 		var start = new IloOplCplexVectors();
+ 		start.attach(balanced.X, stage.X.solutionValue);
+ 		start.attach(balanced.Trips, stage.Trips.solutionValue);
+ 		start.setStart(cplex);
+ 		stage.end();
+ 		stage = balanced;
+ 		if(!cplex.solve()){
+ 			writeln("<<< no solution");
+ 			stop();
+ 		}
+ 	}
+
+ 	writeln("OBJECTIVE: " + cplex.getObjValue());
+ 	stage.postProcess();
+ }
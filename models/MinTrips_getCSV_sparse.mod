@@ -0,0 +1,137 @@
+/*********************************************
+ * OPL 12.8.0.0 Model
+ * Author: Luigi Berducci
+ * Creation Date: 17/oct/2026
+ *
+ * Sparse variant of MinTrips_getCSV.mod: the assignment variables are defined
+ * only over the available <student, day, shift> tuples and the trips only over
+ * the days in which a student is available for at least one shift.
+ * Each assignment is linked to its trip without BigM.
+ *********************************************/
+
+ /***************************************************************************************/
+ /*                   CONSTANTS, PARAMETERS AND ADDITIONAL VARIABLES				   	*/
+ /***************************************************************************************/
+ /* Declare parameters */
+ int numStudents = ...;	/* Total number of students */
+ int numDays	 = ...; /* Total number of days, even if there are not all the shifts*/
+ int numShifts	 = ...; /* Number of shifts in a day */
+ int MaxNumShiftsPerDay = ...;  /* Max number of assignment to a student in the same day */
+
+ /* Define ranges according to the parameters */
+ range students = 1..numStudents;
+ range days 	= 1..numDays;
+ range shifts 	= 1..numShifts;
+
+ /* Declare strings for student, day and shift names (e.g. "Luigi Berducci", "Mon 01 Dec", "09:30-10:30" ...) */
+ string StudNames[students] = ...;
+ string DayNames[days] 		= ...;
+ string ShiftNames[shifts] 	= ...;
+
+ /* Declare the set of available tuples: <s, d, t> if the student s is available for the shift t on day d */
+ tuple Available {
+    int s;
+    int d;
+    int t;
+ }
+ {Available} AvailableTuples = ...;
+
+ /* Declare the set of possible trips: <s, d> if the student s is available for some shift on day d */
+ tuple Trip {
+    int s;
+    int d;
+ }
+ {Trip} TripTuples = { <a.s, a.d> | a in AvailableTuples };
+
+ /* Available tuples of each student, of each student in each day (i.e. of each trip)
+    and of each shift, indexed in a single pass over the available tuples */
+ {Available} ByStudent[students];
+ {Available} ByDay[students][days];
+ {Available} ByShift[days][shifts];
+ execute{
+	for(var a in AvailableTuples){
+		ByStudent[a.s].add(a.s, a.d, a.t);
+		ByDay[a.s][a.d].add(a.s, a.d, a.t);
+		ByShift[a.d][a.t].add(a.s, a.d, a.t);
+	}
+ }
+
+ /* Declare the 2D array of existance of shifts
+ 	This is useful for missing shifts (e.g. the 3rd shift on Friday). */
+ int Existance[days][shifts] = ...;
+
+ /* Declare the array of minimum number of shifts for each student */
+ int MinNumShifts[students]  = ...;
+ int MaxNumShifts[students]  = ...;
+
+ /* Take init time to compute statistics */
+ float temp;
+ execute{
+	var before = new Date();
+	temp = before.getTime();
+ }
+
+ /***************************************************************************************/
+ /*                              MODELING MILP PROBLEM				   	                */
+ /***************************************************************************************/
+ /* DECISION VARIABLES */
+ /* X[<s,d,t>] == 1, the shift t on day d is assigned to the available student s */
+ /* X[<s,d,t>] == 0, otherwise */
+ dvar int X[AvailableTuples] in 0..1;
+ /* AssignedShifts[s] is the number of shifts assigned to the student s (controlled redundancy) */
+ dvar int AssignedShifts[s in students] in MinNumShifts[s]..MaxNumShifts[s];
+ /* Trips[<s,d>] is a flag which indicates that the student s must go to the library in the day d (controlled redundancy) */
+ dvar int Trips[TripTuples] in 0..1;
+
+ /* OBJECTIVE FUNCTION */
+ /* Minimize the number of shifts to cover all the month. */
+ minimize sum(p in TripTuples) Trips[p];
+
+ /* CONSTRAINTS */
+ subject to {
+      /* Consistency definition of Trips[<s,d>] (redundancy) */
+      /* X[<s,d,t>] == 1 -> Trips[<s,d>] == 1 */
+      forall(p in TripTuples)
+          forall(a in ByDay[p.s][p.d])
+              X[a] <= Trips[p];
+
+      /* Consistency definition of AssignedShifts[students] (redundancy),
+         the bounds of AssignedShifts are the min and max number of shifts of each student */
+      forall(s in students)
+        AssignedShifts[s] == sum(a in ByStudent[s]) X[a];
+
+ 	  /* Assign each existing shift to only an available student. */
+ 	  forall(d in days)
+ 	    forall(t in shifts)
+ 	      ( sum(a in ByShift[d][t]) X[a] ) == Existance[d][t];
+
+ 	  /* Each student can do at most a certain number of shifts per day, only in the days of its trips */
+ 	  forall(p in TripTuples)
+ 	      ( sum(a in ByDay[p.s][p.d]) X[a] ) <= MaxNumShiftsPerDay*Trips[p];
+ }
+
+ /***************************************************************************************/
+ /*                              OUTPUT	SOLUTION TO STDOUT                              */
+ /***************************************************************************************/
+ execute {
+ 	/* Take final time to compute statistics */
+	var after = new Date();
+	var elapsed = after.getTime()-temp;
+
+ 	/* Write header */
+ 	writeln("Elapsed time: " + (elapsed/1000) + " seconds\n");
+ 	writeln("[Info] Begin output");
+
+ 	for(var d in thisOplModel.days){
+		for(var t in thisOplModel.shifts){
+			for(var a in thisOplModel.ByShift[d][t]){
+				if(thisOplModel.X[a] == 1){
+  					writeln(DayNames[d] + "," + ShiftNames[t] + "," + StudNames[a.s]);
+  				}
+ 			}
+		}
+ 	}
+    writeln("");
+
+    writeln("[Info] End output");
+}
@@ -0,0 +1,449 @@
+# File:     service.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import argparse
+import collections
+import glob
+import hashlib
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+import main
+from main import CONF, CONFIG_FILE, info, resolve_min_max_shifts
+from DoodleParser import DoodleParser, DOODLE_API
+from PollSnapshot import PollSnapshot
+from Solver import Solver, BALANCE_VARIANTS
+from Backend import get_backend, BACKENDS
+from Exporter import get_exporter, export_filepath, export_rows, result_rows, EXPORTERS
+from Tracer import span
+
+# Poll identifiers are used in the snapshot filenames
+POLL_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+class Job:
+    """
+    A roster request of the service and its state: "queued", then "running",
+    then "done" or "failed".
+    """
+    id        = ""
+    key       = ""
+    request   = dict()
+    status    = "queued"
+    submitted = 0
+    started   = None
+    finished  = None
+    opt_val   = None
+    result    = None
+    error     = None
+    clients   = 1
+
+    def __init__(self, key, request):
+        """
+        Build a queued Job object.
+
+        Parameters:
+        -----------
+            - `key` identifies identical requests (see `job_key`)
+            - `request` is the validated request dict (see `job_request`)
+        """
+        self.id        = uuid.uuid4().hex
+        self.key       = key
+        self.request   = request
+        self.status    = "queued"
+        self.submitted = time.time()
+        self.clients   = 1
+
+    def in_flight(self):
+        """ Return True if the job is queued or running. """
+        return self.status in ("queued", "running")
+
+    def describe(self):
+        """ Return the status of the job as a JSON-serializable dict. """
+        return {"id": self.id, "status": self.status, "request": self.request, "clients": self.clients,
+                "submitted": self.submitted, "started": self.started, "finished": self.finished,
+                "objective": self.opt_val, "error": self.error}
+
+class RosterService:
+    """
+    Queue of roster requests, solved by a bounded number of solver threads:
+    each job parses its Doodle poll, configures a Solver with the constraints of
+    the request and solves it. A request identical to a queued or running job is
+    not queued again, the client gets the id of that job instead.
+    The finished jobs are kept, up to `max_jobs`, to serve their results.
+    """
+    workers  = 1
+    backend  = "opl"
+    work_dir = ""
+    max_jobs = 1000
+
+    def __init__(self, workers=1, backend="opl", workDir="service", maxJobs=1000, apiURL=DOODLE_API):
+        """
+        Build the RosterService object.
+
+        Parameters:
+        -----------
+            - `workers` is the max number of concurrent solves
+            - `backend` is the default solver backend of the requests
+            - `workDir` is the directory of the data files of the running jobs
+            - `maxJobs` is the max number of finished jobs kept in memory
+            - `apiURL` is the base URL of the Doodle polls API
+        """
+        self.workers  = workers
+        self.backend  = backend
+        self.work_dir = workDir
+        self.max_jobs = maxJobs
+        self.api_url  = apiURL
+        self.snapshot = PollSnapshot(CONF["snapshot_dir"], apiURL) if CONF.get("snapshot_dir") else None
+        self.queue    = queue.Queue()
+        self.lock     = threading.Lock()
+        self.jobs     = collections.OrderedDict()
+        self.threads  = []
+        self.started  = time.time()
+        self.counters = collections.Counter()
+        self.latency  = { k: collections.deque(maxlen=1000) for k in ("queue", "solve", "total") }
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def start(self):
+        """ Start the solver threads. """
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.run_worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """ Stop the solver threads, after the running jobs. """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def submit(self, body):
+        """
+        Validate a roster request and queue it, unless an identical job is in flight.
+
+        Parameters:
+        -----------
+            - `body` is the decoded JSON body of the request (see `job_request`)
+
+        Returns:
+        --------
+        a tuple (job, deduplicated), where `deduplicated` is True if `job` was already in flight
+        """
+        request = job_request(body, self.backend)
+        key     = job_key(request)
+        with self.lock:
+            self.counters["submitted"] += 1
+            for job in self.jobs.values():
+                if job.key == key and job.in_flight():
+                    job.clients += 1
+                    self.counters["deduplicated"] += 1
+                    return job, True
+            job = Job(key, request)
+            self.jobs[job.id] = job
+            self.evict()
+        self.queue.put(job)
+        return job, False
+
+    def job(self, jobID):
+        """ Return the Job object `jobID`, or None if unknown. """
+        with self.lock:
+            return self.jobs.get(jobID)
+
+    def evict(self):
+        """ Forget the oldest finished jobs beyond `max_jobs` (call it holding the lock). """
+        finished = [ k for k, job in self.jobs.items() if not job.in_flight() ]
+        for k in finished[:max(len(finished) - self.max_jobs, 0)]:
+            del self.jobs[k]
+
+    def run_worker(self):
+        """ Solve the queued jobs one at a time, until `stop`. """
+        while True:
+            job = self.queue.get()
+            if job == None:
+                return
+            with self.lock:
+                job.status  = "running"
+                job.started = time.time()
+            try:
+                with span("service.job", poll=job.request["poll"], backend=job.request["backend"]):
+                    opt_val, result = self.solve(job)
+                error = None if opt_val != None else "The problem has no solution"
+            except Exception as e:
+                opt_val, result, error = None, None, "{}: {}".format(type(e).__name__, e)
+            finally:
+                for path in glob.glob(os.path.join(self.work_dir, job.id + "*")):
+                    os.remove(path)
+            with self.lock:
+                job.finished = time.time()
+                job.opt_val  = opt_val
+                job.result   = result if error == None else None
+                job.error    = error
+                job.status   = "done" if error == None else "failed"
+                self.counters["completed" if error == None else "failed"] += 1
+                self.latency["queue"].append(job.started - job.submitted)
+                self.latency["solve"].append(job.finished - job.started)
+                self.latency["total"].append(job.finished - job.submitted)
+
+    def solve(self, job):
+        """
+        Parse the poll of `job` and solve it.
+
+        Returns:
+        --------
+        a tuple (opt_val, result), where `result` is a dict which maps day->dict(shift->student)
+        """
+        request = job.request
+        problem = CONF["problems"][request["problem"]]
+        parser  = DoodleParser(request["poll"], self.snapshot, session=requests.Session(), apiURL=self.api_url)
+        participants = parser.get_participants()
+        shifts  = request["constraints"]["shifts"]
+
+        solver = Solver("{} ({})".format(request["poll"], job.id), get_backend(request["backend"]))
+        solver.set_opl_exe(CONF.get("oplrun", ""))
+        solver.set_model(os.path.join(CONF["model_dir"], problem["model_file"]))
+        solver.set_balance_objective(request["balance_objective"])
+        solver.set_data(os.path.join(self.work_dir, job.id + ".dat"))
+        solver.set_sparse_density(CONF.get("sparse_density"))
+        solver.set_balance_weight(request["balance_weight"])
+        if request["time_limit"] != None or request["gap_limit"] != None:
+            solver.set_limits(request["time_limit"], request["gap_limit"])
+        solver.config_problem(participants, parser.get_options(), parser.get_calendar(),
+                              resolve_min_max_shifts(shifts, participants),
+                              request["constraints"]["max_shifts_per_day"])
+        opt_val, result = solver.solve()
+        if opt_val == None or result == "":
+            return None, None
+        return float(opt_val), result
+
+    def export(self, job, name):
+        """ Return the content of the result of `job` in the export format `name`. """
+        path = export_filepath(os.path.join(self.work_dir, job.id + "_result"), name)
+        try:
+            export_rows(result_rows(job.result), [get_exporter(name, path)])
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def metrics(self):
+        """
+        Return the throughput and latency metrics: the number of jobs by state, the
+        completed jobs per second since the start, and the statistics of the queue wait,
+        the solve time and the total time of the last finished jobs.
+        """
+        with self.lock:
+            uptime = time.time() - self.started
+            states = collections.Counter(job.status for job in self.jobs.values())
+            return {
+                "uptime":       uptime,
+                "workers":      self.workers,
+                "queued":       states["queued"],
+                "running":      states["running"],
+                "submitted":    self.counters["submitted"],
+                "deduplicated": self.counters["deduplicated"],
+                "completed":    self.counters["completed"],
+                "failed":       self.counters["failed"],
+                "throughput":   self.counters["completed"] / max(uptime, 1e-9),
+                "latency":      { k: latency_stats(v) for k, v in self.latency.items() },
+            }
+
+def job_request(body, backend="opl"):
+    """
+    Validate a roster request and fill its defaults. The request is a JSON object:
+        - `poll` is the Doodle poll identifier (required)
+        - `problem` is the problem number of the config file, which selects the model (by default, the first)
+        - `backend` is the solver backend (by default, the one of the service)
+        - `constraints` is {"max_shifts_per_day": val, "shifts": {rule: [min, max], [min] or [null, max]}}, where
+          each rule is a participant name, a wildcard pattern or DEFAULT, as in `main.read_constraints_file`
+        - `time_limit`, `gap_limit`, `balance_objective` and `balance_weight` are as in main.py
+
+    Returns:
+    --------
+    the request dict with all the keys, raise ValueError if not valid
+    """
+    if not isinstance(body, dict):
+        raise ValueError("the request must be a JSON object")
+    poll = body.get("poll")
+    if not isinstance(poll, str) or not POLL_ID.match(poll):
+        raise ValueError("`poll` must be a Doodle poll identifier")
+    problem = body.get("problem", min(CONF["problems"]) if CONF["problems"] else None)
+    if problem not in CONF["problems"]:
+        raise ValueError("`problem` must be one of {}".format(sorted(CONF["problems"])))
+    backend = body.get("backend", backend)
+    if backend not in BACKENDS:
+        raise ValueError("`backend` must be one of {}".format(sorted(BACKENDS)))
+
+    constraints = body.get("constraints", dict())
+    if not isinstance(constraints, dict):
+        raise ValueError("`constraints` must be a JSON object")
+    max_per_day = constraints.get("max_shifts_per_day", 1)
+    if not is_count(max_per_day) or max_per_day < 1:
+        raise ValueError("`max_shifts_per_day` must be a positive integer")
+    rules = constraints.get("shifts", dict())
+    if not isinstance(rules, dict):
+        raise ValueError("`shifts` must be a JSON object which maps each rule to [min, max]")
+    shifts = dict()
+    for p, values in rules.items():
+        values = values if isinstance(values, list) else [values]
+        values = values + [None]*(2-len(values))
+        if (len(values) != 2 or not all(v == None or is_count(v) for v in values)
+                or (None not in values and values[0] > values[1])):
+            raise ValueError("the shifts of {} must be [min, max], [min] or [null, max]".format(p))
+        shifts[p] = values
+
+    limits = dict()
+    for name in ("time_limit", "gap_limit"):
+        limits[name] = body.get(name)
+        if limits[name] != None and (not is_number(limits[name]) or limits[name] <= 0):
+            raise ValueError("`{}` must be a positive number".format(name))
+    objective = body.get("balance_objective", CONF.get("balance_objective", "variance"))
+    if objective not in BALANCE_VARIANTS:
+        raise ValueError("`balance_objective` must be one of {}".format(list(BALANCE_VARIANTS)))
+    weight = body.get("balance_weight", CONF.get("balance_weight", 0.0))
+    if not is_number(weight) or weight < 0:
+        raise ValueError("`balance_weight` must be a non-negative number")
+
+    return {"poll": poll, "problem": problem, "backend": backend,
+            "constraints": {"max_shifts_per_day": max_per_day, "shifts": shifts},
+            "time_limit": limits["time_limit"], "gap_limit": limits["gap_limit"],
+            "balance_objective": objective, "balance_weight": float(weight)}
+
+def is_count(value):
+    """ Return True if `value` is a non-negative integer. """
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def is_number(value):
+    """ Return True if `value` is a finite int or float, a JSON true/false is not a number. """
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def job_key(request):
+    """ Return the key of a validated request, equal for identical requests. """
+    # The keys of a validated request are in a fixed order, the order of the shift rules matters
+    return hashlib.sha256(json.dumps(request).encode('utf-8')).hexdigest()
+
+def latency_stats(samples):
+    """ Return the count, mean, median, 95th percentile and max of the latency `samples` (seconds). """
+    samples = sorted(samples)
+    if len(samples) == 0:
+        return {"count": 0}
+    return {"count": len(samples), "mean": sum(samples)/len(samples),
+            "p50": samples[math.ceil(0.50*len(samples))-1], "p95": samples[math.ceil(0.95*len(samples))-1],
+            "max": samples[-1]}
+
+# Content type of each export format of the results
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+class RosterHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of the RosterService of the server:
+        - `POST /jobs` queues a roster request (see `job_request`), 202 with the job status
+        - `GET /jobs/<id>` returns the job status
+        - `GET /jobs/<id>/result[?format=csv|jsonl|parquet]` returns the roster of a done job
+          (by default, JSON {"objective", "result"}), 409 if the job is not done
+        - `GET /metrics` returns the throughput and latency metrics
+        - `GET /health` returns {"status": "ok"}
+    """
+    max_body = 1024*1024
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path != "/jobs":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return self.send_json(400, {"error": "Content-Length must be an integer"})
+        if length > self.max_body:
+            return self.send_json(413, {"error": "request too large"})
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+            job, deduplicated = self.server.service.submit(body)
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        status = job.describe()
+        status["deduplicated"] = deduplicated
+        self.send_json(202, status)
+
+    def do_GET(self):
+        url   = urlparse(self.path)
+        parts = [ p for p in url.path.split("/") if p ]
+        service = self.server.service
+        if parts == ["health"]:
+            return self.send_json(200, {"status": "ok"})
+        if parts == ["metrics"]:
+            return self.send_json(200, service.metrics())
+        if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "result"):
+            return self.send_json(404, {"error": "not found"})
+        job = service.job(parts[1])
+        if job == None:
+            return self.send_json(404, {"error": "unknown job {}".format(parts[1])})
+        if len(parts) == 2:
+            return self.send_json(200, job.describe())
+
+        if job.status != "done":
+            return self.send_json(409, {"error": "job {} is {}".format(job.id, job.status), "status": job.status})
+        name = parse_qs(url.query).get("format", ["json"])[0]
+        if name == "json":
+            return self.send_json(200, {"id": job.id, "objective": job.opt_val, "result": job.result})
+        if name not in EXPORTERS:
+            return self.send_json(400, {"error": "format must be json or one of {}".format(sorted(EXPORTERS))})
+        try:
+            content = service.export(job, name)
+        except ImportError as e:
+            return self.send_json(501, {"error": str(e)})
+        self.send_content(200, content, CONTENT_TYPES.get(name, "application/octet-stream"))
+
+    def send_json(self, code, content):
+        self.send_content(code, json.dumps(content).encode('utf-8'), "application/json")
+
+    def send_content(self, code, content, contentType):
+        self.send_response(code)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+def serve(service, host="127.0.0.1", port=8080):
+    """
+    Serve `service` over HTTP on `host`:`port` until interrupted.
+    """
+    server = ThreadingHTTPServer((host, port), RosterHandler)
+    server.service = service
+    service.start()
+    info("Roster service on http://{}:{}/ with {} solver threads".format(*server.server_address[:2], service.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__=="__main__":
+    argParser = argparse.ArgumentParser()
+
+    argParser.add_argument("--host",    help="address of the service (by default, only local clients)", default="127.0.0.1")
+    argParser.add_argument("--port",    help="port of the service", type=int, default=8080)
+    argParser.add_argument("--jobs",    help="max number of concurrent solves", type=int, default=2)
+    argParser.add_argument("--backend", help="default solver backend of the requests (override the config file)", choices=sorted(BACKENDS))
+    argParser.add_argument("--work-dir", help="directory of the data files of the running jobs", default="service")
+    argParser.add_argument("--doodle-api", help="base URL of the Doodle polls API (override the config file)")
+
+    args = argParser.parse_args()
+
+    main.parse_config_file(CONFIG_FILE)
+    backend = args.backend if args.backend!=None else CONF.get("backend", "opl")
+    api_url = args.doodle_api if args.doodle_api!=None else CONF.get("doodle_api", DOODLE_API)
+    serve(RosterService(args.jobs, backend, args.work_dir, apiURL=api_url), args.host, args.port)
@@ -42,6 +42,9 @@ def parse_doodle(pollID):
         for t, l in enumerate(options_dict.get(k)):
             calendar[k][l] = list()
 
+    # Flat index which maps the i-th option to its (day, shift)
+    option_index = [ (k, l) for k in options_dict.keys() for l in options_dict.get(k) ]
+
     participants = dict()
     emptyShiftCounter = 0
     for participant in JSON['participants']:
@@ -50,14 +53,10 @@ def parse_doodle(pollID):
         participants[pID] = pName
 
         for i, pref in enumerate(participant['preferences']):
-            if pref <= 0:
+            if pref <= 0 or i >= len(option_index):
                 continue
-            k2 = 0
-            for d, k in enumerate(options_dict.keys()):
-                for t, l in enumerate(options_dict.get(k)):
-                    if k2==i:
-                        calendar[k][l].append(pID)
-                    k2 = k2+1
+            k, l = option_index[i]
+            calendar[k][l].append(pID)
 
     for k in calendar:
         if len(calendar[k]) == 0:
@@ -0,0 +1,79 @@
+# File:     synthetic.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import argparse
+import datetime
+import json
+import random
+from PollSnapshot import PollSnapshot
+
+# Start times of the shifts in a day, the first `shiftsPerDay` ones are used
+SHIFT_TIMES = [(9, 30), (12, 30), (15, 30), (18, 30), (8, 0), (11, 0), (14, 0), (17, 0)]
+
+def generate_poll(numStudents, numDays, shiftsPerDay, density, seed=0, start=datetime.date(2018, 12, 3), weekends=False):
+    """
+    Generate a synthetic Doodle poll, with the same JSON structure returned by the Doodle API.
+
+    Parameters:
+    -----------
+        - `numStudents` is the number of participants
+        - `numDays` is the number of days with shifts
+        - `shiftsPerDay` is the number of shifts in each day
+        - `density` is the probability that a participant is available for a shift
+        - `seed` is the seed of the random generator
+        - `start` is the first day of the poll
+        - `weekends` if False, skip Saturdays and Sundays
+
+    Returns:
+    --------
+    a dict with keys `options` and `participants`, as the Doodle poll JSON
+    """
+    assert(shiftsPerDay <= len(SHIFT_TIMES)), "At most {} shifts per day".format(len(SHIFT_TIMES))
+    rand = random.Random(seed)
+
+    options = []
+    day = start
+    while len(options) < numDays*shiftsPerDay:
+        if weekends or day.weekday() < 5:
+            for hour, minute in SHIFT_TIMES[:shiftsPerDay]:
+                t = datetime.datetime(day.year, day.month, day.day, hour, minute)
+                options.append({"start": int(t.timestamp()*1000)})
+        day = day + datetime.timedelta(days=1)
+
+    participants = []
+    for k in range(numStudents):
+        preferences = [ 1 if rand.random() < density else 0 for _ in options ]
+        participants.append({"id": k, "name": "Student {}".format(k+1), "preferences": preferences})
+
+    return {"title": "Synthetic poll", "options": options, "participants": participants}
+
+def poll_id(numStudents, numDays, shiftsPerDay, density, seed=0):
+    """ Return the identifier of a synthetic poll, given its parameters. """
+    return "synthetic_s{}_d{}_t{}_p{}_seed{}".format(numStudents, numDays, shiftsPerDay, density, seed)
+
+def write_poll_snapshot(snapshotDir, pollID, poll):
+    """
+    Store a synthetic `poll` in `snapshotDir`, then it can be parsed offline by DoodleParser.
+    """
+    snapshot = PollSnapshot(snapshotDir)
+    snapshot.write_poll(pollID, json.dumps(poll), {"poll_id": pollID, "synthetic": True})
+    return snapshot
+
+if __name__=="__main__":
+    argParser = argparse.ArgumentParser()
+
+    argParser.add_argument("--students", help="number of participants", type=int, default=20)
+    argParser.add_argument("--days",     help="number of days", type=int, default=20)
+    argParser.add_argument("--shifts",   help="number of shifts per day", type=int, default=3)
+    argParser.add_argument("--density",  help="probability that a participant is available for a shift", type=float, default=0.3)
+    argParser.add_argument("--seed",     help="seed of the random generator", type=int, default=0)
+    argParser.add_argument("--snapshot-dir", help="directory where the poll is stored", default="snapshots")
+
+    args = argParser.parse_args()
+
+    pollID = poll_id(args.students, args.days, args.shifts, args.density, args.seed)
+    poll   = generate_poll(args.students, args.days, args.shifts, args.density, args.seed)
+    write_poll_snapshot(args.snapshot_dir, pollID, poll)
+    print("[Info] Poll {} written in {}".format(pollID, args.snapshot_dir))
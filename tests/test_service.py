@@ -0,0 +1,254 @@
+# File:     test_service.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import sys
+import csv
+import io
+import json
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import synthetic
+
+# Polls served by the stub Doodle endpoint, "slow" is answered after SLOW_DELAY seconds
+POLLS      = {"small": synthetic.generate_poll(12, 10, 3, 0.4, 0), "slow": synthetic.generate_poll(12, 10, 3, 0.4, 1)}
+SLOW_DELAY = 1.0
+
+class StubDoodle(BaseHTTPRequestHandler):
+    """ Stub of the Doodle polls API: `GET /polls/<pollID>` returns the poll JSON, 404 if unknown. """
+
+    def do_GET(self):
+        pollID = self.path.rstrip("/").split("/")[-1]
+        if pollID not in POLLS:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if pollID == "slow":
+            time.sleep(SLOW_DELAY)
+        content = json.dumps(POLLS[pollID]).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+def free_port():
+    """ Return a free local port. """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ServiceTest(unittest.TestCase):
+    """
+    Run `service.py --backend milp` against the stub Doodle endpoint, in a working
+    directory with its own config file, snapshots and job files.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp()
+        cls.doodle   = ThreadingHTTPServer(("127.0.0.1", 0), StubDoodle)
+        threading.Thread(target=cls.doodle.serve_forever, daemon=True).start()
+        with open(os.path.join(cls.work_dir, "config.in"), 'w') as config:
+            config.write('PROB_NAME="Test"\n')
+            config.write('SNAPSHOT_DIR="snapshots"\n')
+            config.write('MOD_DIR="{}"\n'.format(os.path.join(ROOT, "models")))
+            config.write('MOD_PROB_1="LibraryModel_getCSV.mod"\n')
+            config.write('MOD_PROB_2="MinTrips_getCSV.mod"\n')
+
+        port    = free_port()
+        cls.url = "http://127.0.0.1:{}".format(port)
+        cls.service = subprocess.Popen([sys.executable, os.path.join(ROOT, "service.py"), "--backend", "milp",
+                                        "--port", str(port), "--jobs", "2",
+                                        "--doodle-api", "http://127.0.0.1:{}/polls/".format(cls.doodle.server_port)],
+                                       cwd=cls.work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 30
+        while True:
+            try:
+                if cls.get("/health")[0] == 200:
+                    break
+            except OSError:
+                if time.time() > deadline or cls.service.poll() != None:
+                    cls.tearDownClass()
+                    raise RuntimeError("The service did not start")
+                time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.terminate()
+        cls.service.wait()
+        cls.doodle.shutdown()
+        cls.doodle.server_close()
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    @classmethod
+    def get(cls, path):
+        """ Return the tuple (status code, content type, body) of `GET path`. """
+        try:
+            with urllib.request.urlopen(cls.url + path, timeout=30) as response:
+                return response.status, response.headers.get("Content-Type"), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Content-Type"), e.read()
+
+    @classmethod
+    def post(cls, body):
+        """ Return the tuple (status code, decoded JSON) of `POST /jobs` with `body`. """
+        data    = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        request = urllib.request.Request(cls.url + "/jobs", data=data, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def wait(self, jobID, timeout=60):
+        """ Return the status of the job `jobID` once it is done or failed. """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            code, _, body = self.get("/jobs/" + jobID)
+            self.assertEqual(code, 200)
+            status = json.loads(body)
+            if status["status"] in ("done", "failed"):
+                return status
+            time.sleep(0.1)
+        self.fail("job {} not finished in {} seconds".format(jobID, timeout))
+
+    def test_job(self):
+        code, status = self.post({"poll": "small", "constraints": {"max_shifts_per_day": 1}})
+        self.assertEqual(code, 202)
+        self.assertFalse(status["deduplicated"])
+        self.assertEqual(status["request"]["backend"], "milp")
+        self.assertIn(status["status"], ("queued", "running", "done"))
+
+        status = self.wait(status["id"])
+        self.assertEqual(status["status"], "done", status["error"])
+        self.assertIsInstance(status["objective"], float)
+
+        code, contentType, body = self.get("/jobs/{}/result".format(status["id"]))
+        self.assertEqual(code, 200)
+        result = json.loads(body)
+        self.assertEqual(result["objective"], status["objective"])
+        # Each existing shift is assigned, at most one per day to each student
+        num_shifts = sum(len(shifts) for shifts in result["result"].values())
+        self.assertEqual(num_shifts, 10*3)
+        for shifts in result["result"].values():
+            self.assertEqual(len(set(shifts.values())), len(shifts))
+
+        code, contentType, body = self.get("/jobs/{}/result?format=csv".format(status["id"]))
+        self.assertEqual(code, 200)
+        self.assertEqual(contentType, "text/csv")
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+        self.assertEqual(rows[0], ["day", "shift", "student"])
+        self.assertEqual(sorted(map(tuple, rows[1:])),
+                         sorted((day, shift, student) for day, shifts in result["result"].items()
+                                for shift, student in shifts.items()))
+
+        code, _, body = self.get("/jobs/{}/result?format=xml".format(status["id"]))
+        self.assertEqual(code, 400)
+        self.assertIn("error", json.loads(body))
+
+    def test_deduplicated(self):
+        # The stub delays the poll, then the first job is still in flight at the second request
+        request = {"poll": "slow", "problem": 2, "constraints": {"shifts": {"DEFAULT": [1]}}}
+        code, first = self.post(request)
+        self.assertEqual(code, 202)
+        code, second = self.post(request)
+        self.assertEqual(code, 202)
+        self.assertTrue(second["deduplicated"])
+        self.assertEqual(second["id"], first["id"])
+        self.assertEqual(second["clients"], 2)
+
+        # A different request is not deduplicated
+        code, other = self.post(dict(request, problem=1))
+        self.assertEqual(code, 202)
+        self.assertFalse(other["deduplicated"])
+        self.assertNotEqual(other["id"], first["id"])
+
+        self.assertEqual(self.wait(first["id"])["status"], "done")
+        self.assertEqual(self.wait(other["id"])["status"], "done")
+        # Once done, the same request is solved again
+        code, again = self.post(request)
+        self.assertFalse(again["deduplicated"])
+        self.wait(again["id"])
+
+        code, _, body = self.get("/metrics")
+        self.assertEqual(code, 200)
+        metrics = json.loads(body)
+        self.assertGreaterEqual(metrics["deduplicated"], 1)
+        self.assertGreaterEqual(metrics["submitted"], 4)
+
+    def test_unknown_poll(self):
+        code, status = self.post({"poll": "missing"})
+        self.assertEqual(code, 202)
+        status = self.wait(status["id"])
+        self.assertEqual(status["status"], "failed")
+        self.assertIn("404", status["error"])
+
+        code, _, body = self.get("/jobs/{}/result".format(status["id"]))
+        self.assertEqual(code, 409)
+        self.assertEqual(json.loads(body)["status"], "failed")
+
+    def test_metrics(self):
+        code, status = self.post({"poll": "small", "problem": 2})
+        self.assertEqual(code, 202)
+        self.wait(status["id"])
+
+        code, contentType, body = self.get("/metrics")
+        self.assertEqual(code, 200)
+        self.assertEqual(contentType, "application/json")
+        metrics = json.loads(body)
+        self.assertEqual(metrics["workers"], 2)
+        self.assertGreaterEqual(metrics["submitted"], 1)
+        self.assertGreaterEqual(metrics["completed"], 1)
+        self.assertGreater(metrics["throughput"], 0)
+        for stage in ("queue", "solve", "total"):
+            latency = metrics["latency"][stage]
+            self.assertGreaterEqual(latency["count"], 1)
+            self.assertLessEqual(latency["p50"], latency["p95"])
+            self.assertLessEqual(latency["p95"], latency["max"])
+
+    def test_bad_requests(self):
+        bodies = [
+            b"{not json",
+            b"[1, 2]",
+            {},
+            {"poll": "../etc"},
+            {"poll": "small", "problem": 7},
+            {"poll": "small", "backend": "nope"},
+            {"poll": "small", "constraints": [1, 2]},
+            {"poll": "small", "constraints": {"shifts": [1, 2]}},
+            {"poll": "small", "constraints": {"max_shifts_per_day": 0}},
+            {"poll": "small", "constraints": {"shifts": {"DEFAULT": [3, 1]}}},
+            {"poll": "small", "time_limit": True},
+            {"poll": "small", "time_limit": 0},
+            {"poll": "small", "gap_limit": -0.1},
+            {"poll": "small", "balance_objective": "nope"},
+        ]
+        for body in bodies:
+            code, response = self.post(body)
+            self.assertEqual(code, 400, body)
+            self.assertIn("error", response)
+
+        self.assertEqual(self.get("/jobs/unknown")[0], 404)
+        self.assertEqual(self.get("/nothing")[0], 404)
+
+if __name__=="__main__":
+    unittest.main()
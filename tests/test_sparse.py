@@ -0,0 +1,88 @@
+# File:     test_sparse.py
+#
+# Author:   Luigi Berducci
+# Date:     2026-10-17
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import synthetic
+from DoodleParser import DoodleParser
+from Solver import Solver
+from Backend import get_backend
+from Instance import read_data_file
+
+# Synthetic polls (students, days, shifts per day, density, seed) solved with both the model variants
+CASES  = [(10, 10, 3, 0.3, 0), (15, 20, 3, 0.2, 1), (20, 20, 4, 0.15, 2)]
+MODELS = ["LibraryModel_getCSV.mod", "MinTrips_getCSV.mod"]
+
+# OPLrun executable, the OPL models are compared only if it is available
+OPLRUN = os.environ.get("OPLRUN", "/opt/ibm/ILOG/CPLEX_Studio128/opl/bin/x86-64_linux/oplrun")
+
+class SparseModelTest(unittest.TestCase):
+    """
+    Solve the synthetic polls with the dense and the sparse variant of each model
+    (data encoding included) and check that they reach the same objective.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def solver(self, case, model, backend, sparse):
+        """ Return the Solver of the synthetic poll `case`, configured with the sparse or dense variant of `model`. """
+        pollID   = synthetic.poll_id(*case)
+        snapshot = synthetic.write_poll_snapshot(os.path.join(self.work_dir, "snapshots"), pollID,
+                                                 synthetic.generate_poll(*case))
+        parser   = DoodleParser(pollID, snapshot, offline=True)
+        solver   = Solver(pollID, get_backend(backend))
+        solver.set_opl_exe(OPLRUN)
+        solver.set_model(os.path.join(ROOT, "models", model))
+        solver.set_data(os.path.join(self.work_dir, "{}_{}_{}.dat".format(pollID, model, "sparse" if sparse else "dense")))
+        solver.set_sparse_density(1.0 if sparse else 0.0)
+        participants = parser.get_participants()
+        solver.config_problem(participants, parser.get_options(), parser.get_calendar(),
+                              { p: (None, None) for p in participants }, case[2])
+        self.assertEqual(solver.sparse, sparse)
+        return solver
+
+    def test_data_encoding(self):
+        # The sparse data file describes the same instance of the dense one
+        for case in CASES:
+            for model in MODELS:
+                dense  = read_data_file(self.solver(case, model, "milp", False).data_file)
+                sparse = read_data_file(self.solver(case, model, "milp", True).data_file)
+                self.assertEqual(sparse.digest(), dense.digest(), (case, model))
+
+    def test_milp_objective(self):
+        for case in CASES:
+            for model in MODELS:
+                values = []
+                for sparse in (False, True):
+                    solver = self.solver(case, model, "milp", sparse)
+                    solver.instance = read_data_file(solver.data_file)
+                    opt_val, _ = solver.solve()
+                    self.assertIsNotNone(opt_val, (case, model, sparse))
+                    values.append(opt_val)
+                self.assertAlmostEqual(values[0], values[1], places=6, msg=(case, model))
+
+    @unittest.skipUnless(os.path.exists(OPLRUN), "oplrun not available")
+    def test_opl_objective(self):
+        for case in CASES:
+            for model in MODELS:
+                dense, _  = self.solver(case, model, "opl", False).solve()
+                sparse, _ = self.solver(case, model, "opl", True).solve()
+                self.assertIsNotNone(dense, (case, model))
+                self.assertAlmostEqual(dense, sparse, places=6, msg=(case, model))
+
+if __name__=="__main__":
+    unittest.main()